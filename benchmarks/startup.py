@@ -0,0 +1,92 @@
+"""
+Startup benchmark for the `hdfq` command.
+
+Measures the import time of the `hdfq` entry point as reported by `python -X importtime`, and the wall-clock time of a
+few typical invocations on a small file. Exits with code 1 if hdfq's own import overhead (i.e. excluding typer, which
+is needed to parse the command line) is over budget.
+
+typer is imported first in the same process, so that the overhead is the time spent in modules imported afterwards
+rather than a difference between noisy measurements. Each measure is the minimum over runs, and invocations are
+interleaved so that a slow period of the machine affects all of them alike.
+
+Usage : python benchmarks/startup.py [--runs N]
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+IMPORT_BUDGET_MS = 30.0
+ENTRY_POINT = "hdfq.cli.app"
+
+
+def import_overhead(module: str) -> tuple[float, set[str]]:
+    """
+    Time (in ms) spent importing `module` once typer is imported, i.e. the sum of the self times of the modules it
+    imports, and the names of all modules imported at startup.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import typer; import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    overhead, imported, after_typer = 0.0, set(), False
+    for line in result.stderr.splitlines():
+        if match := re.match(r"import time:\s+(\d+) \|\s+\d+ \|( *)(\S+)", line):
+            imported.add(match.group(3))
+            overhead += int(match.group(1)) / 1e3 if after_typer else 0.0
+
+            # modules are listed once imported, the top level typer line comes after all of its dependencies
+            after_typer |= match.group(2) == " " and match.group(3) == "typer"
+
+    return overhead, imported
+
+
+def wall_time(*args: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "hdfq", *args], capture_output=True, stdin=subprocess.DEVNULL, check=True)
+    return (time.perf_counter() - start) * 1e3
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    runs = parser.parse_args().runs
+
+    overheads, imported = [], set()
+    for _ in range(runs):
+        overhead, modules = import_overhead(ENTRY_POINT)
+        overheads.append(overhead)
+        imported |= modules
+
+    heavy = sorted(m for m in ("ch5mpy", "numpy", "h5py", "tomllib", "hdfq.repair") if m in imported)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = str(Path(tmp_dir) / "bench.h5")
+        subprocess.run(
+            [sys.executable, "-c", f"import h5py; h5py.File({path!r}, 'w').create_dataset('a', data=[1, 2, 3])"],
+            check=True,
+        )
+
+        commands = [("--version",), ("keys", path), ("-o", "json", "keys", path)]
+        walls: dict[str, list[float]] = {" ".join(c).replace(path, "FILE"): [] for c in commands}
+        for _ in range(runs):
+            for command, times in zip(commands, walls.values()):
+                times.append(wall_time(*command))
+
+    overhead = min(overheads)
+    print(f"hdfq import overhead (excluding typer) : {overhead:.1f}ms (budget {IMPORT_BUDGET_MS:.1f}ms)")
+    print(f"heavy modules imported at startup : {', '.join(heavy) or 'none'}")
+    for command, times in walls.items():
+        print(f"hdfq {command} : {min(times):.1f}ms")
+
+    return int(overhead > IMPORT_BUDGET_MS or bool(heavy))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,11 @@
+from typing import TYPE_CHECKING, Any
+
 from hdfq import tokens
-from hdfq.evaluation import eval
-from hdfq.hdfq import run
-from hdfq.parser import parse
+
+if TYPE_CHECKING:
+    from hdfq.evaluation import eval
+    from hdfq.hdfq import run
+    from hdfq.parser import parse
 
 __all__ = [
     "tokens",
@@ -9,3 +13,23 @@ __all__ = [
     "parse",
     "run",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    # evaluation depends on ch5mpy, numpy and h5py which are slow to import : only load them when needed
+    if name == "eval":
+        from hdfq.evaluation import eval
+
+        return eval
+
+    if name == "parse":
+        from hdfq.parser import parse
+
+        return parse
+
+    if name == "run":
+        from hdfq.hdfq import run
+
+        return run
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,141 @@
+import itertools
+from typing import Any, Iterator
+
+import h5py
+import numpy as np
+import numpy.typing as npt
+
+
+def allocated_chunks(dset: h5py.Dataset) -> list[tuple[int, ...]]:
+    # offsets of chunks actually written in the file : unallocated chunks are only fill values, never copied
+    offsets: list[tuple[int, ...]] = []
+
+    if hasattr(dset.id, "chunk_iter"):
+        dset.id.chunk_iter(lambda info: offsets.append(info.chunk_offset))
+
+    else:
+        offsets = [dset.id.get_chunk_info(i).chunk_offset for i in range(dset.id.get_num_chunks())]
+
+    return offsets
+
+
+def iter_row_blocks(
+    dset: h5py.Dataset, block_size: int, chunks: tuple[int, ...] | None = None
+) -> Iterator[tuple[slice, ...]]:
+    """
+    Iterate over selections of whole rows of a dataset, of about `block_size` bytes each. Blocks are aligned on chunks
+    (the dataset's own by default) so that no chunk is read or written by two blocks.
+    """
+    chunks = chunks or dset.chunks
+    row_size = max(1, dset.size // dset.shape[0] * dset.dtype.itemsize)
+    n_rows = max(1, block_size // row_size)
+
+    if chunks is not None:
+        n_rows = max(chunks[0], n_rows // chunks[0] * chunks[0])
+
+    for start in range(0, dset.shape[0], n_rows):
+        yield (slice(start, min(start + n_rows, dset.shape[0])), *(slice(0, n) for n in dset.shape[1:]))
+
+
+def iter_chunk_blocks(dset: h5py.Dataset, block_size: int) -> Iterator[tuple[slice, ...]]:
+    """
+    Iterate over selections made of whole chunks of a dataset, of at most about `block_size` bytes each (but at least
+    one chunk) : chunks are grouped along the first axis only. Contiguous datasets are split in blocks of rows.
+    """
+    if dset.chunks is None:
+        yield from iter_row_blocks(dset, block_size)
+        return
+
+    chunk_size = int(np.prod(dset.chunks)) * dset.dtype.itemsize
+    n_rows = dset.chunks[0] * max(1, block_size // chunk_size)
+    offsets = [range(0, n, c) for n, c in zip(dset.shape[1:], dset.chunks[1:])]
+
+    for start in range(0, dset.shape[0], n_rows):
+        for offset in itertools.product(*offsets):
+            yield (
+                slice(start, min(start + n_rows, dset.shape[0])),
+                *(slice(o, min(o + c, n)) for o, c, n in zip(offset, dset.chunks[1:], dset.shape[1:])),
+            )
+
+
+def get_filters(dset: h5py.Dataset) -> list[tuple[Any, ...]]:
+    dcpl = dset.id.get_create_plist()
+    return [dcpl.get_filter(i) for i in range(dcpl.get_nfilters())]
+
+
+def same_layout(source: h5py.Dataset, destination: h5py.Dataset) -> bool:
+    """Whether chunks of a dataset can be written as-is in another one : same chunk shape, data type and filters."""
+    return (
+        source.chunks is not None
+        and source.chunks == destination.chunks
+        and source.id.get_type() == destination.id.get_type()
+        and get_filters(source) == get_filters(destination)
+    )
+
+
+def copy_chunk(
+    source: h5py.Dataset,
+    destination: h5py.Dataset,
+    offset: tuple[int, ...],
+    destination_offset: tuple[int, ...] | None = None,
+) -> int:
+    """
+    Copy a chunk as opaque (still compressed) bytes, without running it through the filter pipeline, at the same
+    offset in the destination dataset by default. Return the number of bytes copied.
+    """
+    filter_mask, data = source.id.read_direct_chunk(offset)
+    destination.id.write_direct_chunk(offset if destination_offset is None else destination_offset, data, filter_mask)
+    return len(data)
+
+
+def iter_append_blocks(start: int, n_rows: int, chunk_rows: int, block_rows: int) -> Iterator[tuple[int, int]]:
+    """
+    Iterate over (start, stop) ranges of `n_rows` rows appended at row `start` of a dataset. The first range completes
+    the last partially filled chunk, the next ones cover whole chunks so that no chunk is written twice.
+    """
+    block_rows = max(chunk_rows, block_rows // chunk_rows * chunk_rows)
+    position = min(n_rows, -start % chunk_rows)
+
+    if position:
+        yield 0, position
+
+    while position < n_rows:
+        yield position, min(n_rows, position + block_rows)
+        position += block_rows
+
+
+def append_rows(destination: h5py.Dataset, data: h5py.Dataset | npt.NDArray[Any], block_size: int = 64 << 20) -> None:
+    """
+    Grow a chunked dataset along its first axis and write rows at its end : only the new region is written. Whole
+    chunks of a source dataset with the same layout are copied as they are. The dataset is shrunk back to its original
+    size if anything fails.
+    """
+    start, n_rows, chunk_rows = destination.shape[0], data.shape[0], destination.chunks[0]
+    row_size = max(1, int(np.prod(destination.shape[1:])) * destination.dtype.itemsize)
+
+    destination.resize(start + n_rows, axis=0)
+
+    try:
+        copied = 0
+
+        if (
+            isinstance(data, h5py.Dataset)
+            and start % chunk_rows == 0
+            and same_layout(data, destination)
+            and data.fillvalue == destination.fillvalue
+        ):
+            # edge chunks are stored padded, only whole ones can be moved without decoding them
+            copied = n_rows // chunk_rows * chunk_rows
+
+            for offset in allocated_chunks(data):
+                if offset[0] < copied:
+                    copy_chunk(data, destination, offset, (start + offset[0], *offset[1:]))
+
+        # remaining rows are decoded and written in blocks aligned on the destination's chunks
+        begin = start + copied
+        for block_start, block_stop in iter_append_blocks(begin, n_rows - copied, chunk_rows, block_size // row_size):
+            destination[begin + block_start : begin + block_stop] = data[copied + block_start : copied + block_stop]
+
+    except BaseException:
+        destination.resize(start, axis=0)
+        raise
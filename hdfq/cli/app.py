@@ -1,37 +1,99 @@
-import sys
+import os
+from enum import Enum
 from pathlib import Path
-from typing import Annotated, Optional, cast
+from typing import Annotated, Optional
 
-import click
-import tomllib
 import typer
-from typer.rich_utils import rich_format_error
 
-from hdfq.hdfq import run
+from hdfq.cli.utils import get_paths, read_filters, usage_error
 
 app = typer.Typer(add_completion=False, pretty_exceptions_enable=False, no_args_is_help=True)
 
 
+class OutputFormat(str, Enum):
+    rich = "rich"
+    json = "json"
+    ndjson = "ndjson"
+    raw = "raw"
+
+
+def get_version() -> str:
+    from importlib import metadata
+
+    try:
+        return metadata.version("hdfq")
+
+    except metadata.PackageNotFoundError:
+        # running from sources, fall back to reading the project file
+        import tomllib
+
+        with open(Path(__file__).parents[2] / "pyproject.toml", mode="rb") as project_file:
+            return str(tomllib.load(project_file)["tool"]["poetry"]["version"])
+
+
 def version_callback(value: bool):
     if value:
-        with open(Path(__file__).parents[2] / "pyproject.toml", mode="rb") as project_file:
-            project = tomllib.load(project_file)
-            version = project["tool"]["poetry"]["version"]
-        print(f"hdfq-{version}")
+        print(f"hdfq-{get_version()}")
         raise typer.Exit()
 
 
 @app.command(no_args_is_help=True)
 def main(
     ctx: typer.Context,
-    filter: Annotated[str, typer.Argument(help="Command filter to evaluate", show_default=False)],
-    path: Annotated[
-        Path,
+    filter: Annotated[
+        Optional[str], typer.Argument(help="Command filter to evaluate, omitted with --batch", show_default=False)
+    ] = None,
+    paths: Annotated[
+        Optional[list[Path]],
         typer.Argument(
-            help="Path to a hdf5 file to run the filter on",
+            help="Paths or glob patterns of hdf5 files to run the filter on, read from stdin (one per line) if none",
             show_default=False,
         ),
-    ] = cast(Path, ... if sys.stdin.isatty() else Path(sys.stdin.read().strip())),
+    ] = None,
+    depth: Annotated[
+        Optional[int], typer.Option("--depth", help="Maximum depth of nested groups to display", min=0)
+    ] = None,
+    max_children: Annotated[
+        Optional[int], typer.Option("--max-children", help="Maximum number of children to display per group", min=0)
+    ] = None,
+    output: Annotated[
+        OutputFormat, typer.Option("--output", "-o", help="Output format, 'rich' for humans or json/ndjson/raw")
+    ] = OutputFormat.rich,
+    batch: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--batch",
+            help="Evaluate filters read from a file (one per line, '-' for stdin) with a single opening of PATH",
+            show_default=False,
+        ),
+    ] = None,
+    delimiter: Annotated[
+        str, typer.Option("--delimiter", help="Line printed between the outputs of filters given with --batch")
+    ] = "---",
+    jobs: Annotated[
+        Optional[int],
+        typer.Option(
+            "--jobs", "-j", help="Number of processes evaluating filters on many files [default: cpu count]", min=1
+        ),
+    ] = None,
+    unordered: Annotated[
+        bool, typer.Option("--unordered", help="Print results of many files as they complete, not in input order")
+    ] = False,
+    server: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--server",
+            help="Forward the filter to a server started with 'hdfq+ serve' on this socket",
+            envvar="HDFQ_SERVER",
+            show_default=False,
+        ),
+    ] = None,
+    dry_run: Annotated[
+        bool,
+        typer.Option(
+            "--dry-run", help="Validate the writes of the filter and print them instead of modifying the file"
+        ),
+    ] = False,
     version: Annotated[
         Optional[bool], typer.Option("--version", help="Print current version and quit", callback=version_callback)
     ] = None,
@@ -41,12 +103,55 @@ def main(
     It uses a syntax similar to jq's.
     See https://gitlab.vidium.fr/vidium/hdfq for documentation on supported filters.
     """
-    if not path.exists():
-        rich_format_error(click.UsageError(f"{path} does not exist for 'PATH'.", ctx=ctx))
+    if batch is not None:
+        # with --batch, all positional arguments are paths
+        filters = [] if filter is None else [filter]
+        paths = [Path(filter) for filter in filters] + (paths or [])
+
+        if batch == Path("-") and not paths:
+            raise usage_error(ctx, "Missing argument 'PATH...', required when filters are read from stdin.")
+
+        paths = get_paths(ctx, paths)
+        filters = read_filters(batch)
+
+    elif filter is None:
+        raise usage_error(ctx, "Missing argument 'FILTER'.")
+
+    else:
+        paths = get_paths(ctx, paths)
+        filters = [filter]
+
+    options = {"depth": depth, "max_children": max_children, "output": output.value}
+
+    if server is not None:
+        from hdfq.client import query
+
+        if batch is not None or len(paths) > 1 or dry_run:
+            raise usage_error(ctx, "--server only accepts a single filter and a single PATH, without --dry-run.")
+
+        raise typer.Exit(code=query(server, filters[0], paths[0], options))
+
+    # heavy dependencies (ch5mpy, numpy, h5py) are only imported once we know there is a filter to run
+    from hdfq.display import DisplayOptions
+
+    if len(paths) > 1:
+        from hdfq.fanout import run_many
+
+        jobs = jobs or os.cpu_count() or 1
+        success = run_many(
+            filters, paths, DisplayOptions(**options), delimiter, jobs, ordered=not unordered, dry_run=dry_run
+        )
+        raise typer.Exit(code=0 if success else 1)
+
+    if batch is not None:
+        from hdfq.hdfq import run_batch
+
+        run_batch(filters, paths[0], DisplayOptions(**options), delimiter, dry_run)
 
-        raise typer.Exit(code=1)
+    else:
+        from hdfq.hdfq import run
 
-    run(filter, path)
+        run(filters[0], paths[0], DisplayOptions(**options), dry_run)
 
 
 if __name__ == "__main__":
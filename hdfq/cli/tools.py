@@ -1,47 +1,178 @@
-import sys
+from enum import Enum
 from pathlib import Path
-from typing import Annotated, cast
+from typing import Annotated, Optional
 
-import ch5mpy as ch
-import click
 import typer
-from typer.rich_utils import rich_format_error
 
-from hdfq.repair import repair_group
+from hdfq.cli.utils import get_path, get_paths
 
 tools = typer.Typer(add_completion=False, pretty_exceptions_enable=False, no_args_is_help=True)
 
 
+class Compression(str, Enum):
+    gzip = "gzip"
+    lzf = "lzf"
+    none = "none"
+
+
+class FileSpaceStrategy(str, Enum):
+    fsm = "fsm"
+    page = "page"
+    aggregate = "aggregate"
+    none = "none"
+
+
+def parse_chunks(value: str | None) -> tuple[int, ...] | None:
+    if value is None:
+        return None
+
+    try:
+        return tuple(int(n) for n in value.split(","))
+
+    except ValueError:
+        raise typer.BadParameter("expected comma-separated integers, e.g. '1000,10'")
+
+
 @tools.command(no_args_is_help=True)
 def repair(
     ctx: typer.Context,
     path: Annotated[
-        Path,
+        Optional[Path],
         typer.Argument(
-            help="Path to a hdf5 file to repair",
+            help="Path to a hdf5 file to repair, read from stdin if not given",
             show_default=False,
         ),
-    ] = cast(Path, ... if sys.stdin.isatty() else Path(sys.stdin.read().strip())),
+    ] = None,
     verbose: Annotated[bool, typer.Option("--verbose", "-v", help="verbose output")] = False,
-    in_RAM_copy: Annotated[bool, typer.Option("--in-RAM-copy", "-R", help="perform in-RAM copy of datasets")] = False,
+    in_RAM_copy: Annotated[
+        bool, typer.Option("--in-RAM-copy", "-R", help="copy each dataset with a single read instead of chunk by chunk")
+    ] = False,
+    jobs: Annotated[
+        int, typer.Option("--jobs", "-j", help="Number of processes repairing top-level groups in parallel", min=1)
+    ] = 1,
+    report_path: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--report",
+            help="Path of the JSON report of lost objects and regions, written if anything was lost "
+            "[default: <file>.repair.json]",
+            show_default=False,
+        ),
+    ] = None,
 ) -> None:
     """
-    Repair corrupted HDF5 file by extracting valid groups and datasets.
+    Repair corrupted HDF5 file by extracting valid groups and datasets. Unreadable chunks of datasets are replaced by
+    fill values. An interrupted repair resumes where it stopped when run again.
     """
-    if not path.exists():
-        rich_format_error(click.UsageError(f"{path} does not exist for 'PATH'.", ctx=ctx))
+    path = get_path(ctx, path)
+
+    from hdfq.repair import repair_file
 
-        raise typer.Exit(code=1)
+    report = repair_file(path, verbose, in_RAM_copy, jobs)
 
-    restore_path = path.with_stem("~" + path.stem)
+    if report:
+        report_path = report_path or path.with_name(path.name + ".repair.json")
+        report.write(report_path)
+        print(f"Some data could not be recovered, see {report_path}")
 
-    with ch.File(path, mode=ch.H5Mode.READ) as corrupted_file, ch.File(
-        restore_path, mode=ch.H5Mode.WRITE_TRUNCATE
-    ) as new_file:
-        repair_group(corrupted_file, new_file, verbose, in_RAM_copy)
 
-    path.unlink()
-    restore_path.rename(path)
+@tools.command(no_args_is_help=True)
+def repack(
+    ctx: typer.Context,
+    path: Annotated[
+        Optional[Path],
+        typer.Argument(help="Path to a hdf5 file to repack, read from stdin if not given", show_default=False),
+    ] = None,
+    compression: Annotated[
+        Optional[Compression],
+        typer.Option("--compression", "-c", help="Compression of datasets [default: keep]", show_default=False),
+    ] = None,
+    level: Annotated[
+        Optional[int], typer.Option("--level", "-l", help="gzip compression level", min=0, max=9, show_default=False)
+    ] = None,
+    shuffle: Annotated[
+        Optional[bool],
+        typer.Option("--shuffle/--no-shuffle", help="Apply the shuffle filter [default: keep]", show_default=False),
+    ] = None,
+    chunks: Annotated[
+        Optional[str],
+        typer.Option(
+            "--chunks",
+            help="Chunk shape, e.g. '1000,10', applied to datasets with as many dimensions [default: keep]",
+            callback=parse_chunks,
+            show_default=False,
+        ),
+    ] = None,
+    fs_strategy: Annotated[
+        Optional[FileSpaceStrategy],
+        typer.Option("--fs-strategy", help="File space strategy of the new file [default: keep]", show_default=False),
+    ] = None,
+    fs_page_size: Annotated[
+        Optional[int], typer.Option("--fs-page-size", help="File space page size, with '--fs-strategy page'", min=512)
+    ] = None,
+    jobs: Annotated[int, typer.Option("--jobs", "-j", help="Number of processes compressing chunks", min=1)] = 1,
+    verbose: Annotated[bool, typer.Option("--verbose", "-v", help="verbose output")] = False,
+) -> None:
+    """
+    Rewrite a HDF5 file with only its live objects, to reclaim the space of deleted objects, optionally changing the
+    compression or chunking of datasets and the file space strategy.
+    """
+    path = get_path(ctx, path)
+
+    from hdfq.display import nice_size_format
+    from hdfq.repack import RepackOptions, repack_file
+
+    options = RepackOptions(
+        compression=None if compression is None else compression.value,
+        compression_level=level,
+        shuffle=shuffle,
+        chunks=chunks,  # type: ignore[arg-type]
+        fs_strategy=None if fs_strategy is None else fs_strategy.value,
+        fs_page_size=fs_page_size,
+    )
+    report = repack_file(path, options, jobs, verbose)
+
+    print(
+        f"{path}: {nice_size_format(report.original_size)} -> {nice_size_format(report.new_size)}, "
+        # a repacked file can be larger, e.g. with another compression
+        f"reclaimed {'-' if report.reclaimed < 0 else ''}{nice_size_format(abs(report.reclaimed))}"
+    )
+
+
+@tools.command(no_args_is_help=True)
+def index(
+    ctx: typer.Context,
+    paths: Annotated[
+        Optional[list[Path]],
+        typer.Argument(
+            help="Paths or glob patterns of hdf5 files to index, read from stdin (one per line) if none",
+            show_default=False,
+        ),
+    ] = None,
+) -> None:
+    """
+    Build sidecar index files (<file>.hdfqidx) recording the tree, shapes, dtypes, attributes and storage sizes of
+    HDF5 files. 'keys', 'kattrs' and 'sizes' are then answered from the index as long as the file is not modified.
+    """
+    from hdfq.index import build_index
+
+    for path in get_paths(ctx, paths):
+        print(build_index(path))
+
+
+@tools.command(no_args_is_help=True)
+def serve(
+    socket_path: Annotated[Path, typer.Argument(help="Path of the Unix socket to listen on", show_default=False)],
+    max_open_files: Annotated[
+        int, typer.Option("--max-open-files", help="Maximum number of files kept open between queries", min=1)
+    ] = 16,
+) -> None:
+    """
+    Answer filters sent with 'hdfq --server SOCKET' while keeping recently queried files open.
+    """
+    from hdfq.server import serve as serve_queries
+
+    serve_queries(socket_path, max_open_files)
 
 
 if __name__ == "__main__":
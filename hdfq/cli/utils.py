@@ -0,0 +1,69 @@
+import glob
+import sys
+from pathlib import Path
+
+import typer
+
+
+def usage_error(ctx: typer.Context, message: str) -> typer.Exit:
+    import click
+    from typer.rich_utils import rich_format_error
+
+    rich_format_error(click.UsageError(message, ctx=ctx))
+    return typer.Exit(code=1)
+
+
+def get_path(ctx: typer.Context, path: Path | None) -> Path:
+    # only read the path from stdin once the command actually runs, never at import time
+    if path is None:
+        stdin_path = "" if sys.stdin.isatty() else sys.stdin.read().strip()
+
+        if not stdin_path:
+            raise usage_error(ctx, "Missing argument 'PATH'.")
+
+        path = Path(stdin_path)
+
+    if not path.exists():
+        raise usage_error(ctx, f"{path} does not exist for 'PATH'.")
+
+    return path
+
+
+def expand_path(path: Path) -> list[Path]:
+    # expand glob patterns the shell did not, e.g. when quoted to avoid exceeding the maximum command line length
+    if path.exists() or not any(char in str(path) for char in "*?["):
+        return [path]
+
+    return [Path(match) for match in sorted(glob.glob(str(path), recursive=True))]
+
+
+def get_paths(ctx: typer.Context, paths: list[Path] | None) -> list[Path]:
+    # paths are read from stdin (one per line) if none were given on the command line
+    if not paths:
+        paths = [] if sys.stdin.isatty() else [Path(line.strip()) for line in sys.stdin if line.strip()]
+
+        if not paths:
+            raise usage_error(ctx, "Missing argument 'PATH...'.")
+
+    paths = [expanded for path in paths for expanded in expand_path(path)]
+
+    if not paths:
+        raise usage_error(ctx, "No file matches 'PATH...'.")
+
+    for path in paths:
+        if not path.exists():
+            raise usage_error(ctx, f"{path} does not exist for 'PATH...'.")
+
+    return paths
+
+
+def read_filters(batch: Path) -> list[str]:
+    # one filter per line, '-' reads filters from stdin
+    if batch == Path("-"):
+        lines = sys.stdin.read().splitlines()
+
+    else:
+        with open(batch) as batch_file:
+            lines = batch_file.read().splitlines()
+
+    return [line.strip() for line in lines if line.strip()]
@@ -0,0 +1,34 @@
+import json
+import socket
+import sys
+from pathlib import Path
+from typing import Any
+
+
+def query(socket_path: Path, filter: str, path: Path, options: dict[str, Any]) -> int:
+    """
+    Forward a filter to a running `hdfq+ serve` process and print its output. Return the exit code.
+    This module is kept free of heavy dependencies since the point of the server is to avoid paying for them.
+    """
+    request = {"filter": filter, "path": str(path.resolve()), "options": options}
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(str(socket_path))
+
+        except (ConnectionRefusedError, FileNotFoundError):
+            print(f"hdfq: no server listening on {socket_path}, start one with 'hdfq+ serve'", file=sys.stderr)
+            return 1
+
+        connection.sendall(json.dumps(request).encode() + b"\n")
+
+        with connection.makefile("rb") as response_file:
+            response = json.loads(response_file.readline())
+
+    sys.stdout.write(response["output"])
+
+    if response["error"] is not None:
+        print(f"hdfq: {response['error']}", file=sys.stderr)
+        return 1
+
+    return 0
@@ -1,160 +1,289 @@
 from __future__ import annotations
 
+import functools
 import io
 import re
-from itertools import repeat
-from typing import TYPE_CHECKING, Any
+from dataclasses import dataclass
+from itertools import islice, product, repeat
+from typing import TYPE_CHECKING, Any, Iterator, Literal
 
 import ch5mpy as ch
+import h5py
 import numpy as np
-import rich.box
-from rich.console import Console
-from rich.highlighter import RegexHighlighter
-from rich.table import Table
-from rich.theme import Theme
+import numpy.typing as npt
 
 if TYPE_CHECKING:
+    from rich.console import Console
+    from rich.table import Table
+
     from hdfq.evaluation import EVAL_OBJECT
 
 
-class H5Highlighter(RegexHighlighter):
-    base_style = "h5."
-    highlights = [
-        r"(?P<bool_true>True)",
-        r"(?P<bool_false>False)",
-        r"(?P<builtin>(?<!\w)(object|None|int\d*|float\d*|[><\|][USB]\d+))",
-        r"(?P<number>(?<!\w)[+-]?\d+(?:\.\d*)?(?:e(?:[+-](?:\d+)?)?)?…?(?!\w))",
-        r"(?P<str>[b]?[\"'].*?[\"'…])",
-        r"(?P<identifier>\.[a-zA-Z_]\w*(?=(?:\[.*\])?:))",
-        r"(?P<attribute>#[a-zA-Z_]\w*(?=:))",
-        r"(?P<value>\.[a-zA-Z_]\w*?(?==))",
-    ]
-
-
-theme = Theme(
-    {
-        "h5.bool_true": "bold green",
-        "h5.bool_false": "bold red",
-        "h5.builtin": "orchid",
-        "h5.number": "cyan",
-        "h5.str": "green",
-        "h5.identifier": "bold yellow",
-        "h5.attribute": "italic grey70",
-        "h5.value": "blue",
-    }
-)
-console = Console(highlighter=H5Highlighter(), theme=theme)
+HIGHLIGHTS = [
+    r"(?P<bool_true>True)",
+    r"(?P<bool_false>False)",
+    r"(?P<builtin>(?<!\w)(object|None|int\d*|float\d*|[><\|][USB]\d+))",
+    r"(?P<number>(?<!\w)[+-]?\d+(?:\.\d*)?(?:e(?:[+-](?:\d+)?)?)?…?(?!\w))",
+    r"(?P<str>[b]?[\"'].*?[\"'…])",
+    r"(?P<identifier>\.[a-zA-Z_]\w*(?=(?:\[.*\])?:))",
+    r"(?P<attribute>#[a-zA-Z_]\w*(?=:))",
+    r"(?P<value>\.[a-zA-Z_]\w*?(?==))",
+]
+
+THEME = {
+    "h5.bool_true": "bold green",
+    "h5.bool_false": "bold red",
+    "h5.builtin": "orchid",
+    "h5.number": "cyan",
+    "h5.str": "green",
+    "h5.identifier": "bold yellow",
+    "h5.attribute": "italic grey70",
+    "h5.value": "blue",
+}
+
+
+@functools.cache
+def get_console() -> Console:
+    # rich is only imported when rendering for humans, machine-readable outputs never pay for it
+    from rich.console import Console
+    from rich.highlighter import RegexHighlighter
+    from rich.theme import Theme
+
+    class H5Highlighter(RegexHighlighter):
+        base_style = "h5."
+        highlights = HIGHLIGHTS
+
+    return Console(highlighter=H5Highlighter(), theme=Theme(THEME))
 
 
 def get_tabs(offset: int) -> str:
     return "  " * offset
 
 
-def repr_dict(obj: dict[str, Any] | ch.AttributeManager | ch.H5Dict, offset: int) -> str:
-    prefix = "." if isinstance(obj, (dict, ch.H5Dict)) else "#"
+@dataclass(frozen=True)
+class DisplayOptions:
+    depth: int | None = None
+    max_children: int | None = None
+    output: Literal["rich", "json", "ndjson", "raw"] = "rich"
+
+
+def _wrap_lines(lines: Iterator[str], prefix: str, suffix: str) -> Iterator[str]:
+    # add a prefix to the first line and a suffix to the last line, without consuming the whole iterator
+    previous = prefix + next(lines)
+
+    for line in lines:
+        yield previous
+        previous = line
+
+    yield previous + suffix
+
+
+def iter_repr_dict(
+    obj: dict[str, Any] | ch.AttributeManager | ch.H5Dict | ch.H5List,
+    offset: int,
+    options: DisplayOptions,
+    depth: int | None,
+) -> Iterator[str]:
+    prefix = "#" if isinstance(obj, ch.AttributeManager) else "."
     tabs = get_tabs(offset)
-    return (
-        f"{tabs}"
-        + f",\n{tabs}".join(map(lambda kv: f"{prefix}{kv[0]}: {repr_object(kv[1], offset=offset)}", obj.items()))
-        + ",\n"
-    )
+    items = ((str(i), obj[i]) for i in range(len(obj))) if isinstance(obj, ch.H5List) else iter(obj.items())
 
+    for key, value in islice(items, options.max_children):
+        yield from _wrap_lines(
+            iter_repr_object(value, offset=offset, options=options, depth=depth), f"{tabs}{prefix}{key}: ", ","
+        )
 
-def repr_array_1d(obj: ch.H5Array[Any], table: Table) -> None:
-    if len(obj) <= 6:
-        table.add_row(*map(repr, obj))
+    if options.max_children is not None and len(obj) > options.max_children:
+        yield f"{tabs}... ({len(obj) - options.max_children} more)"
 
-    else:
-        table.add_row(*map(repr, obj[:3]), "...", *map(repr, obj[-3:]))  # pyright: ignore[reportArgumentType]
 
+EDGE_ITEMS = 3
 
-def repr_array_2d(obj: ch.H5Array[Any], table: Table) -> None:
-    if obj.shape[0] <= 6:
-        for row in range(obj.shape[0]):
-            repr_array_1d(obj[row], table)
 
-    else:
-        n_cols = obj.shape[1]
-        repr_array_1d(obj[0], table)
-        repr_array_1d(obj[1], table)
-        repr_array_1d(obj[2], table)
-        table.add_row(*repeat("...", n_cols if n_cols <= 6 else 7))
-        repr_array_1d(obj[obj.shape[0] - 3], table)
-        repr_array_1d(obj[obj.shape[0] - 2], table)
-        repr_array_1d(obj[obj.shape[0] - 1], table)
+def _read_hyperslabs(dset: ch.Dataset[Any], corners: list[tuple[tuple[int, int], ...]], out: npt.NDArray[Any]) -> None:
+    # select the union of all corners and read them with a single H5Dread call, in file order which matches the
+    # row-major order of the compacted output array
+    file_space = dset.id.get_space()
+    file_space.select_none()
 
+    for corner in corners:
+        file_space.select_hyperslab(
+            tuple(start for start, _ in corner), tuple(stop - start for start, stop in corner), op=h5py.h5s.SELECT_OR
+        )
 
-def repr_object(obj: EVAL_OBJECT, offset: int) -> str:
-    if isinstance(obj, (ch.H5Dict, ch.H5List)):
-        if len(obj) + len(obj.attributes) == 0:
-            return "{}"
+    dset.id.read(h5py.h5s.create_simple(out.shape), file_space, out)
 
-        if len(obj.attributes):
-            attributes = repr_dict(obj.attributes, offset=offset + 1)
-        else:
-            attributes = ""
 
-        if len(obj):
-            if isinstance(obj, ch.H5List):
-                body = repr_dict(obj.to_dict(), offset=offset + 1)
-            else:
-                body = repr_dict(obj, offset=offset + 1)
-        else:
-            body = ""
+def read_corners(obj: ch.H5Array[Any] | npt.NDArray[Any]) -> tuple[npt.NDArray[Any], tuple[bool, ...]]:
+    """
+    Read only the first and last EDGE_ITEMS elements along every axis of an array, i.e. the parts that are actually
+    displayed. Also return which axes were truncated.
+    """
+    truncated = tuple(n > 2 * EDGE_ITEMS for n in obj.shape)
+    ranges = [((0, EDGE_ITEMS), (n - EDGE_ITEMS, n)) if t else ((0, n),) for n, t in zip(obj.shape, truncated)]
+    corners = list(product(*ranges))
 
-        tabs = get_tabs(offset)
+    out_shape = tuple(2 * EDGE_ITEMS if t else n for n, t in zip(obj.shape, truncated))
+
+    if type(obj) is ch.H5Array and isinstance(obj.dset, ch.Dataset) and obj.dset.dtype.kind in "biufc":
+        out = np.empty(out_shape, dtype=obj.dset.dtype)
+        _read_hyperslabs(obj.dset, corners, out)
+        return out, truncated
+
+    out = np.empty(out_shape, dtype=obj.dtype)
+    for corner in corners:
+        source = tuple(slice(start, stop) for start, stop in corner)
+        destination = tuple(
+            slice(0, stop - start) if start == 0 else slice(out_n - (stop - start), out_n)
+            for (start, stop), out_n in zip(corner, out_shape)
+        )
+        out[destination] = np.asarray(obj[source])
+
+    return out, truncated
+
+
+def repr_row(row: npt.NDArray[Any], truncated: bool) -> list[str]:
+    cells = list(map(repr, row))
+    if truncated:
+        cells.insert(EDGE_ITEMS, "...")
+
+    return cells
 
-        return f"{{\n{attributes}{body}{tabs}}}"
+
+def repr_array_1d(
+    corners: npt.NDArray[Any], truncated: tuple[bool, ...], table: Table, prefix: str | None = None
+) -> None:
+    table.add_row(*([] if prefix is None else [prefix]), *repr_row(corners, truncated[-1]))
+
+
+def repr_array_2d(
+    corners: npt.NDArray[Any], truncated: tuple[bool, ...], table: Table, prefix: str | None = None
+) -> None:
+    row_prefix = None if prefix is None else ""
+
+    for index, row in enumerate(corners):
+        if truncated[-2] and index == EDGE_ITEMS:
+            n_cells = len(corners[0]) + truncated[-1]
+            table.add_row(*([] if row_prefix is None else [row_prefix]), *repeat("...", n_cells))
+
+        repr_array_1d(row, truncated, table, prefix=row_prefix if index else prefix)
+
+
+def _original_index(index: int, n: int, truncated: bool) -> int:
+    return n - 2 * EDGE_ITEMS + index if truncated and index >= EDGE_ITEMS else index
+
+
+def _follows_gap(block_index: tuple[int, ...], truncated: tuple[bool, ...]) -> bool:
+    return any(
+        t and i == EDGE_ITEMS and not any(block_index[axis + 1 :])
+        for axis, (i, t) in enumerate(zip(block_index, truncated))
+    )
+
+
+def repr_array_nd(corners: npt.NDArray[Any], truncated: tuple[bool, ...], shape: tuple[int, ...], table: Table) -> None:
+    # one section per 2d slice, labelled with its index along the leading dimensions
+    for block_index in np.ndindex(*corners.shape[:-2]):
+        if any(block_index):
+            table.add_section()
+
+        if _follows_gap(block_index, truncated):
+            table.add_row("...")
+            table.add_section()
+
+        original_index = map(_original_index, block_index, shape, truncated)
+        prefix = "[" + ", ".join(map(str, original_index)) + ", :, :]"
+        repr_array_2d(corners[block_index], truncated[-2:], table, prefix=prefix)
+
+
+def iter_repr_object(
+    obj: EVAL_OBJECT, offset: int, options: DisplayOptions = DisplayOptions(), depth: int | None = None
+) -> Iterator[str]:
+    if isinstance(obj, (ch.H5Dict, ch.H5List)):
+        if len(obj) + len(obj.attributes) == 0:
+            yield "{}"
+            return
+
+        if depth == 0:
+            yield "{...}"
+            return
+
+        yield "{"
+        yield from iter_repr_dict(obj.attributes, offset=offset + 1, options=options, depth=None)
+        yield from iter_repr_dict(obj, offset=offset + 1, options=options, depth=None if depth is None else depth - 1)
+        yield f"{get_tabs(offset)}}}"
 
     elif isinstance(obj, (dict, ch.AttributeManager)):
-        if offset > 0:
-            tabs = get_tabs(offset)
-            return f"{{\n{repr_dict(obj, offset=offset+1)}{tabs}}}"
+        if not len(obj):
+            yield "{}"
+            return
 
-        return f"{{\n{repr_dict(obj, offset=offset+1)}}}"
+        yield "{"
+        yield from iter_repr_dict(obj, offset=offset + 1, options=options, depth=depth)
+        yield f"{get_tabs(offset)}}}"
 
     elif isinstance(obj, list):
         tabs = get_tabs(offset + 1)
-        content_repr = f",\n{tabs}".join(map(repr, obj))
-        return f"[\n{tabs}{content_repr}\n]"
 
-    elif isinstance(obj, ch.H5Array):
+        n_shown = len(obj) if options.max_children is None else min(len(obj), options.max_children)
+
+        yield "["
+        yield from (f"{tabs}{e!r}" + ("," if i < len(obj) - 1 else "") for i, e in enumerate(obj[:n_shown]))
+        if n_shown < len(obj):
+            yield f"{tabs}... ({len(obj) - n_shown} more)"
+        yield "]"
+
+    elif isinstance(obj, (ch.H5Array, np.ndarray)):
         if obj.size == 0:
-            return "[]"
+            yield "[]"
+            return
 
         if obj.ndim == 0:
-            return str(obj)
+            yield str(obj)
+            return
+
+        import rich.box
+        from rich.console import Console
+        from rich.table import Table
 
         table = Table(show_header=False, show_lines=False, box=rich.box.ROUNDED)
+        corners, truncated = read_corners(obj)
+
         if obj.ndim == 1:
-            repr_array_1d(obj, table)
+            repr_array_1d(corners, truncated, table)
 
         elif obj.ndim == 2:
-            repr_array_2d(obj, table)
+            repr_array_2d(corners, truncated, table)
 
         else:
-            table.add_row("...")
+            repr_array_nd(corners, truncated, obj.shape, table)
 
         tabs = get_tabs(offset)
 
-        table_console = Console(file=io.StringIO(), width=console.width - 1 - len(tabs))
+        table_console = Console(file=io.StringIO(), width=get_console().width - 1 - len(tabs))
         table_console.print(f".shape={obj.shape}  .dtype={obj.dtype}", table)
         table_repr = table_console.file.getvalue().rstrip()  # pyright: ignore[reportAttributeAccessIssue]
-        table_repr = re.sub("\n", f"\n{tabs}", table_repr)
 
-        return table_repr
+        first, *others = table_repr.split("\n")
+        yield first
+        yield from (f"{tabs}{line}" for line in others)
 
     elif isinstance(obj, np.void):
-        return re.sub(
+        yield re.sub(
             r"\.$", "", re.sub(r"\.+", ".", "".join(chr(c) if 32 <= c < 128 else "." for c in bytes(obj)[13:]))
         )
 
     else:
-        return repr(obj)
+        yield repr(obj)
+
+
+def repr_object(obj: EVAL_OBJECT, offset: int, options: DisplayOptions = DisplayOptions()) -> str:
+    return "\n".join(iter_repr_object(obj, offset=offset, options=options, depth=options.depth))
 
 
-def display(obj: EVAL_OBJECT) -> None:
-    console.print(repr_object(obj, offset=0))
+def display(obj: EVAL_OBJECT, options: DisplayOptions = DisplayOptions()) -> None:
+    # print lines as soon as they are rendered instead of building the whole representation first
+    for line in iter_repr_object(obj, offset=0, options=options, depth=options.depth):
+        get_console().print(line)
 
 
 def nice_size_format(size: int) -> str:
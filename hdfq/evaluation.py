@@ -1,15 +1,26 @@
 from __future__ import annotations
 
-import sys
-from dataclasses import dataclass
+import functools
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
 from typing import Any, Literal, Protocol
 
 import ch5mpy as ch
+import h5py
+import numpy as np
 import numpy.typing as npt
+from ch5mpy.objects.dataset import DatasetWrapper
 
-from hdfq.display import display, nice_size_format
+from hdfq.chunks import append_rows
+from hdfq.display import DisplayOptions, display, nice_size_format
 from hdfq.exceptions import EvalError
-from hdfq.parser import Node, Special, Tree, VTNode
+from hdfq.index import IndexedDataset, IndexedGroup, IndexedLink
+from hdfq.parser import Node, Nodes, Special, Tree, VTNode
+from hdfq.plan import Operation, WritePlan, hollow_copy
+from hdfq.reductions import dataset_stats, reduce_data
+from hdfq.selection import RowSelection, gather, match_ranges, ranges_to_indices
+from hdfq.serialize import serialize
 
 
 @dataclass
@@ -26,9 +37,11 @@ EVAL_OBJECT = (
     | ch.Dataset[Any]
     | ch.AttributeManager
     | ch.H5List[ch.H5Dict[Any] | ch.Dataset[Any]]
+    | npt.NDArray[Any]
     | list[str]
     | dict[str, Any]
     | DatasetInfo
+    | RowSelection
 )
 
 
@@ -48,17 +61,44 @@ EVAL_FUNC = EVAL_FUNC_base | EVAL_FUNC_get | EVAL_FUNC_set
 
 
 def get_object(obj: EVAL_OBJECT, key: str) -> EVAL_OBJECT:
-    if not isinstance(obj, (ch.H5Dict, dict, ch.H5List)):
+    if not isinstance(obj, (ch.H5Dict, dict, ch.H5List, RowSelection)):
         raise EvalError(f"Cannot get object from '{type(obj).__name__}'")
 
-    return obj[key]
+    try:
+        return obj[key]
+
+    except KeyError:
+        path = key if (parent := context_path(obj)) is None else f"{parent.rstrip('/')}/{key}"
+        raise EvalError(f"Cannot get '{path}', no such object") from None
 
 
 def get_attribute(obj: EVAL_OBJECT, key: str) -> EVAL_OBJECT:
-    if not isinstance(obj, (ch.H5Dict, ch.Dataset)):
+    if not isinstance(obj, (ch.H5Dict, ch.Dataset, ch.H5Array)):
         raise EvalError(f"Cannot get attribute from '{type(obj).__name__}'")
 
-    return obj.attributes[key]
+    try:
+        return obj.attributes[key]
+
+    except KeyError:
+        path = key if (parent := context_path(obj)) is None else f"{parent}#{key}"
+        raise EvalError(f"Cannot get '{path}', no such attribute") from None
+
+
+def get_index(obj: EVAL_OBJECT, index: tuple[int | slice, ...]) -> EVAL_OBJECT:
+    if not isinstance(obj, (ch.H5Array, np.ndarray)):
+        raise EvalError(f"Cannot index '{type(obj).__name__}'")
+
+    if len(index) > obj.ndim:
+        raise EvalError(f"Too many indices for array with {obj.ndim} dimension(s)")
+
+    if any(isinstance(i, slice) and i.step is not None and i.step < 1 for i in index):
+        raise EvalError("Slice steps must be positive")
+
+    if type(obj) is ch.H5Array:
+        # read the whole selection as a single hyperslab, only the chunks it touches are decompressed
+        return obj.dset[index]
+
+    return np.asarray(obj[index])
 
 
 def get_keys(obj: EVAL_OBJECT) -> list[str]:
@@ -68,126 +108,587 @@ def get_keys(obj: EVAL_OBJECT) -> list[str]:
     if isinstance(obj, ch.H5List):
         return [str(i) for i in range(len(obj))]
 
+    if isinstance(obj, RowSelection):
+        return obj.keys()
+
     raise EvalError(f"Cannot get keys from '{type(obj).__name__}'")
 
 
 def get_attributes(obj: EVAL_OBJECT) -> dict[str, Any]:
-    if not isinstance(obj, (ch.H5Dict, ch.Dataset)):
+    if not isinstance(obj, (ch.H5Dict, ch.Dataset, ch.H5Array)):
         raise EvalError(f"Cannot get attributes from '{type(obj).__name__}'")
 
     return obj.attributes.as_dict()
 
 
 def get_attribute_keys(obj: EVAL_OBJECT) -> list[str]:
-    if not isinstance(obj, (ch.H5Dict, ch.Dataset)):
+    if not isinstance(obj, (ch.H5Dict, ch.Dataset, ch.H5Array)):
         raise EvalError(f"Cannot get attribute keys from '{type(obj).__name__}")
 
     return list(obj.attributes.keys())
 
 
-def get_sizes_core(obj: ch.H5Dict, sizes: dict[str, Any], cum_size: int) -> tuple[int, dict[str, Any]]:
-    for k, v in obj.items():
-        if not isinstance(v, ch.H5Dict):
-            if isinstance(v, str):
-                v_size = sys.getsizeof(v)
+class ByteSize(int):
+    """A number of bytes, displayed in a human readable unit but serialized as a plain integer."""
 
-            else:
-                v_size = v.size * v.dtype.itemsize
+    def __repr__(self) -> str:
+        return repr(nice_size_format(int(self)))
+
+
+@dataclass
+class StorageInfo:
+    storage: int = 0
+    logical: int = 0
+
+    def __iadd__(self, other: StorageInfo) -> StorageInfo:
+        self.storage += other.storage
+        self.logical += other.logical
+        return self
+
+    def ratio(self) -> float | None:
+        return round(self.logical / self.storage, 2) if self.storage else None
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "storage": ByteSize(self.storage),
+            "logical": ByteSize(self.logical),
+            "ratio": self.ratio(),
+        }
+
+
+def get_dataset_size(dset: ch.Dataset[Any] | IndexedDataset) -> tuple[StorageInfo, dict[str, Any]]:
+    # only query HDF5 for allocated storage and chunk layout, the data itself is never read
+    if isinstance(dset, IndexedDataset):
+        info, n_chunks = StorageInfo(storage=dset.storage, logical=dset.logical), dset.chunks
+
+    else:
+        info = StorageInfo(storage=dset.id.get_storage_size(), logical=dset.size * dset.dtype.itemsize)
+        n_chunks = None if dset.chunks is None else dset.id.get_num_chunks()
+
+    description = info.describe()
+
+    if dset.chunks is not None:
+        description["chunks"] = n_chunks
+        description["chunk_shape"] = dset.chunk_shape if isinstance(dset, IndexedDataset) else dset.chunks
+
+    return info, description
+
+
+def get_sizes_core(
+    group: ch.Group | IndexedGroup, counted: set[int] | None = None
+) -> tuple[StorageInfo, dict[str, Any]]:
+    # a group's total is kept apart from its children, whose names could be anything. Soft and external links are not
+    # followed and objects reachable through several hard links (`counted` addresses) are counted only once
+    if isinstance(group, IndexedGroup):
+        children = {k: v for k, v in group.items() if not isinstance(v, IndexedLink)}
+
+    else:
+        counted = {h5py.h5o.get_info(group.id).addr} if counted is None else counted
+        children = {}
+
+        for k in group.keys():
+            if not isinstance(group.get(k, getlink=True), h5py.HardLink):
+                continue
+
+            address = h5py.h5o.get_info(group[k].id).addr
+            if address not in counted:
+                counted.add(address)
+                children[k] = group[k]
+
+    cum_info, sizes = StorageInfo(), {}
 
-            sizes[k] = nice_size_format(v_size)
-            cum_size += v_size
+    for k, v in children.items():
+        if isinstance(v, (ch.Dataset, IndexedDataset)):
+            info, sizes[k] = get_dataset_size(v)
 
         else:
-            sub_cum_size, sub_sizes = get_sizes_core(v, {}, 0)
-            sizes[k + f"['{nice_size_format(sub_cum_size)}']"] = sub_sizes
-            cum_size += sub_cum_size
+            info, sizes[k] = get_sizes_core(v, counted)
 
-    return cum_size, sizes
+        cum_info += info
+
+    return cum_info, {**cum_info.describe(), "children": sizes}
 
 
 def get_sizes(obj: EVAL_OBJECT) -> dict[str, Any]:
     if not isinstance(obj, ch.H5Dict):
         raise EvalError(f"Cannot get object sizes from '{type(obj).__name__}")
 
-    cum_sum, sizes = get_sizes_core(obj, {}, 0)
-    sizes["TOTAL"] = nice_size_format(cum_sum)
+    return get_sizes_core(obj.file)[1]
+
+
+def open_file_reference(path: str) -> ch.H5Dict[Any]:
+    # referenced files are only read from, their objects can be copied or linked to but never modified
+    try:
+        return ch.H5Dict.read(Path(path), mode=ch.H5Mode.READ)
+
+    except OSError as e:
+        raise EvalError(f"Cannot open referenced file '{path}'") from e
+
+
+def get_h5_object(obj: Any) -> h5py.Group | h5py.Dataset | None:
+    """Get the HDF5 object an evaluated value was read from, None for values which only exist in memory."""
+    if type(obj) is ch.H5Array:
+        obj = obj.dset
+
+    if isinstance(obj, DatasetWrapper):
+        # string datasets are read through a wrapper decoding their values, attributes go to the dataset
+        return h5py.Dataset(obj.id)
+
+    if isinstance(obj, (ch.H5Dict, ch.H5List)):
+        obj = obj.file
+
+    if isinstance(obj, ch.Dataset):
+        return h5py.Dataset(obj.id)
+
+    if isinstance(obj, ch.Group):
+        return h5py.Group(h5py.h5o.open(obj.id, b"."))
+
+    return None
+
+
+def describe_value(value: Any) -> str:
+    if (h5_object := get_h5_object(value)) is not None:
+        return h5_object.name
+
+    if isinstance(value, functools.partial):
+        # deferred dataset creation
+        return f"dataset{value.keywords['shape']}<{value.keywords['dtype']}>"
 
-    return sizes
+    if isinstance(value, np.ndarray):
+        return f"array{value.shape}<{value.dtype}>"
 
+    return repr(value)
 
-def set_key_value(obj: EVAL_OBJECT, key: str | int, value: Any) -> None:
-    if not isinstance(obj, (ch.H5Dict, dict, ch.AttributeManager, DatasetInfo)):
+
+def _selection_shape(shape: tuple[int, ...], index: tuple[int | slice, ...]) -> tuple[int, ...]:
+    if len(index) > len(shape):
+        raise EvalError(f"Too many indices for array with {len(shape)} dimension(s)")
+
+    selection: list[int] = []
+    for i, n in zip(index, shape):
+        if isinstance(i, slice):
+            selection.append(len(range(*i.indices(n))))
+
+        elif not -n <= i < n:
+            raise EvalError(f"Index {i} is out of bounds for axis with size {n}")
+
+    return (*selection, *shape[len(index) :])
+
+
+def _format_index(index: tuple[int | slice, ...]) -> str:
+    def axis(i: int | slice) -> str:
+        if isinstance(i, int):
+            return str(i)
+
+        bounds = f"{'' if i.start is None else i.start}:{'' if i.stop is None else i.stop}"
+        return bounds if i.step is None else f"{bounds}:{i.step}"
+
+    return f"[{', '.join(map(axis, index))}]"
+
+
+def plan_set(obj: EVAL_OBJECT, key: str | int | tuple[int | slice, ...], value: Any, path: str) -> Operation:
+    if not isinstance(obj, (ch.H5Dict, dict, ch.AttributeManager, DatasetInfo, ch.H5Array)):
         raise EvalError(f"Cannot assign value to '{type(obj).__name__}'")
 
-    obj[key] = value
+    if isinstance(obj, ch.H5Array) and isinstance(key, tuple):
+        selection = _selection_shape(obj.shape, key)
+
+        try:
+            np.broadcast_to(np.empty(np.shape(value), dtype=bool), selection)
+        except ValueError:
+            raise EvalError(f"Cannot assign value of shape {np.shape(value)} to selection of shape {selection}")
+
+        if (np.asarray(value).dtype.kind in "SUO") != (obj.dtype.kind in "SUO"):
+            raise EvalError(f"Cannot assign value of type {np.asarray(value).dtype} to array of type {obj.dtype}")
+
+    selection = _format_index(key) + " " if isinstance(key, tuple) else ""
+    return Operation(
+        "set", path, f"{selection}= {describe_value(value)}", functools.partial(obj.__setitem__, key, value)
+    )
 
 
-def del_object(obj: EVAL_OBJECT, key: str | int) -> None:
+def _prepare_destination(group: h5py.Group, key: str, source: h5py.Group | h5py.Dataset) -> bool:
+    # return False when the destination already is the source object, in which case there is nothing to do
+    if key in group:
+        if isinstance(group.get(key, getlink=True), h5py.HardLink) and group[key] == source:
+            return False
+
+        del group[key]
+
+    return True
+
+
+def copy_object(source: h5py.Group | h5py.Dataset, group: h5py.Group, key: str) -> None:
+    """Copy a dataset or a whole group with H5Ocopy : chunks are copied as they are, data never goes through numpy."""
+    if _prepare_destination(group, key, source):
+        h5py.h5o.copy(source.id, b".", group.id, key.encode())
+
+
+def plan_copy(source: h5py.Group | h5py.Dataset, obj: ch.H5Dict[Any], key: str, path: str) -> Operation:
+    group = get_h5_object(obj)
+    assert isinstance(group, h5py.Group)
+
+    destination = f"{group.name.rstrip('/')}/{key}/"
+    if (
+        isinstance(source, h5py.Group)
+        and source.file == group.file
+        and destination.startswith(source.name.rstrip("/") + "/")
+    ):
+        raise EvalError(f"Cannot copy group '{source.name}' inside itself")
+
+    origin = source.name if source.file == group.file else f"@{source.file.filename}:{source.name}"
+    return Operation("copy", path, f"<- {origin}", functools.partial(copy_object, source, group, key))
+
+
+def link_object(source: h5py.Group | h5py.Dataset, group: h5py.Group, key: str, soft: bool) -> None:
+    if not _prepare_destination(group, key, source):
+        return
+
+    if not soft:
+        group[key] = source
+
+    elif source.file == group.file:
+        group[key] = h5py.SoftLink(source.name)
+
+    else:
+        # external links are resolved relative to the directory of the file holding them
+        filename = os.path.relpath(source.file.filename, os.path.dirname(os.path.abspath(group.file.filename)))
+        group[key] = h5py.ExternalLink(filename, source.name)
+
+
+def plan_link(
+    source: EVAL_OBJECT, obj: EVAL_OBJECT, key: str | int | tuple[int | slice, ...], soft: bool, path: str
+) -> Operation:
+    h5_source = get_h5_object(source)
+    if h5_source is None:
+        raise EvalError(f"Cannot link to '{type(source).__name__}', only to datasets and groups of a file")
+
+    if not isinstance(obj, ch.H5Dict) or not isinstance(key, str):
+        raise EvalError(f"Cannot create link in '{type(obj).__name__}'")
+
+    group = get_h5_object(obj)
+    assert isinstance(group, h5py.Group)
+
+    if not soft and h5_source.file != group.file:
+        raise EvalError("Cannot create hard link to an object of another file, use 'link(..., soft=true)'")
+
+    return Operation(
+        "soft link" if soft else "link",
+        path,
+        f"-> {h5_source.name}",
+        functools.partial(link_object, h5_source, group, key, soft),
+    )
+
+
+def plan_append(obj: EVAL_OBJECT, key: str | int | tuple[int | slice, ...], value: Any, path: str) -> Operation:
+    if not isinstance(obj, ch.H5Dict) or not isinstance(key, str):
+        raise EvalError(f"Cannot append to '{type(obj).__name__}'")
+
+    target = get_object(obj, key)
+    destination = get_h5_object(target)
+    if not isinstance(destination, h5py.Dataset) or destination.ndim == 0:
+        raise EvalError(f"Cannot append to '{type(target).__name__}', only to datasets")
+
+    source = get_h5_object(value)
+    if isinstance(source, h5py.Group):
+        raise EvalError("Cannot append a group to a dataset")
+
+    if np.isscalar(value):
+        # constants are appended as a single row
+        data = np.full((1, *destination.shape[1:]), value)
+
+    elif source is None:
+        try:
+            data = np.asarray(value)
+
+        except ValueError as e:
+            raise EvalError(f"Cannot append {describe_value(value)}, rows have different lengths") from e
+
+    else:
+        data = source
+
+    if data.shape[1:] != destination.shape[1:]:
+        raise EvalError(f"Cannot append rows of shape {data.shape[1:]} to dataset of shape {destination.shape}")
+
+    max_rows = destination.maxshape[0]
+    if destination.chunks is None or (max_rows is not None and destination.shape[0] + data.shape[0] > max_rows):
+        raise EvalError(f"Dataset '{destination.name}' cannot grow along its first axis, see the 'maxshape' option")
+
+    return Operation(
+        "append",
+        path,
+        f"+= {describe_value(value)} ({data.shape[0]} rows)",
+        functools.partial(append_rows, destination, data),
+    )
+
+
+def plan_delete(obj: EVAL_OBJECT, key: str | int, path: str) -> Operation:
     if not isinstance(obj, (ch.H5Dict, dict, ch.AttributeManager, ch.H5List)):
         raise EvalError(f"Cannot delete value from '{type(obj).__name__}'")
 
-    del obj[key]
+    if isinstance(obj, ch.H5List) and not (isinstance(key, int) and -len(obj) <= key < len(obj)):
+        raise EvalError(f"Cannot delete '{key}', index out of range")
+
+    if not isinstance(obj, ch.H5List) and key not in obj:
+        raise EvalError(f"Cannot delete '{key}', no such object")
+
+    return Operation("delete", path, apply=functools.partial(obj.__delitem__, key))
 
 
-def shallow_eval_statement(target: VTNode, context: EVAL_OBJECT) -> tuple[EVAL_OBJECT, str | int]:
+def shallow_eval_statement(
+    target: VTNode, context: EVAL_OBJECT
+) -> tuple[EVAL_OBJECT, str | int | tuple[int | slice, ...]]:
     context, key = eval_statement(target.target, context), target.value
-    assert isinstance(key, str | int), "invalid key type"
+    assert isinstance(key, str | int | tuple), "invalid key type"
 
     if target.name == "GetAttr":
-        if not isinstance(context, ch.H5Dict):
+        if not isinstance(context, (ch.H5Dict, ch.H5Array)):
             raise EvalError(f"Cannot get attribute '{key}' from {type(context).__name__}")
         context = context.attributes
 
     return context, key
 
 
+def create_filled_dataset(
+    name: str,
+    loc: ch.Group,
+    *,
+    shape: tuple[int, ...],
+    dtype: str,
+    chunks: bool | tuple[int, ...],
+    maxshape: bool | tuple[int | None, ...] | None,
+    compression: str | int | None,
+    fillvalue: int | float | None,
+) -> None:
+    """
+    Create a dataset holding only its fill value. Nothing is written : HDF5 allocates chunks when they are first
+    written to, so the dataset is created instantly and takes no space whatever its shape.
+    """
+    is_str = np.issubdtype(np.dtype(dtype), np.str_)
+
+    if maxshape is True or (maxshape is None and chunks):
+        maxshape = (None,) * len(shape)
+
+    # like other values, new datasets replace existing objects
+    if name in loc:
+        del loc[name]
+
+    dset = loc.create_dataset(
+        name,
+        shape=shape,
+        dtype=h5py.string_dtype() if is_str else dtype,
+        chunks=chunks or None,
+        maxshape=maxshape or None,
+        compression=compression,
+        fillvalue=None if is_str else fillvalue,
+    )
+    dset.attrs["dtype"] = dtype
+
+
 def create_dataset(
     data: EVAL_OBJECT | None,
     shape: tuple[int, ...] | None,
     dtype: str | None,
-    chunks: bool,
+    chunks: bool | tuple[int, ...],
     maxshape: bool | tuple[int | None, ...] | None,
+    compression: str | int | None = None,
+    fillvalue: int | float | None = None,
 ) -> ch.AnonymousArrayCreationFunc:
-    if shape is None:
-        if data is None:
-            shape = (0,)
-
-        else:
-            raise EvalError("TODO")
-
     match data:
         case None:
             shape = shape or (0,)
-            dtype = dtype or "f"
 
-            return ch.empty.defer(shape=shape, dtype=dtype, chunks=chunks, maxshape=maxshape)
+        case int() | float():
+            if fillvalue is not None and fillvalue != data:
+                raise EvalError(f"Got conflicting fill values {data} and {fillvalue}")
+
+            # constants are stored as the fill value instead of being written
+            shape, fillvalue = shape or (1,), data
+
+        case _:
+            raise EvalError(f"Cannot create dataset from '{type(data).__name__}'")
+
+    dtype = dtype or "f"
+
+    try:
+        kind = np.dtype(dtype).kind
+
+    except TypeError as e:
+        raise EvalError(f"Unknown data type '{dtype}'") from e
+
+    if fillvalue is not None:
+        # HDF5 has no fill values for variable length strings, and casting would silently change the constant
+        if kind not in "biufc":
+            raise EvalError(f"Cannot fill a dataset of type {dtype} with the number {fillvalue}")
+
+        if kind in "biu" and np.asarray(fillvalue).astype(dtype).item() != fillvalue:
+            raise EvalError(f"Fill value {fillvalue} cannot be stored exactly as type {dtype}")
+
+    if isinstance(maxshape, tuple) and (
+        len(maxshape) != len(shape) or any(m is not None and m < n for m, n in zip(maxshape, shape))
+    ):
+        raise EvalError(f"Maximum shape {maxshape} is invalid for dataset of shape {shape}")
+
+    if isinstance(chunks, tuple):
+        # chunks cannot be larger than dimensions which cannot grow
+        limits = shape if maxshape is False else maxshape if isinstance(maxshape, tuple) else (None,) * len(shape)
+
+        if len(chunks) != len(shape) or any(c < 1 or (m is not None and c > m) for c, m in zip(chunks, limits)):
+            raise EvalError(f"Chunk shape {chunks} is invalid for dataset of shape {shape}")
+
+    if compression not in (None, "gzip", "lzf", "szip") and not (
+        isinstance(compression, int) and 0 <= compression <= 9
+    ):
+        raise EvalError(f"Unknown compression '{compression}', expected gzip, lzf, szip or a gzip level")
+
+    return functools.partial(
+        create_filled_dataset,
+        shape=shape,
+        dtype=dtype,
+        chunks=chunks,
+        maxshape=maxshape,
+        compression=compression,
+        fillvalue=fillvalue,
+    )
+
 
-        case 0:
-            shape = shape or (1,)
-            dtype = dtype or "f"
+def reduce(obj: EVAL_OBJECT, reduction: str, arguments: tuple[Any, ...] = ()) -> Any:
+    data = get_h5_object(obj) if type(obj) is ch.H5Array else obj
 
-            return ch.zeros.defer(shape=shape, dtype=dtype, chunks=chunks, maxshape=maxshape)
+    if not isinstance(data, (h5py.Dataset, np.ndarray)):
+        raise EvalError(f"Cannot compute {reduction} of '{type(obj).__name__}'")
 
-        case 1:
-            shape = shape or (1,)
-            dtype = dtype or "f"
+    if reduction == "stats" and isinstance(data, h5py.Dataset):
+        return dataset_stats(data)
 
-            return ch.ones.defer(shape=shape, dtype=dtype, chunks=chunks, maxshape=maxshape)
+    return reduce_data(data, reduction, arguments=arguments)
 
-        case int(value):
-            shape = shape or (1,)
-            dtype = dtype or "f"
 
-            return ch.ones.defer(shape=shape, dtype=dtype, chunks=chunks, maxshape=maxshape) * value
+def select_rows(
+    obj: EVAL_OBJECT,
+    target: Node | Literal[Special.context],
+    operator: str | None,
+    value: Any,
+    kind: Literal["select", "where"],
+) -> EVAL_OBJECT:
+    predicate = eval_statement(target, obj)
+    data = get_h5_object(predicate) if type(predicate) is ch.H5Array else predicate
+
+    if not isinstance(data, (h5py.Dataset, np.ndarray)):
+        raise EvalError(f"Cannot {kind} with a predicate on '{type(predicate).__name__}'")
+
+    ranges = match_ranges(data, operator, value)
+
+    if kind == "where":
+        return ranges_to_indices(ranges)
+
+    if target is Special.context:
+        return gather(data, ranges)
+
+    group = get_h5_object(obj)
+    if not isinstance(group, h5py.Group):
+        raise EvalError(f"Cannot select rows of '{type(obj).__name__}'")
+
+    # rows of sibling datasets are only read when they are accessed
+    return RowSelection(group, ranges, len(data))
+
+
+def context_path(context: EVAL_OBJECT) -> str | None:
+    h5_object = get_h5_object(context)
+    return None if h5_object is None else h5_object.name
+
+
+def statement_path(statement: Node | Literal[Special.context], root: str | None) -> str | None:
+    """Path in the file of the object (or attribute, after a '#') a statement refers to, None if unknown."""
+    match statement:
+        case Special.context:
+            return root
+
+        case Node(name="FileReference", value=value):
+            return f"@{value}:"
+
+        case Node(name="Get" | "GetAttr" | "Index", target=target, value=value):
+            parent = statement_path(target, root)
+
+            if parent is None or statement.name == "Index":
+                return parent
+
+            return f"{parent.rstrip('/')}/{value}" if statement.name == "Get" else f"{parent}#{value}"
+
+        case _:
+            return None
+
+
+def read_paths(statement: Node, root: str | None) -> tuple[list[str | None], list[str | None]]:
+    """Paths of the objects a write statement resolves, and of the objects it reads as a whole."""
+    match statement:
+        case Node(name="Del", target=target, value=value):
+            return [statement_path(value, statement_path(target, root))], []
+
+        case Node(name="Assign" | "Append", target=target, value=value):
+            match value:
+                case Node(name="Constant") | Node(name="Dataset", data=None | Node(name="Constant")):
+                    sources = []
+
+                case Node(name="Dataset", data=data) | Node(name="Link", source=data):
+                    sources = [data]
+
+                case _:
+                    sources = [value]
+
+            return [statement_path(target, root)], [statement_path(source, root) for source in sources]
+
+        case _:
+            return [], []
+
+
+def plan_statement(statement: Node, context: EVAL_OBJECT) -> Operation:
+    """Validate a write statement against the file and return the write it describes, without applying it."""
+    root = context_path(context)
+
+    match statement:
+        case Node(name="Assign", target=target, value=Node(name="Link", source=source, soft=soft)):
+            source = eval_statement(source, context)
+            obj, key = shallow_eval_statement(target, context)
+            return plan_link(source, obj, key, soft, statement_path(target, root) or str(key))
+
+        case Node(name="Assign", target=target, value=value):
+            value = eval_statement(value, context)
+            obj, key = shallow_eval_statement(target, context)
+            path = statement_path(target, root) or str(key)
+
+            if isinstance(obj, ch.H5Dict) and isinstance(key, str) and (source := get_h5_object(value)) is not None:
+                # objects of the file are copied by HDF5 directly instead of being read and written back
+                return plan_copy(source, obj, key, path)
+
+            return plan_set(obj, key, value, path)
+
+        case Node(name="Append", target=target, value=value):
+            value = eval_statement(value, context)
+            obj, key = shallow_eval_statement(target, context)
+            return plan_append(obj, key, value, statement_path(target, root) or str(key))
+
+        case Node(name="Del", target=target, value=value):
+            obj, key = shallow_eval_statement(value, eval_statement(target, context))
+            assert isinstance(key, str | int)
+            return plan_delete(obj, key, statement_path(value, statement_path(target, root)) or str(key))
 
         case _:
-            raise EvalError("TODO")
+            raise EvalError(f"Cannot write with statement '{statement.name}'")
 
 
-def eval_statement(statement: Node | Literal[Special.context], context: EVAL_OBJECT) -> EVAL_OBJECT:
+def eval_statement(
+    statement: Node | Literal[Special.context], context: EVAL_OBJECT, options: DisplayOptions = DisplayOptions()
+) -> EVAL_OBJECT:
     match statement:
         case Node(name="Display"):
-            display(context)
+            if isinstance(context, RowSelection):
+                context = context.as_dict()
+
+            if options.output == "rich":
+                display(context, options)
+            else:
+                serialize(context, options)
 
         case Node(name="Keys"):
             context = get_keys(context)
@@ -201,32 +702,238 @@ def eval_statement(statement: Node | Literal[Special.context], context: EVAL_OBJ
         case Node(name="Size"):
             context = get_sizes(context)
 
+        case Node(name="Reduction", value=value, arguments=arguments):
+            context = reduce(context, value, arguments)
+
+        case Node(name="Select" | "Where" as name, target=target, operator=operator, value=value):
+            context = select_rows(context, target, operator, value, "select" if name == "Select" else "where")
+
         case Node(name="Get", target=target, value=value):
             context = get_object(eval_statement(target, context), value)
 
         case Node(name="GetAttr", target=target, value=value):
             context = get_attribute(eval_statement(target, context), value)
 
-        case Node(name="Assign", target=target, value=value):
-            value = eval_statement(value, context)
-            context, key = shallow_eval_statement(target, context)
-            set_key_value(context, key, value)
+        case Node(name="Index", target=target, value=value):
+            context = get_index(eval_statement(target, context), value)
 
-        case Node(name="Del", target=target, value=value):
-            context = eval_statement(target, context)
-            context, value = shallow_eval_statement(value, context)
-            del_object(context, value)
+        case Node(name="Assign" | "Append" | "Del"):
+            plan_statement(statement, context).apply()
 
         case Node(name="Constant", value=value):
             context = value
 
-        case Node(name="Dataset", data=data, shape=shape, dtype=dtype, chunks=chunks, maxshape=maxshape):
+        case Node(name="FileReference", value=value):
+            context = open_file_reference(str(value))
+
+        case Node(
+            name="Dataset",
+            data=data,
+            shape=shape,
+            dtype=dtype,
+            chunks=chunks,
+            maxshape=maxshape,
+            compression=compression,
+            fillvalue=fillvalue,
+        ):
             data = None if data is None else eval_statement(data, context)
-            context = create_dataset(data, shape, dtype, chunks, maxshape)
+            context = create_dataset(data, shape, dtype, chunks, maxshape, compression, fillvalue)
 
     return context
 
 
-def eval(tree: Tree, context: EVAL_OBJECT) -> None:
-    for statement in tree.body:
-        context = eval_statement(statement, context)
+def _is_write_statement(statement: Node) -> bool:
+    return statement.name in ("Assign", "Append", "Del")
+
+
+Mode = Literal["apply", "validate", "dry_run"]
+
+
+def shadow_context(context: EVAL_OBJECT) -> tuple[ch.File, EVAL_OBJECT]:
+    """
+    Get the object at the same path as `context` in a hollow in-memory copy of its file (see hollow_copy), to which
+    writes can be applied to validate the statements depending on them without modifying the file.
+    """
+    h5_object = get_h5_object(context)
+    assert h5_object is not None
+
+    # the copy stays in memory, named after the file so that relative external links resolve the same way
+    shadow = ch.File(f"{h5_object.file.filename}.hdfq-shadow", "w", driver="core", backing_store=False)
+    hollow_copy(h5_object.file, h5py.File(shadow.id))
+
+    root = ch.H5Dict(shadow)
+    return shadow, root if h5_object.name == "/" else root[h5_object.name.lstrip("/")]
+
+
+@dataclass
+class _Evaluation:
+    context: EVAL_OBJECT
+    mode: Mode
+    plan: WritePlan = field(default_factory=WritePlan)
+    statements: list[Node] = field(default_factory=list)
+    shadow: ch.File | None = None
+
+    def add(self, statement: Node) -> None:
+        self.plan.add(plan_statement(statement, self.context))
+        self.statements.append(statement)
+
+    def commit(self, final: bool = False) -> None:
+        if self.mode == "apply":
+            h5_object = get_h5_object(self.context)
+            self.plan.apply(None if h5_object is None else h5_object.file)
+
+        else:
+            if self.mode == "dry_run":
+                print(self.plan, flush=True)
+
+            if final or get_h5_object(self.context) is None:
+                self.plan.clear()
+
+            elif self.shadow is None:
+                # writes were planned against the file, they are planned again against its copy to be applied there
+                self.plan.clear()
+                self.shadow, self.context = shadow_context(self.context)
+                for statement in self.statements:
+                    plan_statement(statement, self.context).apply()
+
+            else:
+                self.plan.apply(None)
+
+        self.statements.clear()
+
+    def close(self) -> None:
+        if self.shadow is not None:
+            self.shadow.close()
+
+
+def _evaluate(tree: Tree, context: EVAL_OBJECT, options: DisplayOptions, mode: Mode) -> None:
+    evaluation = _Evaluation(context, mode)
+    last_write = max((i for i, statement in enumerate(tree.body) if _is_write_statement(statement)), default=-1)
+
+    try:
+        for index, statement in enumerate(tree.body):
+            if mode == "validate" and index > last_write:
+                break
+
+            if _is_write_statement(statement):
+                plan = evaluation.plan
+                if plan and plan.depends_on(*read_paths(statement, context_path(evaluation.context))):
+                    evaluation.commit()
+
+                evaluation.add(statement)
+                continue
+
+            if evaluation.plan:
+                evaluation.commit()
+
+            if mode == "apply" or statement.name != "Display":
+                evaluation.context = eval_statement(statement, evaluation.context, options)
+
+        if evaluation.plan and mode != "validate":
+            evaluation.commit(final=True)
+
+    finally:
+        evaluation.close()
+
+
+def eval(tree: Tree, context: EVAL_OBJECT, options: DisplayOptions = DisplayOptions(), dry_run: bool = False) -> None:
+    """
+    Evaluate statements of a filter in order. Consecutive write statements are validated first and applied together
+    (see WritePlan), except when a statement depends on objects written by previous ones.
+
+    Before the first write, the whole filter up to its last write statement is validated against a hollow in-memory
+    copy of the file, to which planned writes are applied when later statements depend on them. An invalid statement
+    thus leaves the file untouched. Errors raised while actually writing (e.g. I/O errors) or by the values of
+    datasets read between two writes, which the copy does not have, are not caught by validation : writes applied
+    before such an error are kept.
+
+    With `dry_run`, the writes are printed instead of being applied and nothing is displayed.
+    """
+    if dry_run:
+        _evaluate(tree, context, options, "dry_run")
+        return
+
+    if any(_is_write_statement(statement) for statement in tree.body):
+        _evaluate(tree, context, options, "validate")
+
+    _evaluate(tree, context, options, "apply")
+
+
+class NotIndexed(Exception):
+    pass
+
+
+def _is_indexed_dict(obj: Any) -> bool:
+    # groups storing ch5mpy objects or lists are not read as dictionaries
+    return isinstance(obj, IndexedGroup) and obj.kind not in ("object", "list")
+
+
+def _has_indexed_attributes(obj: Any) -> bool:
+    # like get_attribute_keys : only dictionaries and arrays have attributes, scalar datasets are read as values.
+    # Groups with any other '__h5_type__' are read as dictionaries showing it, which the index does not record
+    if isinstance(obj, IndexedDataset):
+        return len(obj.shape) > 0
+
+    return isinstance(obj, IndexedGroup) and obj.kind == "dict"
+
+
+def _has_hard_links(group: IndexedGroup) -> bool:
+    # which of the paths to an object is counted in sizes depends on where they are walked from
+    return any(
+        (isinstance(child, IndexedLink) and child.hard) or (isinstance(child, IndexedGroup) and _has_hard_links(child))
+        for child in group.children.values()
+    )
+
+
+def eval_index_statement(statement: Node | Literal[Special.context], context: Any) -> Any:
+    match statement:
+        case Special.context:
+            return context
+
+        case Node(name="Keys") if _is_indexed_dict(context):
+            return list(context.children)
+
+        case Node(name="AttrKeys") if _has_indexed_attributes(context):
+            return list(context.attrs)
+
+        case Node(name="Size") if _is_indexed_dict(context) and not _has_hard_links(context):
+            return get_sizes_core(context)[1]
+
+        case Node(name="Get", target=target, value=value):
+            context = eval_index_statement(target, context)
+            if _is_indexed_dict(context) and value in context.children:
+                return context.children[value]
+
+        case Node(name="GetAttr", target=target, value=value):
+            context = eval_index_statement(target, context)
+            if _has_indexed_attributes(context) and context.attrs.get(value) is not None:
+                return context.attrs[value]
+
+    raise NotIndexed
+
+
+def eval_index(tree: Tree, root: IndexedGroup, options: DisplayOptions = DisplayOptions()) -> bool:
+    """
+    Evaluate a read-only filter using only a sidecar index of the file. Nothing is displayed and False is returned if
+    the filter needs anything not recorded in the index, in which case it must be evaluated on the file.
+    """
+    context, to_display = root, []
+
+    try:
+        for statement in tree.body:
+            if isinstance(statement, Node) and statement.name == "Display":
+                if isinstance(context, (IndexedGroup, IndexedDataset, IndexedLink)):
+                    raise NotIndexed
+
+                to_display.append(context)
+
+            else:
+                context = eval_index_statement(statement, context)
+
+    except NotIndexed:
+        return False
+
+    for value in to_display:
+        eval_statement(Nodes.Display(), value, options)
+
+    return True
@@ -38,7 +38,7 @@ class GetStatementContext(ContextInfo):
 
 @dataclass
 class BinaryOpContext(ContextInfo):
-    kind: Literal["assignment"]
+    kind: Literal["assignment", "append"]
     side: Literal["left", "right"]
 
     def __repr__(self) -> str:
@@ -47,7 +47,7 @@ class BinaryOpContext(ContextInfo):
 
 @dataclass
 class FunctionCallContext(ContextInfo):
-    kind: Literal["del"]
+    kind: Literal["del", "link", "quantiles", "histogram", "select", "where", "topk", "value_counts"]
 
     def __repr__(self) -> str:
         return f" while parsing arguments of {self.kind} function"
@@ -59,6 +59,12 @@ class DatasetCreationContext(ContextInfo):
         return " while parsing arguments for dataset creation"
 
 
+@dataclass
+class IndexContext(ContextInfo):
+    def __repr__(self) -> str:
+        return " while parsing index"
+
+
 class ParseError(Exception):
     def __init__(self, msg: str = "", context: ContextInfo | None = None) -> None:
         super().__init__(msg)
@@ -0,0 +1,175 @@
+import io
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack, redirect_stdout
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import ch5mpy as ch
+
+from hdfq.display import DisplayOptions
+from hdfq.evaluation import eval as hdfq_eval
+from hdfq.evaluation import eval_index
+from hdfq.index import load_index
+from hdfq.parser import Tree, parse
+from hdfq.serialize import dumps
+
+WINDOW = 4  # files submitted per worker ahead of the results being written, bounding the results held in memory
+
+
+@dataclass(frozen=True)
+class FileResult:
+    path: Path
+    outputs: list[str]
+    error: str | None = None
+
+
+_TREES: list[Tree] = []
+_REQUIRES_WRITE_ACCESS: bool = False
+_OPTIONS: DisplayOptions = DisplayOptions()
+_DRY_RUN: bool = False
+
+
+def _init_worker(trees: list[Tree], requires_write_access: bool, options: DisplayOptions, dry_run: bool) -> None:
+    # parsed filters are sent once to each worker process instead of once per file
+    global _TREES, _REQUIRES_WRITE_ACCESS, _OPTIONS, _DRY_RUN
+    _TREES, _REQUIRES_WRITE_ACCESS, _OPTIONS, _DRY_RUN = trees, requires_write_access, options, dry_run
+
+
+def evaluate_file(path: Path) -> FileResult:
+    """Evaluate the worker's filters on a file, capturing the output of each filter."""
+    mode = ch.H5Mode.READ_WRITE if _REQUIRES_WRITE_ACCESS and not _DRY_RUN else ch.H5Mode.READ
+    outputs: list[str] = []
+
+    try:
+        # like run_batch, the file is only opened for filters which cannot be answered from its index
+        index = None if _REQUIRES_WRITE_ACCESS else load_index(path)
+
+        with ch.options(error_mode="ignore"), ExitStack() as stack:
+            h5_object = None
+
+            for tree in _TREES:
+                output = io.StringIO()
+                with redirect_stdout(output):
+                    if index is None or not eval_index(tree, index, _OPTIONS):
+                        if h5_object is None:
+                            h5_object = stack.enter_context(ch.H5Dict.read(path, mode=mode))
+
+                        hdfq_eval(tree, h5_object, _OPTIONS, _DRY_RUN)
+
+                outputs.append(output.getvalue())
+
+    except Exception as e:
+        return FileResult(path, outputs, f"{type(e).__name__}: {e}")
+
+    return FileResult(path, outputs)
+
+
+def iter_results(paths: list[Path], jobs: int, ordered: bool) -> Iterator[FileResult]:
+    if jobs == 1:
+        yield from map(evaluate_file, paths)
+        return
+
+    queue = deque(paths)
+    pending: dict[Future[FileResult], Path] = {}  # in submission order
+
+    while queue or pending:
+        try:
+            with ProcessPoolExecutor(
+                max_workers=jobs,
+                initializer=_init_worker,
+                initargs=(_TREES, _REQUIRES_WRITE_ACCESS, _OPTIONS, _DRY_RUN),
+            ) as executor:
+                while queue or pending:
+                    while queue and len(pending) < jobs * WINDOW:
+                        future = executor.submit(evaluate_file, queue[0])
+                        pending[future] = queue.popleft()
+
+                    if ordered:
+                        future = next(iter(pending))
+                    else:
+                        future = next(iter(wait(pending, return_when=FIRST_COMPLETED).done))
+
+                    result = future.result()
+                    del pending[future]
+                    yield result
+
+        except BrokenProcessPool as e:
+            # a worker died (e.g. killed, or crashed in the HDF5 library) : which of the files it was given caused it is
+            # unknown, files in flight which did not complete are reported and the others go to a new pool
+            for future, path in pending.items():
+                failed = not future.done() or future.exception() is not None
+                yield FileResult(path, [], f"{type(e).__name__}: {e}") if failed else future.result()
+
+            pending.clear()
+
+
+def unique_files(paths: list[Path]) -> list[Path]:
+    """Drop paths to files already in the list, e.g. through hard links, so that no file is evaluated twice."""
+    seen: set[tuple[int, int]] = set()
+    unique = []
+
+    for path in paths:
+        try:
+            stat = path.stat()
+
+        except OSError:
+            # reported when evaluating the file
+            unique.append(path)
+            continue
+
+        if (stat.st_dev, stat.st_ino) not in seen:
+            seen.add((stat.st_dev, stat.st_ino))
+            unique.append(path)
+
+    return unique
+
+
+def format_result(result: FileResult, options: DisplayOptions, delimiter: str) -> str:
+    if options.output in ("json", "ndjson"):
+        # tag every line with the file it comes from, and the filter which produced it when there are many
+        tags = [
+            f'{{"path":{dumps(str(result.path))},' + (f'"filter":{index},' if len(result.outputs) > 1 else "")
+            for index in range(len(result.outputs))
+        ]
+        return "".join(
+            f'{tag}"value":{line}}}\n' for tag, output in zip(tags, result.outputs) for line in output.splitlines()
+        )
+
+    separator = f"{delimiter}\n" if delimiter else ""
+    return f"==> {result.path} <==\n" + separator.join(result.outputs)
+
+
+def run_many(
+    filters: Iterable[str],
+    paths: list[Path],
+    options: DisplayOptions = DisplayOptions(),
+    delimiter: str = "---",
+    jobs: int = 1,
+    ordered: bool = True,
+    dry_run: bool = False,
+) -> bool:
+    """
+    Evaluate filters on many files with a pool of processes (h5py serializes calls to the HDF5 library so threads
+    would not help). Results are tagged by file name and written in input order, or as soon as they are available
+    when `ordered` is False. Files given more than once (by the same path or through links) are only evaluated once.
+    Return whether all files were processed without error.
+    """
+    trees = [parse(filter) for filter in filters]
+    _init_worker(
+        [tree for tree, _ in trees], any(requires_write_access for _, requires_write_access in trees), options, dry_run
+    )
+
+    success = True
+    for result in iter_results(unique_files(paths), jobs, ordered):
+        sys.stdout.write(format_result(result, options, delimiter))
+        sys.stdout.flush()
+
+        if result.error is not None:
+            print(f"hdfq: {result.path}: {result.error}", file=sys.stderr)
+            success = False
+
+    return success
@@ -1,15 +1,58 @@
+from contextlib import ExitStack
 from pathlib import Path
+from typing import Iterable
 
 import ch5mpy as ch
 
+from hdfq.display import DisplayOptions
 from hdfq.evaluation import eval as hdfq_eval
+from hdfq.evaluation import eval_index
+from hdfq.index import load_index
 from hdfq.parser import parse
 
 
-def run(filter: str, path: Path) -> None:
+def run(filter: str, path: Path, options: DisplayOptions = DisplayOptions(), dry_run: bool = False) -> None:
     tree, requires_write_access = parse(filter)
-    mode = ch.H5Mode.READ_WRITE if requires_write_access else ch.H5Mode.READ
+
+    # read-only filters on metadata can be answered from an up-to-date sidecar index without opening the file
+    if not requires_write_access and (index := load_index(path)) is not None and eval_index(tree, index, options):
+        return
+
+    mode = ch.H5Mode.READ_WRITE if requires_write_access and not dry_run else ch.H5Mode.READ
 
     with ch.options(error_mode="ignore"):
         h5_object = ch.H5Dict.read(path, mode=mode)
-        hdfq_eval(tree, h5_object)
+        hdfq_eval(tree, h5_object, options, dry_run)
+
+
+def run_batch(
+    filters: Iterable[str],
+    path: Path,
+    options: DisplayOptions = DisplayOptions(),
+    delimiter: str = "---",
+    dry_run: bool = False,
+) -> None:
+    """
+    Evaluate filters in order on a file opened only once. All filters are parsed before the file is opened, so that
+    a syntax error in any of them leaves the file untouched. When all filters are read-only, those that can be
+    answered from an up-to-date sidecar index are, and the file is only opened for the others.
+    """
+    trees = [parse(filter) for filter in filters]
+    requires_write_access = any(requires_write_access for _, requires_write_access in trees)
+    mode = ch.H5Mode.READ_WRITE if requires_write_access and not dry_run else ch.H5Mode.READ
+    index = None if requires_write_access else load_index(Path(path))
+
+    with ch.options(error_mode="ignore"), ExitStack() as stack:
+        h5_object = None
+
+        for position, (tree, _) in enumerate(trees):
+            if position and delimiter:
+                print(delimiter, flush=True)
+
+            if index is not None and eval_index(tree, index, options):
+                continue
+
+            if h5_object is None:
+                h5_object = stack.enter_context(ch.H5Dict.read(path, mode=mode))
+
+            hdfq_eval(tree, h5_object, options, dry_run)
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, ItemsView
+
+import ch5mpy as ch
+import h5py
+import numpy as np
+
+INDEX_SUFFIX = ".hdfqidx"
+INDEX_VERSION = 2
+
+
+@dataclass
+class IndexedDataset:
+    shape: tuple[int, ...]
+    dtype: str
+    storage: int
+    logical: int
+    chunks: int | None = None
+    chunk_shape: tuple[int, ...] | None = None
+    attrs: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class IndexedLink:
+    # soft or external link, or hard link to an object indexed at another path : only its target is recorded
+    target: str
+    hard: bool = False
+
+
+@dataclass
+class IndexedGroup:
+    # value of the '__h5_type__' attribute ch5mpy uses to store objects and lists as groups, 'dict' for plain groups
+    kind: str = "dict"
+    children: dict[str, IndexedGroup | IndexedDataset | IndexedLink] = field(default_factory=dict)
+    attrs: dict[str, Any] = field(default_factory=dict)
+
+    def items(self) -> ItemsView[str, IndexedGroup | IndexedDataset | IndexedLink]:
+        return self.children.items()
+
+
+def index_path(path: Path) -> Path:
+    return path.with_name(path.name + INDEX_SUFFIX)
+
+
+def file_state(path: Path) -> dict[str, int]:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _attribute_value(value: Any) -> Any:
+    # only keep attribute values that survive a round trip through JSON, others (e.g. bytes) are read from the file
+    # when needed
+    if isinstance(value, np.generic):
+        value = value.item()
+
+    # ch5mpy stores None as a marker string
+    return value if isinstance(value, (str, int, float, bool)) and value != "__h5_NONE__" else None
+
+
+def _index_attributes(obj: ch.Group | ch.Dataset[Any]) -> dict[str, Any]:
+    # the type ch5mpy stores objects and lists as is recorded as the kind of groups, not as an attribute
+    return {key: _attribute_value(value) for key, value in obj.attrs.items() if key != "__h5_type__"}
+
+
+def _index_child(group: ch.Group, key: str, indexed: dict[int, str]) -> IndexedGroup | IndexedDataset | IndexedLink:
+    link = group.get(key, getlink=True)
+
+    if isinstance(link, h5py.SoftLink):
+        return IndexedLink(link.path)
+
+    if isinstance(link, h5py.ExternalLink):
+        return IndexedLink(f"{link.filename}:{link.path}")
+
+    obj = group[key]
+    address = h5py.h5o.get_info(obj.id).addr
+
+    if address in indexed:
+        return IndexedLink(indexed[address], hard=True)
+
+    indexed[address] = obj.name
+    return index_object(obj, indexed)
+
+
+def index_object(
+    obj: ch.Group | ch.Dataset[Any], indexed: dict[int, str] | None = None
+) -> IndexedGroup | IndexedDataset:
+    # `indexed` maps the addresses of objects already indexed to their path, links to them are recorded as such
+    if isinstance(obj, ch.Dataset):
+        return IndexedDataset(
+            shape=obj.shape,
+            dtype=str(obj.dtype),
+            storage=obj.id.get_storage_size(),
+            logical=obj.size * obj.dtype.itemsize,
+            chunks=None if obj.chunks is None else obj.id.get_num_chunks(),
+            chunk_shape=obj.chunks,
+            attrs=_index_attributes(obj),
+        )
+
+    indexed = {h5py.h5o.get_info(obj.id).addr: obj.name} if indexed is None else indexed
+    kind = obj.attrs.get("__h5_type__", "dict")
+    return IndexedGroup(
+        kind=kind.decode() if isinstance(kind, bytes) else str(kind),
+        children={key: _index_child(obj, key, indexed) for key in obj.keys()},
+        attrs=_index_attributes(obj),
+    )
+
+
+def _to_json(node: IndexedGroup | IndexedDataset | IndexedLink) -> dict[str, Any]:
+    if isinstance(node, IndexedDataset):
+        return {"type": "dataset", **node.__dict__}
+
+    if isinstance(node, IndexedLink):
+        return {"type": "link", "target": node.target, "hard": node.hard}
+
+    return {
+        "type": "group",
+        "kind": node.kind,
+        "attrs": node.attrs,
+        "children": {key: _to_json(child) for key, child in node.children.items()},
+    }
+
+
+def _from_json(node: dict[str, Any]) -> IndexedGroup | IndexedDataset | IndexedLink:
+    kind = node.pop("type")
+
+    if kind == "link":
+        return IndexedLink(node["target"], node["hard"])
+
+    if kind == "dataset":
+        shape, chunk_shape = node.pop("shape"), node.pop("chunk_shape")
+        return IndexedDataset(
+            shape=tuple(shape), chunk_shape=None if chunk_shape is None else tuple(chunk_shape), **node
+        )
+
+    children = {key: _from_json(child) for key, child in node.pop("children").items()}
+    return IndexedGroup(children=children, **node)
+
+
+def build_index(path: Path) -> Path:
+    """Walk all the metadata of a HDF5 file once and save it to a sidecar index file."""
+    # the state is recorded before walking the file : a file modified in the meantime leaves a stale index
+    state = file_state(path)
+
+    with ch.File(path, mode=ch.H5Mode.READ) as file:
+        root = index_object(file)
+
+    destination = index_path(path)
+    tmp_destination = destination.with_name(destination.name + ".tmp")
+
+    with open(tmp_destination, "w") as index_file:
+        json.dump({"version": INDEX_VERSION, "file": state, "root": _to_json(root)}, index_file)
+
+    tmp_destination.replace(destination)
+    return destination
+
+
+def load_index(path: Path) -> IndexedGroup | None:
+    """Load the sidecar index of a file, or None if there is none or if the file changed since it was built."""
+    try:
+        with open(index_path(path)) as index_file:
+            index = json.load(index_file)
+
+    except (OSError, ValueError):
+        return None
+
+    if index.get("version") != INDEX_VERSION or index.get("file") != file_state(path):
+        return None
+
+    root = _from_json(index["root"])
+    return root if isinstance(root, IndexedGroup) else None
@@ -53,6 +53,9 @@ def lex(string: str) -> Token:
         case Syntax.comma:
             return tokens.COMMA
 
+        case Syntax.colon:
+            return tokens.COLON
+
         case Syntax.equal:
             return tokens.EQUAL
 
@@ -80,10 +83,36 @@ def lex(string: str) -> Token:
         case Syntax.pipe:
             return tokens.PIPE
 
+        case Syntax.plus:
+            return tokens.PLUS
+
+        case Syntax.exclamation_mark:
+            return tokens.EXCLAMATION_MARK
+
+        case Syntax.ampersand:
+            return tokens.AMPERSAND
+
         case _:
             raise SyntaxError(f"Syntax error at : '{string}'")
 
 
+# references to objects of other files look like '@path/to/file.h5:.object', paths with spaces must be quoted
+FILE_REFERENCE = re.compile(r"""@("[^"]+"|'[^']+'|[^\s:'"]+):""")
+
+# floats are lexed whole to keep leading zeros of their decimal part, but not after a dot : '.list.0.1' is a path
+FLOAT = re.compile(r"(?<![\w.])(-?\d+\.\d+)(?![\w.])")
+
+
 def tokenize(string: str) -> Iterable[Token]:
-    for s in filter(None, re.split(r"([^a-zA-Z0-9_'\"-])", string.replace(" ", ""))):
-        yield lex(s)
+    for index, part in enumerate(FILE_REFERENCE.split(string)):
+        if index % 2:
+            yield tokens.FILE_REFERENCE(value=part.strip("'\""))
+            continue
+
+        for float_index, float_part in enumerate(FLOAT.split(part.replace(" ", ""))):
+            if float_index % 2:
+                yield tokens.FLOAT(value=float(float_part))
+                continue
+
+            for s in filter(None, re.split(r"([^a-zA-Z0-9_'\"-])", float_part)):
+                yield lex(s)
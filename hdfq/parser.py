@@ -13,6 +13,7 @@ from hdfq.exceptions import (
     DatasetCreationContext,
     FunctionCallContext,
     GetStatementContext,
+    IndexContext,
     ParseError,
 )
 from hdfq.lexer import Token, tokenize
@@ -43,7 +44,7 @@ class VNode(Node):
 @dataclass
 class VTNode(Node):
     target: Literal[Special.context] | Node
-    value: str | Node
+    value: str | Node | tuple[int | slice, ...]
 
     def __repr__(self) -> str:
         return f"{self.name}(target={self.target}, value={self.value})"
@@ -57,8 +58,29 @@ class DatasetNode(Node):
     data: str | Node | None
     shape: tuple[int, ...] | None
     dtype: str | None
-    chunks: bool
+    chunks: bool | tuple[int, ...]
     maxshape: bool | tuple[int | None, ...] | None
+    compression: str | int | None = None
+    fillvalue: int | float | None = None
+
+
+@dataclass
+class LinkNode(Node):
+    source: Node
+    soft: bool
+
+
+@dataclass
+class SelectionNode(Node):
+    target: Literal[Special.context] | Node
+    operator: str | None
+    value: int | float | bool | None
+
+
+@dataclass
+class ReductionNode(Node):
+    value: str
+    arguments: tuple[int | float, ...] = ()
 
 
 class Nodes(functools.partial[Node], Enum):
@@ -68,11 +90,18 @@ class Nodes(functools.partial[Node], Enum):
     AttrKeys = functools.partial(Node, "AttrKeys")
     Sizes = functools.partial(Node, "Size")
     Constant = functools.partial(VNode, "Constant")
+    FileReference = functools.partial(VNode, "FileReference")
+    Reduction = functools.partial(ReductionNode, "Reduction")
     Get = functools.partial(VTNode, name="Get")
     GetAttr = functools.partial(VTNode, name="GetAttr")
+    Index = functools.partial(VTNode, name="Index")
     Assign = functools.partial(VTNode, name="Assign")
+    Append = functools.partial(VTNode, name="Append")
     Del = functools.partial(VTNode, name="Del")
     Dataset = functools.partial(DatasetNode, name="Dataset")
+    Link = functools.partial(LinkNode, name="Link")
+    Select = functools.partial(SelectionNode, name="Select")
+    Where = functools.partial(SelectionNode, name="Where")
 
 
 class Tree:
@@ -93,6 +122,9 @@ def match_atom(tokens: list[Token]) -> Node | None:
         case [Token(Syntax.integer, value=value)] | [Token(Syntax.identifier, value=value)]:
             return Nodes.Constant(value=value)
 
+        case [Token(Syntax.float, value=value)]:
+            return Nodes.Constant(value=value)
+
         # match float of type ".123"
         # case [hdfq.tokens.DOT, *right] if _all_int(right):
         #     return Nodes.Constant(value=float("." + "".join(str(t.value) for t in right)))
@@ -180,6 +212,27 @@ def match_dtype(dtype: str | None, tokens: list[Token]) -> str | None:
             return dtype
 
 
+def match_fillvalue(tokens: list[Token]) -> int | float:
+    match match_atom(tokens):
+        case VNode(value=int(value) | float(value)):
+            return value
+
+        case VNode(value="nan" | "inf" as value):
+            return float(value)
+
+        case _:
+            raise ParseError(f"Got unexpected fill value {repr_tokens(tokens)}", context=DatasetCreationContext())
+
+
+def is_dataset_detail(tokens: list[Token]) -> bool:
+    match tokens:
+        case [Token(Syntax.identifier), hdfq.tokens.EQUAL, *_]:
+            return True
+
+        case _:
+            return False
+
+
 def match_dataset(tokens: list[Token]) -> DatasetNode | None:
     try:
         rb_index = tokens.index(hdfq.tokens.RIGHT_BRACKET)
@@ -195,9 +248,17 @@ def match_dataset(tokens: list[Token]) -> DatasetNode | None:
         case [hdfq.tokens.LEFT_BRACKET, *content]:
             data_part, *details = split_at_commas(content)
 
-            data = match_atom(data_part[:-1]) or match_get_statement(data_part[:-1])  # :-1 because of trailing commas
-            if data is None:
-                raise ParseError(f"Got unexpected pattern {repr_tokens(data_part)}", context=DatasetCreationContext())
+            if is_dataset_detail(data_part):
+                # no data, e.g. '[fillvalue=-1](100)'
+                data, details = None, [data_part, *details]
+
+            else:
+                # :-1 because of trailing commas
+                data = match_atom(data_part[:-1]) or match_get_statement(data_part[:-1])
+                if data is None:
+                    raise ParseError(
+                        f"Got unexpected pattern {repr_tokens(data_part)}", context=DatasetCreationContext()
+                    )
 
             dataset = cast(DatasetNode, Nodes.Dataset(data=data, shape=None, dtype=None, chunks=True, maxshape=None))
 
@@ -234,6 +295,32 @@ def match_dataset(tokens: list[Token]) -> DatasetNode | None:
 
                         dataset.maxshape = maxshape
 
+                    case [
+                        Token(Syntax.identifier, value="chunks"),
+                        hdfq.tokens.EQUAL,
+                        *shape,
+                        hdfq.tokens.RIGHT_PARENTHESIS,
+                        hdfq.tokens.COMMA,
+                    ]:
+                        chunks = match_shape(None, shape)
+                        if chunks is None:
+                            raise ParseError(
+                                f"Got unexpected chunk shape {repr_tokens(shape)}", context=DatasetCreationContext()
+                            )
+
+                        dataset.chunks = chunks
+
+                    case [
+                        Token(Syntax.identifier, value="compression"),
+                        hdfq.tokens.EQUAL,
+                        Token(Syntax.identifier | Syntax.integer, value=str(compression) | int(compression)),
+                        hdfq.tokens.COMMA,
+                    ]:
+                        dataset.compression = compression
+
+                    case [Token(Syntax.identifier, value="fillvalue"), hdfq.tokens.EQUAL, *value, hdfq.tokens.COMMA]:
+                        dataset.fillvalue = match_fillvalue(value)
+
                     case _:
                         raise ParseError("TODO")
 
@@ -250,6 +337,47 @@ def match_dataset(tokens: list[Token]) -> DatasetNode | None:
     return dataset
 
 
+def split_on(tokens: list[Token], separator: Token) -> list[list[Token]]:
+    parts: list[list[Token]] = [[]]
+
+    for token in tokens:
+        if token == separator:
+            parts.append([])
+        else:
+            parts[-1].append(token)
+
+    return parts
+
+
+def match_slice_bound(tokens: list[Token]) -> int | None:
+    match tokens:
+        case []:
+            return None
+
+        case [Token(Syntax.integer, value=int(value))]:
+            return value
+
+        case _:
+            raise ParseError(f"Got unexpected slice bound {repr_tokens(tokens)}", context=IndexContext())
+
+
+def match_index(tokens: list[Token]) -> tuple[int | slice, ...]:
+    index: list[int | slice] = []
+
+    for axis in split_on(tokens, hdfq.tokens.COMMA):
+        match split_on(axis, hdfq.tokens.COLON):
+            case [[Token(Syntax.integer, value=int(value))]]:
+                index.append(value)
+
+            case [_, _] | [_, _, _] as bounds:
+                index.append(slice(*map(match_slice_bound, bounds)))
+
+            case _:
+                raise ParseError(f"Got unexpected pattern {repr_tokens(axis)}", context=IndexContext())
+
+    return tuple(index)
+
+
 def matches_whole(tokens: list[Token], allow_empty: bool) -> bool:
     match tokens:
         case []:
@@ -262,10 +390,38 @@ def matches_whole(tokens: list[Token], allow_empty: bool) -> bool:
             return False
 
 
+def match_target(
+    tokens: list[Token], *, allow_get_attr: bool = True, context: ContextInfo | None
+) -> Literal[Special.context] | Node:
+    match tokens:
+        case []:
+            return Special.context
+
+        case [Token(Syntax.file_reference, value=value)]:
+            return Nodes.FileReference(value=value)
+
+        case _:
+            return match_get_statement(tokens, allow_get_attr=allow_get_attr, context=context)
+
+
+def refers_to_file(node: Literal[Special.context] | Node | None) -> bool:
+    while isinstance(node, VTNode):
+        node = node.target
+
+    return isinstance(node, Node) and node.name == "FileReference"
+
+
 def match_get_object(tokens: list[Token], *, allow_get_attr: bool, context: ContextInfo | None) -> VTNode:
     match tokens:
+        case [*left, hdfq.tokens.RIGHT_BRACKET] if hdfq.tokens.LEFT_BRACKET in left:
+            lb_index = len(left) - 1 - left[::-1].index(hdfq.tokens.LEFT_BRACKET)
+            left, index = left[:lb_index], left[lb_index + 1 :]
+
+            target = match_target(left, context=context)
+            return cast(VTNode, Nodes.Index(target=target, value=match_index(index)))
+
         case [*left, hdfq.tokens.DOT, Token(Syntax.identifier | Syntax.integer, value=value)]:
-            target = match_get_statement(left, context=context) if len(left) else Special.context
+            target = match_target(left, context=context)
             return cast(VTNode, Nodes.Get(target=target, value=value))
 
         case [*left, hdfq.tokens.OCTOTHORPE, Token(Syntax.identifier, value=value)]:
@@ -276,7 +432,7 @@ def match_get_object(tokens: list[Token], *, allow_get_attr: bool, context: Cont
 
             if context is None:
                 context = GetStatementContext(second=str(value))
-            target = match_get_statement(left, allow_get_attr=False, context=context) if len(left) else Special.context
+            target = match_target(left, allow_get_attr=False, context=context)
             return cast(VTNode, Nodes.GetAttr(target=target, value=value))
 
         case _:
@@ -295,9 +451,94 @@ def match_get_statement_all(
     if matches_whole(tokens, allow_empty=allow_empty):
         return None
 
+    match tokens:
+        case [Token(Syntax.file_reference, value=value)] | [Token(Syntax.file_reference, value=value), hdfq.tokens.DOT]:
+            return Nodes.FileReference(value=value)
+
     return match_get_statement(tokens, context=context)
 
 
+def match_link(tokens: list[Token]) -> LinkNode | None:
+    match tokens:
+        case [
+            Token(Syntax.identifier, value="link"),
+            hdfq.tokens.LEFT_PARENTHESIS,
+            *arguments,
+            hdfq.tokens.RIGHT_PARENTHESIS,
+        ]:
+            context = FunctionCallContext("link")
+
+            match split_on(arguments, hdfq.tokens.COMMA):
+                case [source]:
+                    soft = False
+
+                case [
+                    source,
+                    [Token(Syntax.identifier, value="soft"), hdfq.tokens.EQUAL, Token(Syntax.boolean, value=soft)],
+                ]:
+                    pass
+
+                case _:
+                    raise ParseError(f"Got unexpected pattern {repr_tokens(arguments)}", context=context)
+
+            source = match_get_statement(source, context=context)
+            return cast(LinkNode, Nodes.Link(source=source, soft=cast(bool, soft)))
+
+        case _:
+            return None
+
+
+def match_rows(tokens: list[Token]) -> list[Any] | None:
+    # list of numbers, nested for rows of several values : "[1, 2]" or "[[1, 2], [3, 4]]"
+    if tokens[:1] != [hdfq.tokens.LEFT_BRACKET] or tokens[-1:] != [hdfq.tokens.RIGHT_BRACKET]:
+        return None
+
+    elements: list[list[Token]] = [[]]
+    depth = 0
+
+    for token in tokens[1:-1]:
+        if token == hdfq.tokens.COMMA and not depth:
+            elements.append([])
+            continue
+
+        depth += (token == hdfq.tokens.LEFT_BRACKET) - (token == hdfq.tokens.RIGHT_BRACKET)
+        elements[-1].append(token)
+
+    rows = []
+    for element in elements:
+        match element:
+            case [Token(Syntax.integer | Syntax.float, value=value)]:
+                rows.append(value)
+
+            case _:
+                if (row := match_rows(element)) is None:
+                    return None
+                rows.append(row)
+
+    return rows
+
+
+def match_append(left: list[Token], right: list[Token]) -> Node:
+    target = match_get_statement(left, context=BinaryOpContext("append", "left"))
+
+    if refers_to_file(target):
+        raise ParseError("Cannot append to objects of other files", context=BinaryOpContext("append", "left"))
+
+    if right[:1] == [hdfq.tokens.LEFT_BRACKET]:
+        if (rows := match_rows(right)) is None:
+            raise ParseError(
+                f"Expected a list of numbers such as [1, 2] or [[1, 2], [3, 4]], got {repr_tokens(right)}",
+                context=BinaryOpContext("append", "right"),
+            )
+
+        return Nodes.Append(target=target, value=Nodes.Constant(value=rows))
+
+    return Nodes.Append(
+        target=target,
+        value=match_atom(right) or match_get_statement(right, context=BinaryOpContext("append", "right")),
+    )
+
+
 def match_assignment(tokens: list[Token]) -> Node | None:
     try:
         assign_index = tokens.index(hdfq.tokens.EQUAL)
@@ -305,14 +546,64 @@ def match_assignment(tokens: list[Token]) -> Node | None:
         return None
 
     left, right = tokens[:assign_index], tokens[assign_index + 1 :]
+
+    if left[-1:] == [hdfq.tokens.PLUS]:
+        return match_append(left[:-1], right)
+
+    target = match_get_statement_all(left, context=BinaryOpContext("assignment", "left"))
+
+    if refers_to_file(target):
+        raise ParseError("Cannot assign to objects of other files", context=BinaryOpContext("assignment", "left"))
+
     return Nodes.Assign(
-        target=match_get_statement_all(left, context=BinaryOpContext("assignment", "left")),
+        target=target,
         value=match_atom(right)
         or match_dataset(right)
+        or match_link(right)
         or match_get_statement_all(right, context=BinaryOpContext("assignment", "right")),
     )
 
 
+def match_quantiles(arguments: list[Token]) -> tuple[float, ...]:
+    context = FunctionCallContext("quantiles")
+    quantiles: list[float] = []
+
+    for argument in split_on(arguments, hdfq.tokens.COMMA):
+        match match_atom(argument):
+            case VNode(value=int(value) | float(value)) if 0 <= value <= 1:
+                quantiles.append(float(value))
+
+            case _:
+                raise ParseError(f"Expected a quantile between 0 and 1, got {repr_tokens(argument)}", context=context)
+
+    return tuple(quantiles)
+
+
+def match_histogram(arguments: list[Token]) -> int:
+    match arguments:
+        case []:
+            return 10
+
+        case [Token(Syntax.identifier, value="bins"), hdfq.tokens.EQUAL, Token(Syntax.integer, value=int(bins))]:
+            if bins > 0:
+                return bins
+
+    raise ParseError(
+        f"Expected a positive number of bins, got {repr_tokens(arguments)}", context=FunctionCallContext("histogram")
+    )
+
+
+def match_count(arguments: list[Token], kind: Literal["topk", "value_counts"]) -> int:
+    match arguments:
+        case [Token(Syntax.integer, value=int(count))] if count > 0:
+            return count
+
+        case _:
+            raise ParseError(
+                f"Expected a positive number of values, got {repr_tokens(arguments)}", context=FunctionCallContext(kind)
+            )
+
+
 def match_descriptor(tokens: list[Token]) -> Node | None:
     match tokens:
         case [hdfq.tokens.KEYS]:
@@ -327,6 +618,39 @@ def match_descriptor(tokens: list[Token]) -> Node | None:
         case [hdfq.tokens.SIZES]:
             return Nodes.Sizes()
 
+        # reductions are not keywords, objects may be called 'sum' or 'min'
+        case [
+            Token(
+                Syntax.identifier,
+                value="sum" | "mean" | "min" | "max" | "count_nan" | "stats" | "unique" | "value_counts" as reduction,
+            )
+        ]:
+            return Nodes.Reduction(value=reduction)
+
+        case [
+            Token(Syntax.identifier, value="topk" | "value_counts" as reduction),
+            hdfq.tokens.LEFT_PARENTHESIS,
+            *arguments,
+            hdfq.tokens.RIGHT_PARENTHESIS,
+        ]:
+            return Nodes.Reduction(value=reduction, arguments=(match_count(arguments, reduction),))
+
+        case [
+            Token(Syntax.identifier, value="quantiles"),
+            hdfq.tokens.LEFT_PARENTHESIS,
+            *arguments,
+            hdfq.tokens.RIGHT_PARENTHESIS,
+        ]:
+            return Nodes.Reduction(value="quantiles", arguments=match_quantiles(arguments))
+
+        case [
+            Token(Syntax.identifier, value="histogram"),
+            hdfq.tokens.LEFT_PARENTHESIS,
+            *arguments,
+            hdfq.tokens.RIGHT_PARENTHESIS,
+        ]:
+            return Nodes.Reduction(value="histogram", arguments=(match_histogram(arguments),))
+
         case _:
             return None
 
@@ -334,29 +658,93 @@ def match_descriptor(tokens: list[Token]) -> Node | None:
 def match_function_call(tokens: list[Token]) -> Node | None:
     match tokens:
         case [hdfq.tokens.DEL, hdfq.tokens.LEFT_PARENTHESIS, *argument, hdfq.tokens.RIGHT_PARENTHESIS]:
-            target, value = match_get_statement(argument, context=FunctionCallContext("del")).unwrap()
+            statement = match_get_statement(argument, context=FunctionCallContext("del"))
+            if refers_to_file(statement):
+                raise ParseError("Cannot delete objects of other files", context=FunctionCallContext("del"))
+
+            target, value = statement.unwrap()
             return Nodes.Del(target=target, value=value)
 
         case _:
             return None
 
 
+PREDICATE_OPERATORS = {
+    (hdfq.tokens.RIGHT_ANGLE_BRACKET,): ">",
+    (hdfq.tokens.RIGHT_ANGLE_BRACKET, hdfq.tokens.EQUAL): ">=",
+    (hdfq.tokens.LEFT_ANGLE_BRACKET,): "<",
+    (hdfq.tokens.LEFT_ANGLE_BRACKET, hdfq.tokens.EQUAL): "<=",
+    (hdfq.tokens.EQUAL, hdfq.tokens.EQUAL): "==",
+    (hdfq.tokens.EXCLAMATION_MARK, hdfq.tokens.EQUAL): "!=",
+    (hdfq.tokens.AMPERSAND,): "&",
+}
+
+
+def match_predicate(
+    tokens: list[Token], context: FunctionCallContext
+) -> tuple[Literal[Special.context] | Node, str | None, int | float | bool | None]:
+    operator_tokens = {token for operator in PREDICATE_OPERATORS for token in operator}
+    index = next((i for i, token in enumerate(tokens) if token in operator_tokens), len(tokens))
+    left, right = tokens[:index], tokens[index:]
+
+    target = Special.context if left == [hdfq.tokens.DOT] else match_target(left, allow_get_attr=False, context=context)
+    if not right:
+        return target, None, None
+
+    # two-token operators first, '>=' must not be read as '>' followed by '=...'
+    for length in (2, 1):
+        if (symbol := PREDICATE_OPERATORS.get(tuple(right[:length]))) is not None:
+            value_tokens = right[length:]
+            break
+
+    else:
+        raise ParseError(f"Got unexpected operator in {repr_tokens(right)}", context=context)
+
+    match value_tokens:
+        case [Token(Syntax.boolean, value=bool(value))]:
+            return target, symbol, value
+
+    match match_atom(value_tokens):
+        case VNode(value=int(value) | float(value)):
+            return target, symbol, value
+
+        case _:
+            raise ParseError(f"Expected a number, got {repr_tokens(value_tokens)}", context=context)
+
+
+def match_selection(tokens: list[Token]) -> SelectionNode | None:
+    match tokens:
+        case [
+            Token(Syntax.identifier, value="select" | "where" as kind),
+            hdfq.tokens.LEFT_PARENTHESIS,
+            *arguments,
+            hdfq.tokens.RIGHT_PARENTHESIS,
+        ]:
+            target, operator, value = match_predicate(arguments, FunctionCallContext(kind))
+            node = Nodes.Select if kind == "select" else Nodes.Where
+            return cast(SelectionNode, node(target=target, operator=operator, value=value))
+
+        case _:
+            return None
+
+
 def match_statement(tokens: list[Token]) -> tuple[Node | None, bool]:
+    # descriptors and selections are matched first, '=' in 'histogram(bins=10)' or 'select(.a == 1)' would otherwise
+    # look like assignments
+    read_statement = match_descriptor(tokens) or match_selection(tokens)
+    if read_statement is not None:
+        return read_statement, False
+
     node = match_assignment(tokens) or match_function_call(tokens)
     if node is not None:
         return node, True
 
-    return (match_descriptor(tokens) or match_get_statement_all(tokens, allow_empty=True)), False
+    return match_get_statement_all(tokens, allow_empty=True), False
 
 
 def split_at_pipes(tokens: list[Token]) -> Iterator[list[Token]]:
-    try:
-        index = tokens.index(hdfq.tokens.PIPE)
-        yield tokens[:index]
-        yield from split_at_pipes(tokens[index + 1 :])
-
-    except ValueError:
-        yield tokens
+    # not recursive, filters can chain thousands of statements
+    yield from split_on(tokens, hdfq.tokens.PIPE)
 
 
 def match_statements(tokens: list[Token]) -> tuple[list[Node], bool]:
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator
+
+import h5py
+
+from hdfq.repair import copy_attributes
+
+
+def ancestors(path: str) -> Iterator[str]:
+    """Yield an object (or attribute, after a '#') path, then the paths of all the groups it is inside."""
+    yield path
+
+    if "#" in path:
+        path = path.split("#", 1)[0]
+        yield path
+
+    while path != "/":
+        head, separator, _ = path.rpartition("/")
+        if not separator:
+            return
+
+        path = head or "/"
+        yield path
+
+
+def hollow_copy(source: h5py.Group, destination: h5py.Group) -> None:
+    """
+    Copy the structure of a group without its data : sub-groups, links, attributes and datasets with the same type,
+    shape and layout. Writes are validated against a hollow copy exactly like against the group itself.
+    """
+    copy_attributes(source, destination)
+
+    for key in source.keys():
+        link = source.get(key, getlink=True)
+
+        if isinstance(link, (h5py.SoftLink, h5py.ExternalLink)):
+            destination[key] = link
+            continue
+
+        obj = source[key]
+
+        if isinstance(obj, h5py.Group):
+            hollow_copy(obj, destination.create_group(key))
+
+        elif isinstance(obj, h5py.Dataset):
+            if obj.shape is None:
+                new_dataset = destination.create_dataset(key, data=h5py.Empty(obj.dtype))
+
+            else:
+                new_dataset = destination.create_dataset(
+                    key,
+                    shape=obj.shape,
+                    dtype=obj.dtype,
+                    maxshape=obj.maxshape,
+                    chunks=obj.chunks,
+                    fillvalue=obj.fillvalue if obj.dtype.kind in "biufc" else None,
+                )
+
+            copy_attributes(obj, new_dataset)
+
+
+@dataclass(frozen=True)
+class Operation:
+    """A write to a file, validated against the file but not applied yet."""
+
+    kind: str
+    path: str
+    description: str = ""
+    apply: Callable[[], None] = field(default=lambda: None, repr=False, compare=False)
+
+    def __str__(self) -> str:
+        return f"{self.kind} {self.path} {self.description}".rstrip()
+
+
+@dataclass
+class WritePlan:
+    """
+    Writes of consecutive statements of a filter, all validated before any of them is applied so that an invalid
+    statement leaves the file untouched. Writes are applied in order, followed by a single flush of the file.
+    """
+
+    operations: list[Operation] = field(default_factory=list)
+    _written: set[str] = field(default_factory=set, repr=False)
+    _written_inside: set[str] = field(default_factory=set, repr=False)
+
+    def __bool__(self) -> bool:
+        return bool(self.operations)
+
+    def __str__(self) -> str:
+        return "\n".join(map(str, self.operations))
+
+    def add(self, operation: Operation) -> None:
+        self.operations.append(operation)
+        self._written.add(operation.path)
+        self._written_inside.update(ancestors(operation.path))
+
+    def depends_on(self, paths: Iterable[str | None], copied: Iterable[str | None] = ()) -> bool:
+        """
+        Whether a statement reading objects at `paths` and copying the whole objects at `copied` needs the writes of
+        the plan to be applied before being validated. Unknown (None) paths always do.
+        """
+        return any(path is None or not self._written.isdisjoint(ancestors(path)) for path in paths) or any(
+            path is None or path in self._written_inside or not self._written.isdisjoint(ancestors(path))
+            for path in copied
+        )
+
+    def clear(self) -> None:
+        self.operations.clear()
+        self._written.clear()
+        self._written_inside.clear()
+
+    def apply(self, file: h5py.File | None) -> None:
+        for operation in self.operations:
+            operation.apply()
+
+        if file is not None:
+            file.flush()
+
+        self.clear()
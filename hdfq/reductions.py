@@ -0,0 +1,385 @@
+from __future__ import annotations
+
+import functools
+import itertools
+import json
+import operator
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import h5py
+import numpy as np
+import numpy.typing as npt
+
+from hdfq.chunks import iter_chunk_blocks
+from hdfq.exceptions import EvalError
+from hdfq.index import file_state
+from hdfq.sketch import QuantileSketch
+
+BLOCK_SIZE = 16 << 20  # approximate number of bytes a worker reads at once, always whole chunks
+PARALLEL_THRESHOLD = 256 << 20  # datasets smaller than this are reduced in the main process
+
+STATS_SUFFIX = ".hdfqstats"
+STATS_VERSION = 1
+
+
+def _sum(block: npt.NDArray[Any]) -> Any:
+    # floats are accumulated in at least 64 bits, integers exactly as Python integers : their high and low 32 bits are
+    # summed separately, which cannot overflow in 64 bits for blocks of less than 2**31 values
+    if block.dtype.kind in "fc":
+        return block.sum(dtype=np.result_type(block.dtype, np.float64))
+
+    values = block.astype(np.uint64 if block.dtype.kind == "u" else np.int64)
+    return (int((values >> 32).sum()) << 32) + int((values & 0xFFFFFFFF).sum())
+
+
+def _mean_block(block: npt.NDArray[Any]) -> tuple[Any, int]:
+    # complex values are averaged as complex numbers, not by their real part
+    return block.sum(dtype=np.complex128 if block.dtype.kind == "c" else np.float64).item(), block.size
+
+
+def _count_nan(block: npt.NDArray[Any]) -> int:
+    return int(np.count_nonzero(np.isnan(block))) if block.dtype.kind in "fc" else 0
+
+
+def _mean(partial: tuple[Any, int]) -> Any:
+    total, count = partial
+    return total / count if count else np.nan
+
+
+StatsPartial = tuple[int, float, float, Any, Any, int, int]  # count, mean, M2, min, max, NaN count, zero count
+
+
+def _stats_block(block: npt.NDArray[Any]) -> StatsPartial:
+    values = block.ravel()
+    nans = np.isnan(values) if values.dtype.kind == "f" else np.zeros(values.shape, dtype=bool)
+    zeros = int(np.count_nonzero(values == 0))
+    values = values[~nans]
+
+    if not values.size:
+        return 0, 0.0, 0.0, None, None, int(np.count_nonzero(nans)), zeros
+
+    mean = float(values.mean(dtype=np.float64))
+    m2 = float(np.square(values - mean, dtype=np.float64).sum())
+    return values.size, mean, m2, values.min().item(), values.max().item(), int(np.count_nonzero(nans)), zeros
+
+
+def _stats_combine(a: StatsPartial, b: StatsPartial) -> StatsPartial:
+    # Chan et al. pairwise update : partial means and sums of squared deviations merge exactly, in any order
+    count = a[0] + b[0]
+    if not a[0] or not b[0]:
+        mean, m2 = (a if a[0] else b)[1:3]
+
+    else:
+        delta = b[1] - a[1]
+        mean = a[1] + delta * b[0] / count
+        m2 = a[2] + b[2] + delta**2 * a[0] * b[0] / count
+
+    minimum = min((v for v in (a[3], b[3]) if v is not None), default=None)
+    maximum = max((v for v in (a[4], b[4]) if v is not None), default=None)
+    return count, mean, m2, minimum, maximum, a[5] + b[5], a[6] + b[6]
+
+
+def _stats(partial: StatsPartial) -> dict[str, Any]:
+    count, mean, m2, minimum, maximum, nans, zeros = partial
+    return {
+        "count": count,
+        "min": minimum,
+        "max": maximum,
+        "mean": mean if count else None,
+        "std": (m2 / count) ** 0.5 if count else None,
+        "nan_count": nans,
+        "zero_count": zeros,
+    }
+
+
+def _sketch(block: npt.NDArray[Any]) -> QuantileSketch:
+    # blocks (possibly reduced by parallel workers) make their own random choices, seeded from their values so that
+    # results are reproducible
+    values = _values(block)
+    return QuantileSketch(rng=np.random.default_rng(zlib.crc32(values))).update(values)
+
+
+def _quantiles(sketch: QuantileSketch, quantiles: tuple[float, ...]) -> dict[str, Any]:
+    # like the mean in stats, quantiles of no values (empty or only NaN) are null
+    values = sketch.quantiles(quantiles).tolist() if sketch.count else [None] * len(quantiles)
+    return dict(zip(map(str, quantiles), values))
+
+
+def _histogram(sketch: QuantileSketch, bins: int) -> dict[str, Any]:
+    counts, edges = sketch.histogram(bins)
+    return {"counts": counts, "edges": edges}
+
+
+def _values(block: npt.NDArray[Any]) -> npt.NDArray[Any]:
+    # values of a block in a flat array, without NaN values
+    values = block.ravel()
+    return values[~np.isnan(values)] if values.dtype.kind == "f" else values
+
+
+def _decoded(values: npt.NDArray[Any]) -> npt.NDArray[Any]:
+    if values.dtype.kind not in "SO":
+        return values
+
+    return np.array([v.decode(errors="replace") if isinstance(v, bytes) else v for v in values], dtype=object)
+
+
+def _top(values: npt.NDArray[Any], n: int) -> npt.NDArray[Any]:
+    # the n largest values in decreasing order, partitioning is linear where a heap would push values one by one
+    if len(values) > n:
+        values = np.partition(values, len(values) - n)[len(values) - n :]
+
+    return np.sort(values)[::-1]
+
+
+def _merge_top(a: npt.NDArray[Any], b: npt.NDArray[Any], n: int) -> npt.NDArray[Any]:
+    return _top(np.concatenate([a, b]), n) if len(a) else b
+
+
+def _merge_unique(a: npt.NDArray[Any], b: npt.NDArray[Any]) -> npt.NDArray[Any]:
+    return np.union1d(a, b) if len(a) else b
+
+
+ValueCounts = tuple[npt.NDArray[Any], npt.NDArray[np.int64]]
+
+
+def _count_values(block: npt.NDArray[Any]) -> ValueCounts:
+    return np.unique(_values(block), return_counts=True)
+
+
+def _merge_counts(a: ValueCounts, b: ValueCounts) -> ValueCounts:
+    if not len(a[0]):
+        return b
+
+    values, inverse = np.unique(np.concatenate([a[0], b[0]]), return_inverse=True)
+    counts = np.zeros(len(values), dtype=np.int64)
+    np.add.at(counts, inverse, np.concatenate([a[1], b[1]]))
+    return values, counts
+
+
+def _value_counts(partial: ValueCounts, n: int | None) -> dict[str, int]:
+    values, counts = partial
+    # most frequent values first, ties in increasing order of values
+    order = np.argsort(-counts, kind="stable")[:n]
+    return dict(zip(map(str, _decoded(values[order])), counts[order].tolist()))
+
+
+@dataclass(frozen=True)
+class Reduction:
+    """
+    A reduction computed block by block : `block` gives the partial result of a block of data, partial results are
+    merged with `combine` (starting from `initial` if not None) and turned into the final result with `finalize`.
+    """
+
+    block: Callable[[npt.NDArray[Any]], Any]
+    combine: Callable[[Any, Any], Any]
+    initial: Any = None
+    finalize: Callable[[Any], Any] = lambda partial: partial
+    kinds: str = "biufc"  # numpy kinds of the data types the reduction accepts
+
+
+REDUCTIONS: dict[str, Reduction] = {
+    "sum": Reduction(_sum, operator.add, initial=0),
+    "mean": Reduction(
+        _mean_block,
+        lambda a, b: (a[0] + b[0], a[1] + b[1]),
+        initial=(0.0, 0),
+        finalize=_mean,
+    ),
+    "min": Reduction(np.min, np.minimum),
+    "max": Reduction(np.max, np.maximum),
+    "count_nan": Reduction(_count_nan, operator.add, initial=0),
+    "stats": Reduction(
+        _stats_block, _stats_combine, initial=(0, 0.0, 0.0, None, None, 0, 0), finalize=_stats, kinds="biuf"
+    ),
+    # partial results of blocks are their distinct values (and their counts), merged as blocks are read
+    "unique": Reduction(
+        lambda block: np.unique(_values(block)),
+        _merge_unique,
+        initial=np.empty(0),
+        finalize=_decoded,
+        kinds="biufSOU",
+    ),
+}
+
+# reductions taking arguments, partial results are mergeable sketches so a single pass gives the result
+PARAMETRIZED_REDUCTIONS: dict[str, Callable[..., Reduction]] = {
+    "quantiles": lambda *quantiles: Reduction(
+        _sketch,
+        QuantileSketch.merge,
+        initial=QuantileSketch(),
+        finalize=functools.partial(_quantiles, quantiles=quantiles),
+        kinds="biuf",
+    ),
+    "histogram": lambda bins: Reduction(
+        _sketch,
+        QuantileSketch.merge,
+        initial=QuantileSketch(),
+        finalize=functools.partial(_histogram, bins=bins),
+        kinds="biuf",
+    ),
+    "topk": lambda n: Reduction(
+        lambda block: _top(_values(block), n),
+        functools.partial(_merge_top, n=n),
+        initial=np.empty(0),
+        kinds="biuf",
+    ),
+    "value_counts": lambda n=None: Reduction(
+        _count_values,
+        _merge_counts,
+        initial=(np.empty(0), np.empty(0, dtype=np.int64)),
+        finalize=functools.partial(_value_counts, n=n),
+        kinds="biufSOU",
+    ),
+}
+
+
+def get_reduction(reduction: str, arguments: tuple[Any, ...] = ()) -> Reduction:
+    if reduction in PARAMETRIZED_REDUCTIONS:
+        return PARAMETRIZED_REDUCTIONS[reduction](*arguments)
+
+    return REDUCTIONS[reduction]
+
+
+# region parallel reduction
+# workers open the file once and each reduces blocks of whole chunks, only partial results are sent back
+
+_SOURCE: h5py.File | None = None
+
+
+def _init_worker(path: Path) -> None:
+    global _SOURCE
+    _SOURCE = h5py.File(path, mode="r")
+
+
+def reduce_block(name: str, reduction: str, arguments: tuple[Any, ...], selection: tuple[slice, ...]) -> Any:
+    assert _SOURCE is not None
+    return get_reduction(reduction, arguments).block(_SOURCE[name][selection])
+
+
+def _partials_parallel(
+    dset: h5py.Dataset, reduction: str, arguments: tuple[Any, ...], selections: list[tuple[slice, ...]], jobs: int
+) -> Iterator[Any]:
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(dset.file.filename,)) as executor:
+        yield from executor.map(
+            functools.partial(reduce_block, dset.name, reduction, arguments),
+            selections,
+            chunksize=max(1, len(selections) // (jobs * 16)),
+        )
+
+
+# endregion
+
+
+def reduce_data(
+    data: h5py.Dataset | npt.NDArray[Any], reduction: str, jobs: int | None = None, arguments: tuple[Any, ...] = ()
+) -> Any:
+    """
+    Compute a reduction over all the values of a dataset, streaming it block by block so that memory use is bounded by
+    a few chunks per process. Large datasets are split between `jobs` processes (one per CPU by default).
+    """
+    operation = get_reduction(reduction, arguments)
+
+    if data.dtype.kind not in operation.kinds:
+        raise EvalError(f"Cannot compute {reduction} of data of type {data.dtype}")
+
+    partials: Iterator[Any]
+
+    if isinstance(data, np.ndarray) or data.ndim == 0:
+        partials = iter([operation.block(np.asarray(data[()]))] if data.size else [])
+
+    else:
+        selections = list(iter_chunk_blocks(data, BLOCK_SIZE)) if data.size else []
+        jobs = min(jobs or os.cpu_count() or 1, len(selections))
+
+        if jobs > 1 and data.size * data.dtype.itemsize >= PARALLEL_THRESHOLD:
+            partials = _partials_parallel(data, reduction, arguments, selections, jobs)
+
+        else:
+            partials = (operation.block(data[selection]) for selection in selections)
+
+    if operation.initial is not None:
+        partials = itertools.chain([operation.initial], partials)
+
+    # partial results are merged as soon as they are computed, only one of them is kept at a time
+    first = next(partials, None)
+    if first is None:
+        raise EvalError(f"Cannot compute {reduction} of an empty array")
+
+    return operation.finalize(functools.reduce(operation.combine, partials, first))
+
+
+# region stats cache
+# stats of datasets are saved in a sidecar file, keyed by object address and valid as long as the file is unchanged
+
+
+def stats_path(path: Path) -> Path:
+    return path.with_name(path.name + STATS_SUFFIX)
+
+
+def _dataset_state(dset: h5py.Dataset) -> dict[str, Any]:
+    # HDF5 only tracks modification times of objects created with track_times, data can be rewritten in place without
+    # any change to the object's metadata : only the state of the whole file tells whether the dataset may have changed
+    return {
+        "file": file_state(Path(dset.file.filename)),
+        "mtime": h5py.h5o.get_info(dset.id).mtime,
+        "shape": list(dset.shape),
+        "dtype": dset.dtype.str,
+    }
+
+
+def _load_stats_cache(path: Path) -> dict[str, Any]:
+    try:
+        with open(stats_path(path)) as cache_file:
+            cache = json.load(cache_file)
+
+    except (OSError, ValueError):
+        return {}
+
+    return cache.get("datasets", {}) if cache.get("version") == STATS_VERSION else {}
+
+
+def _save_stats_cache(path: Path, datasets: dict[str, Any]) -> None:
+    destination = stats_path(path)
+    # processes computing stats of the same file concurrently must not write to the same temporary file
+    tmp_destination = destination.with_name(f"{destination.name}.{os.getpid()}.tmp")
+
+    try:
+        with open(tmp_destination, "w") as cache_file:
+            json.dump({"version": STATS_VERSION, "datasets": datasets}, cache_file)
+
+        tmp_destination.replace(destination)
+
+    except OSError:
+        # the cache is only an optimization, files may live in read-only directories
+        tmp_destination.unlink(missing_ok=True)
+
+
+def dataset_stats(dset: h5py.Dataset, jobs: int | None = None) -> dict[str, Any]:
+    """
+    Compute the number of values, min, max, mean, standard deviation (NaN values excluded), NaN count and zero count
+    of a dataset in a single pass. Results are cached in a sidecar file and reused until the file is modified.
+    """
+    path, key = Path(dset.file.filename), str(h5py.h5o.get_info(dset.id).addr)
+    # the state is recorded before reading the data : a file modified in the meantime leaves a stale entry
+    state = _dataset_state(dset)
+    cache = _load_stats_cache(path)
+
+    if key in cache and cache[key]["state"] == state:
+        return cache[key]["stats"]
+
+    stats = reduce_data(dset, "stats", jobs)
+
+    # entries of older versions of the file are dropped
+    cache = {k: entry for k, entry in cache.items() if entry["state"]["file"] == state["file"]}
+    cache[key] = {"state": state, "stats": stats}
+    _save_stats_cache(path, cache)
+
+    return stats
+
+
+# endregion
@@ -0,0 +1,278 @@
+import functools
+import os
+import zlib
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Literal
+
+import h5py
+import numpy as np
+from tqdm import tqdm
+
+from hdfq.chunks import allocated_chunks, copy_chunk, get_filters, iter_row_blocks, same_layout
+from hdfq.repair import copy_attributes
+
+BLOCK_SIZE = 64 << 20  # approximate number of bytes copied at once when chunks cannot be copied as they are
+WINDOW = 64  # chunks submitted to worker processes ahead of being written, bounding the encoded chunks held in memory
+
+H5Z_FILTER_DEFLATE = 1
+H5Z_FILTER_SHUFFLE = 2
+
+
+@dataclass(frozen=True)
+class RepackOptions:
+    """Layout changes applied to datasets, None keeps the layout of each dataset as it is."""
+
+    compression: Literal["gzip", "lzf", "none"] | None = None
+    compression_level: int | None = None
+    shuffle: bool | None = None
+    chunks: tuple[int, ...] | None = None
+    fs_strategy: Literal["fsm", "page", "aggregate", "none"] | None = None
+    fs_page_size: int | None = None
+
+    def changes_layout(self, dset: h5py.Dataset) -> bool:
+        if dset.shape is None or dset.ndim == 0 or dset.size == 0:
+            return False
+
+        return (
+            self.compression is not None
+            or self.shuffle is not None
+            or (self.chunks is not None and len(self.chunks) == dset.ndim)
+        )
+
+
+@dataclass(frozen=True)
+class RepackReport:
+    original_size: int
+    new_size: int
+
+    @property
+    def reclaimed(self) -> int:
+        return self.original_size - self.new_size
+
+
+def create_like(source: h5py.Dataset, group: h5py.Group, name: str, options: RepackOptions) -> h5py.Dataset:
+    """Create a dataset with the same type, shape and fill value as another one, but with a new layout."""
+    if options.compression is None:
+        compression, compression_opts = source.compression, source.compression_opts
+    else:
+        compression = None if options.compression == "none" else options.compression
+        compression_opts = options.compression_level if compression == "gzip" else None
+
+    shuffle = source.shuffle if options.shuffle is None else options.shuffle
+    chunks = options.chunks if options.chunks is not None and len(options.chunks) == source.ndim else source.chunks
+
+    if chunks is not None:
+        # chunks cannot be larger than dimensions which cannot grow
+        chunks = tuple(c if m is None else max(1, min(c, n)) for c, n, m in zip(chunks, source.shape, source.maxshape))
+
+    return group.create_dataset(
+        name,
+        shape=source.shape,
+        dtype=source.dtype,
+        maxshape=source.maxshape,
+        chunks=chunks or bool(compression or shuffle) or None,
+        compression=compression,
+        compression_opts=compression_opts,
+        shuffle=shuffle,
+        fletcher32=source.fletcher32,
+        fillvalue=source.fillvalue if source.dtype.kind in "biufc" else None,
+    )
+
+
+# region parallel compression
+# workers open the source file once and encode whole chunks, the main process only writes them with H5Dwrite_chunk
+
+_SOURCE: h5py.File | None = None
+
+
+def _init_worker(path: Path) -> None:
+    global _SOURCE
+    _SOURCE = h5py.File(path, mode="r")
+
+
+def encode_chunk(
+    name: str, offset: tuple[int, ...], chunks: tuple[int, ...], dtype: str, shuffle: bool, level: int | None
+) -> bytes | None:
+    """
+    Read a chunk from the source dataset and apply the shuffle and deflate filters exactly like HDF5 would. Return
+    None for chunks made only of fill values, which need not be written.
+    """
+    assert _SOURCE is not None
+    source = _SOURCE[name]
+
+    block = source[tuple(slice(o, min(o + c, n)) for o, c, n in zip(offset, chunks, source.shape))]
+    if np.all(block == source.fillvalue):
+        return None
+
+    # chunks are always stored whole, edge chunks are padded
+    padded = np.full(chunks, source.fillvalue, dtype=dtype)
+    padded[tuple(slice(0, n) for n in block.shape)] = block
+    data = padded.tobytes()
+
+    if shuffle:
+        data = np.frombuffer(data, dtype=np.uint8).reshape(-1, padded.dtype.itemsize).T.tobytes()
+
+    return data if level is None else zlib.compress(data, level)
+
+
+def _encodable(dset: h5py.Dataset) -> tuple[bool, int | None] | None:
+    # filter pipelines made only of shuffle and/or deflate can be applied outside of HDF5, in worker processes
+    filters = [(code, values) for code, _, values, _ in get_filters(dset)]
+    codes = [code for code, _ in filters]
+
+    if dset.dtype.kind not in "biufc" or codes not in ([H5Z_FILTER_DEFLATE], [H5Z_FILTER_SHUFFLE, H5Z_FILTER_DEFLATE]):
+        return None
+
+    return H5Z_FILTER_SHUFFLE in codes, filters[-1][1][0]
+
+
+def _chunk_grid(dset: h5py.Dataset) -> Iterator[tuple[int, ...]]:
+    yield from np.ndindex(*(-(-n // c) for n, c in zip(dset.shape, dset.chunks)))
+
+
+def copy_data_parallel(
+    source: h5py.Dataset, destination: h5py.Dataset, executor: Executor, shuffle: bool, level: int | None
+) -> None:
+    encode = functools.partial(
+        encode_chunk, source.name, chunks=destination.chunks, dtype=destination.dtype.str, shuffle=shuffle, level=level
+    )
+    # at most WINDOW chunks are being encoded or waiting to be written at once, chunks are written as they come back
+    pending: dict[Future[bytes | None], tuple[int, ...]] = {}
+
+    def write(futures: Iterable[Future[bytes | None]]) -> None:
+        for future in futures:
+            offset, data = pending.pop(future), future.result()
+            if data is not None:
+                destination.id.write_direct_chunk(offset, data)
+
+    for index in _chunk_grid(destination):
+        if len(pending) >= WINDOW:
+            write(wait(pending, return_when=FIRST_COMPLETED).done)
+
+        offset = tuple(i * c for i, c in zip(index, destination.chunks))
+        pending[executor.submit(encode, offset)] = offset
+
+    write(wait(pending).done)
+
+
+# endregion
+
+
+def copy_data(source: h5py.Dataset, destination: h5py.Dataset, executor: Executor | None) -> None:
+    if same_layout(source, destination):
+        # compressed chunks are moved as they are
+        for offset in allocated_chunks(source):
+            copy_chunk(source, destination, offset)
+
+        return
+
+    if executor is not None and (encoding := _encodable(destination)) is not None:
+        copy_data_parallel(source, destination, executor, *encoding)
+        return
+
+    for selection in iter_row_blocks(source, BLOCK_SIZE, destination.chunks):
+        block = source[selection]
+
+        if destination.chunks is None or not np.all(block == source.fillvalue):
+            destination[selection] = block
+
+
+def _address(obj: h5py.Group | h5py.Dataset) -> int:
+    return h5py.h5o.get_info(obj.id).addr
+
+
+def repack_group(
+    source: h5py.Group,
+    destination: h5py.Group,
+    options: RepackOptions,
+    executor: Executor | None,
+    progress: tqdm | None,
+    copied: dict[int, str] | None = None,
+) -> None:
+    # destination paths of the objects already copied, by address in the source file
+    copied = {_address(source): destination.name} if copied is None else copied
+
+    for key in source.keys():
+        link = source.get(key, getlink=True)
+
+        if isinstance(link, (h5py.SoftLink, h5py.ExternalLink)):
+            destination[key] = link
+            continue
+
+        obj = source[key]
+
+        if (address := _address(obj)) in copied:
+            # hard links to the same object (possibly a group containing itself) are kept as links, not copied again
+            destination[key] = destination.file[copied[address]]
+            continue
+
+        copied[address] = f"{destination.name.rstrip('/')}/{key}"
+
+        if progress is not None:
+            progress.set_postfix_str(obj.name)
+
+        if isinstance(obj, h5py.Group):
+            new_group = destination.create_group(key)
+            copy_attributes(obj, new_group)
+            repack_group(obj, new_group, options, executor, progress, copied)
+
+        elif isinstance(obj, h5py.Dataset) and options.changes_layout(obj):
+            new_dataset = create_like(obj, destination, key, options)
+            copy_attributes(obj, new_dataset)
+            copy_data(obj, new_dataset, executor)
+
+        else:
+            # only live objects are copied, which is what reclaims the space of deleted ones. H5Ocopy copies raw chunks
+            h5py.h5o.copy(source.id, key.encode(), destination.id, key.encode())
+
+        if progress is not None and isinstance(obj, h5py.Dataset):
+            progress.update(obj.id.get_storage_size())
+
+
+def repack_file(
+    path: Path, options: RepackOptions = RepackOptions(), jobs: int = 1, verbose: bool = False
+) -> RepackReport:
+    """
+    Rewrite a file with only its live objects, to give back the space of deleted objects, optionally changing the
+    layout of datasets and the file space strategy. With more than one job, chunks are compressed in parallel.
+    """
+    # not '~<name>', which holds the state of an interrupted repair
+    repack_path = path.with_name(path.name + ".repack")
+    original_size = os.path.getsize(path)
+
+    file_space: dict[str, Any] = {}
+    if options.fs_strategy is not None:
+        file_space = {"fs_strategy": options.fs_strategy, "fs_persist": options.fs_strategy != "none"}
+    if options.fs_page_size is not None:
+        file_space["fs_page_size"] = options.fs_page_size
+
+    executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(path,)) if jobs > 1 else None
+
+    try:
+        with h5py.File(path, mode="r") as source, h5py.File(repack_path, mode="w", **file_space) as destination:
+            progress = (
+                tqdm(total=original_size, unit="B", unit_scale=True, unit_divisor=1024, leave=False)
+                if verbose
+                else None
+            )
+
+            try:
+                copy_attributes(source, destination)
+                repack_group(source, destination, options, executor, progress)
+
+            finally:
+                if progress is not None:
+                    progress.close()
+
+    except BaseException:
+        repack_path.unlink(missing_ok=True)
+        raise
+
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    repack_path.replace(path)
+    return RepackReport(original_size, os.path.getsize(path))
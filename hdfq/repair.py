@@ -1,26 +1,468 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator
+
 import ch5mpy as ch
+import h5py
 import numpy as np
 from tqdm import tqdm
 
+from hdfq.chunks import allocated_chunks, copy_chunk, iter_row_blocks, same_layout
+
+BLOCK_SIZE = 64 << 20  # approximate number of bytes copied at once for contiguous datasets
+
+Selection = tuple[slice, ...]
+
+
+@dataclass
+class RepairReport:
+    """Objects which could not be read at all, and unreadable regions (replaced by fill values) of datasets."""
+
+    lost_objects: list[str] = field(default_factory=list)
+    lost_regions: dict[str, list[Selection]] = field(default_factory=dict)
+    dataset_sizes: dict[str, int] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.lost_objects or self.lost_regions)
+
+    def lose_region(self, dset: h5py.Dataset, selection: Selection) -> None:
+        self.lost_regions.setdefault(dset.name, []).append(selection)
+        self.dataset_sizes[dset.name] = dset.size
+
+    def as_dict(self) -> dict[str, Any]:
+        datasets = {}
+        for name, regions in self.lost_regions.items():
+            n_lost = sum(_n_elements(region) for region in regions)
+            datasets[name] = {
+                "lost_regions": [[[s.start, s.stop] for s in region] for region in regions],
+                "lost_elements": n_lost,
+                "lost_fraction": n_lost / self.dataset_sizes[name] if self.dataset_sizes[name] else 0.0,
+            }
+
+        return {"lost_objects": self.lost_objects, "datasets": datasets}
+
+    def write(self, path: Path) -> None:
+        with open(path, "w") as report_file:
+            json.dump(self.as_dict(), report_file, indent=2)
+
+
+class Journal:
+    """
+    Append-only log of objects fully repaired (with the data they lost), to resume an interrupted repair where it
+    stopped.
+    """
+
+    def __init__(self, path: Path, report: RepairReport, resume: bool):
+        self.path = path
+        self.done: set[str] = set()
+
+        if resume and path.exists():
+            self._load(report)
+
+        self._file = open(path, "a" if resume else "w")
+
+    def _load(self, report: RepairReport) -> None:
+        valid = 0
+
+        with open(self.path, "rb") as journal_file:
+            for line in journal_file:
+                try:
+                    # the last line may have been written partially while being interrupted
+                    entry = json.loads(line) if line.endswith(b"\n") else None
+
+                except ValueError:
+                    entry = None
+
+                if entry is None:
+                    break
+
+                valid += len(line)
+
+                self.done.add(entry["name"])
+
+                if entry.get("lost"):
+                    report.lost_objects.append(entry["name"])
+
+                if "lost_regions" in entry:
+                    report.lost_regions[entry["name"]] = [
+                        tuple(slice(start, stop) for start, stop in region) for region in entry["lost_regions"]
+                    ]
+                    report.dataset_sizes[entry["name"]] = entry["size"]
+
+        # new entries are appended after the last complete one, not after a partial line
+        os.truncate(self.path, valid)
+
+    def record(self, name: str, report: RepairReport) -> None:
+        entry: dict[str, Any] = {"name": name}
+
+        if name in report.lost_objects:
+            entry["lost"] = True
+
+        if name in report.lost_regions:
+            entry["lost_regions"] = [[[s.start, s.stop] for s in region] for region in report.lost_regions[name]]
+            entry["size"] = report.dataset_sizes[name]
+
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.done.add(name)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _n_elements(selection: Selection) -> int:
+    return int(np.prod([s.stop - s.start for s in selection]))
 
-def repair_group(corrupted_file: ch.Group, new_file: ch.Group, verbose: bool, in_RAM: bool) -> None:
-    iter_keys = tqdm(corrupted_file.keys(), leave=False) if verbose else corrupted_file.keys()
 
-    for key in iter_keys:
-        if isinstance(iter_keys, tqdm):
-            iter_keys.set_description(f"Processing key {key}")
+def _dataset_bytes(dset: h5py.Dataset) -> int:
+    return 0 if dset.shape is None else dset.size * dset.dtype.itemsize
 
+
+def _total_bytes(group: h5py.Group) -> int | None:
+    total = 0
+
+    def add(_name: str, obj: Any) -> None:
+        nonlocal total
+        if isinstance(obj, h5py.Dataset):
+            total += _dataset_bytes(obj)
+
+    try:
+        group.visititems(add)
+
+    except (RuntimeError, OSError, KeyError):
+        # a corrupted file may not be walkable to the end, only show progress without a total
+        return None
+
+    return total
+
+
+def iter_blocks(dset: h5py.Dataset, in_RAM: bool) -> Iterator[Selection]:
+    """Iterate over selections of a dataset to copy one after the other, to only hold one in memory at a time."""
+    if dset.shape is None or dset.size == 0:
+        return
+
+    if in_RAM or dset.ndim == 0:
+        yield tuple(slice(0, n) for n in dset.shape)
+
+    elif dset.chunks is not None:
         try:
-            data = corrupted_file[key]
+            offsets = allocated_chunks(dset)
 
-            if isinstance(data, ch.Dataset):
-                if in_RAM:
-                    new_file.create_dataset(key, data=np.array(data))
-                new_file.create_dataset(key, data=data)
+        except (RuntimeError, OSError):
+            # the chunk index itself is corrupted : go through the whole extent of the dataset instead
+            yield from iter_row_blocks(dset, BLOCK_SIZE)
+            return
 
-            else:
-                new_group = new_file.create_group(key)
-                repair_group(data, new_group, verbose, in_RAM)
+        for offset in offsets:
+            yield tuple(slice(o, min(o + c, n)) for o, c, n in zip(offset, dset.chunks, dset.shape))
+
+    else:
+        yield from iter_row_blocks(dset, BLOCK_SIZE)
+
+
+def split_selection(dset: h5py.Dataset, selection: Selection) -> tuple[Selection, Selection] | None:
+    """
+    Split a selection in two halves along its longest axis (counted in chunks for chunked datasets, since a chunk is
+    the smallest unit that can be lost), or return None if the selection cannot be split further.
+    """
+    units = dset.chunks or tuple(1 for _ in dset.shape)
+    n_units = [-(-(s.stop - s.start) // unit) for s, unit in zip(selection, units)]
+
+    if not n_units or max(n_units) <= 1:
+        return None
+
+    axis = int(np.argmax(n_units))
+    middle = selection[axis].start + n_units[axis] // 2 * units[axis]
+
+    return (
+        (*selection[:axis], slice(selection[axis].start, middle), *selection[axis + 1 :]),
+        (*selection[:axis], slice(middle, selection[axis].stop), *selection[axis + 1 :]),
+    )
+
+
+def _is_fill(dset: h5py.Dataset, block: Any) -> bool:
+    return dset.chunks is not None and dset.dtype.kind in "biufc" and bool(np.all(block == dset.fillvalue))
+
+
+def _is_chunk(dset: h5py.Dataset, selection: Selection) -> bool:
+    return dset.chunks is not None and all(
+        s.start % c == 0 and s.stop == min(s.start + c, n) for s, c, n in zip(selection, dset.chunks, dset.shape)
+    )
+
+
+def copy_region(
+    source: h5py.Dataset, destination: h5py.Dataset, selection: Selection, report: RepairReport, raw: bool = False
+) -> int:
+    """
+    Copy a region of a dataset, bisecting it when it cannot be read to keep every readable part. Unreadable regions
+    are left to the destination's fill value and recorded in the report. Return the number of bytes processed.
+    With `raw`, single chunks are copied as compressed bytes instead of being compressed again.
+    """
+    try:
+        # reading decodes the data, even when copied raw : this is what detects corrupted chunks
+        block = source[selection]
+
+    except (RuntimeError, OSError):
+        halves = split_selection(source, selection)
+
+        if halves is None:
+            report.lose_region(source, selection)
+            return _n_elements(selection) * source.dtype.itemsize
+
+        return sum(copy_region(source, destination, half, report, raw) for half in halves)
+
+    # regions entirely made of fill values need not be written, their chunks would be allocated for nothing
+    if _is_fill(source, block):
+        pass
+
+    elif raw and _is_chunk(source, selection):
+        copy_chunk(source, destination, tuple(s.start for s in selection))
+
+    else:
+        destination[selection] = block
+
+    return int(np.size(block)) * source.dtype.itemsize
+
+
+def copy_dataset(
+    source: h5py.Dataset,
+    destination: h5py.Group,
+    name: str,
+    in_RAM: bool,
+    progress: tqdm | None,
+    report: RepairReport,
+) -> None:
+    # creating the dataset with the source's creation property list preserves chunking, filters and the fill value
+    dsid = h5py.h5d.create(
+        destination.id, name.encode(), source.id.get_type(), source.id.get_space(), dcpl=source.id.get_create_plist()
+    )
+    new_dataset = h5py.Dataset(dsid)
+    raw = not in_RAM and same_layout(source, new_dataset)
+    copied = 0
 
-        except RuntimeError:
+    for selection in iter_blocks(source, in_RAM):
+        n_bytes = copy_region(source, new_dataset, selection, report, raw)
+
+        if progress is not None:
+            progress.update(n_bytes)
+            copied += n_bytes
+
+    if progress is not None:
+        # unallocated chunks are not copied but still count as processed
+        progress.update(_dataset_bytes(source) - copied)
+
+    copy_attributes(source, new_dataset)
+
+
+def copy_attributes(source: h5py.Group | h5py.Dataset, destination: h5py.Group | h5py.Dataset) -> None:
+    for name in source.attrs:
+        try:
+            destination.attrs.create(name, source.attrs[name], dtype=source.attrs.get_id(name).dtype)
+
+        except (RuntimeError, OSError):
+            continue
+
+
+def _repair_group(
+    corrupted: h5py.Group,
+    new: h5py.Group,
+    in_RAM: bool,
+    progress: tqdm | None,
+    report: RepairReport,
+    journal: Journal | None = None,
+) -> None:
+    for key in corrupted.keys():
+        name = f"{corrupted.name.rstrip('/')}/{key}"
+
+        if journal is not None and name in journal.done:
             continue
+
+        if progress is not None:
+            progress.set_postfix_str(name)
+
+        try:
+            data = corrupted[key]
+
+            if isinstance(data, h5py.Dataset):
+                if key in new:
+                    # partially copied before an interruption
+                    del new[key]
+
+                copy_dataset(data, new, key, in_RAM, progress, report)
+
+            else:
+                new_group = new[key] if key in new else new.create_group(key)
+                copy_attributes(data, new_group)
+                _repair_group(data, new_group, in_RAM, progress, report, journal)
+
+        except (RuntimeError, OSError):
+            # drop partially copied datasets, only fully valid objects are extracted
+            if key in new and isinstance(new[key], h5py.Dataset):
+                del new[key]
+
+            report.lost_objects.append(name)
+
+        if journal is not None:
+            journal.record(name, report)
+
+
+def repair_group(corrupted_file: ch.Group, new_file: ch.Group, verbose: bool, in_RAM: bool) -> RepairReport:
+    """
+    Copy all readable groups and datasets from a corrupted file into a new one. Datasets are copied one chunk (or one
+    block of rows for contiguous datasets) at a time, so that memory usage is bounded whatever the dataset sizes, and
+    an unreadable chunk only loses its own data.
+    """
+    corrupted, new = h5py.Group(corrupted_file.id), h5py.Group(new_file.id)
+    report = RepairReport()
+
+    progress = (
+        tqdm(total=_total_bytes(corrupted), unit="B", unit_scale=True, unit_divisor=1024, leave=False)
+        if verbose
+        else None
+    )
+
+    try:
+        copy_attributes(corrupted, new)
+        _repair_group(corrupted, new, in_RAM, progress, report)
+
+    finally:
+        if progress is not None:
+            progress.close()
+
+    return report
+
+
+def _journal_path(path: Path) -> Path:
+    return path.with_name(path.name + ".journal")
+
+
+def _can_resume(path: Path) -> bool:
+    return path.exists() and _journal_path(path).exists()
+
+
+def _repair_part(source: Path, key: str, part_path: Path, in_RAM: bool) -> RepairReport:
+    # repair a single top-level group into its own file, itself resumable
+    report = RepairReport()
+    resume = _can_resume(part_path)
+    journal = Journal(_journal_path(part_path), report, resume)
+
+    try:
+        with h5py.File(source, mode="r") as corrupted, h5py.File(part_path, mode="r+" if resume else "w") as part:
+            group = corrupted[key]
+            new_group = part[key] if key in part else part.create_group(key)
+            copy_attributes(group, new_group)
+            _repair_group(group, new_group, in_RAM, None, report, journal)
+
+    finally:
+        journal.close()
+
+    return report
+
+
+def _is_group(group: h5py.Group, key: str) -> bool:
+    try:
+        return group.get(key, getclass=True) is h5py.Group
+
+    except (RuntimeError, OSError, KeyError):
+        return False
+
+
+def _repair_parts(
+    path: Path,
+    restore_path: Path,
+    corrupted: h5py.Group,
+    new: h5py.Group,
+    in_RAM: bool,
+    jobs: int,
+    verbose: bool,
+    report: RepairReport,
+    journal: Journal,
+) -> None:
+    """Repair top-level groups in parallel worker processes, each into a temporary file merged when complete."""
+    parts = {
+        key: restore_path.with_name(f"{restore_path.name}.{index}.part")
+        for index, key in enumerate(corrupted.keys())
+        if f"/{key}" not in journal.done and _is_group(corrupted, key)
+    }
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(_repair_part, path, key, part_path, in_RAM): key for key, part_path in parts.items()}
+        completed = as_completed(futures)
+
+        for future in tqdm(completed, total=len(futures), unit="group", leave=False) if verbose else completed:
+            key, name = futures[future], f"/{futures[future]}"
+
+            try:
+                part_report = future.result()
+
+            except (RuntimeError, OSError, KeyError):
+                report.lost_objects.append(name)
+                journal.record(name, report)
+                continue
+
+            if key in new:
+                # merged before an interruption, but not journaled
+                del new[key]
+
+            # H5Ocopy copies raw chunks as they are, without decompressing them
+            with h5py.File(parts[key], mode="r") as part:
+                h5py.h5o.copy(part.id, key.encode(), new.id, key.encode())
+
+            report.lost_objects.extend(part_report.lost_objects)
+            report.lost_regions.update(part_report.lost_regions)
+            report.dataset_sizes.update(part_report.dataset_sizes)
+
+            for lost_name in [*part_report.lost_objects, *part_report.lost_regions]:
+                journal.record(lost_name, report)
+
+            journal.record(name, report)
+
+            parts[key].unlink()
+            _journal_path(parts[key]).unlink()
+
+
+def repair_file(path: Path, verbose: bool = False, in_RAM: bool = False, jobs: int = 1) -> RepairReport:
+    """
+    Repair a corrupted file in place. Objects are first copied to a '~<name>' file, which replaces the original one
+    once complete. Completed objects are journaled so that an interrupted repair resumes where it stopped, and with
+    more than one job, top-level groups are repaired in parallel processes.
+    """
+    restore_path = path.with_stem("~" + path.stem)
+    resume = _can_resume(restore_path)
+
+    report = RepairReport()
+    journal = Journal(_journal_path(restore_path), report, resume)
+
+    if resume and verbose:
+        print(f"Resuming repair of {path} ({len(journal.done)} objects already repaired)")
+
+    try:
+        with h5py.File(path, mode="r") as corrupted, h5py.File(restore_path, mode="r+" if resume else "w") as new:
+            copy_attributes(corrupted, new)
+
+            if jobs > 1:
+                _repair_parts(path, restore_path, corrupted, new, in_RAM, jobs, verbose, report, journal)
+
+            # the total is only known when the whole file is copied by this process
+            total = _total_bytes(corrupted) if not resume and jobs == 1 else None
+            progress = tqdm(total=total, unit="B", unit_scale=True, unit_divisor=1024, leave=False) if verbose else None
+
+            try:
+                _repair_group(corrupted, new, in_RAM, progress, report, journal)
+
+            finally:
+                if progress is not None:
+                    progress.close()
+
+    finally:
+        journal.close()
+
+    # replacing is atomic : the original file is never missing, even if interrupted
+    restore_path.replace(path)
+    _journal_path(restore_path).unlink()
+
+    return report
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator
+
+import h5py
+import numpy as np
+import numpy.typing as npt
+
+from hdfq.chunks import iter_row_blocks
+from hdfq.exceptions import EvalError
+
+BLOCK_SIZE = 16 << 20  # approximate number of bytes of the predicate dataset read at once
+GATHER_GAP = 64 << 10  # ranges closer than this (in bytes) are gathered with a single read
+
+OPERATORS: dict[str, Callable[[npt.NDArray[Any], Any], npt.NDArray[np.bool_]]] = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+    "&": lambda block, value: np.bitwise_and(block, value) != 0,
+}
+
+
+def _iter_blocks(data: h5py.Dataset | npt.NDArray[Any]) -> Iterator[tuple[int, npt.NDArray[Any]]]:
+    if isinstance(data, np.ndarray):
+        yield 0, data
+        return
+
+    for selection in iter_row_blocks(data, BLOCK_SIZE):
+        yield selection[0].start, data[selection]
+
+
+def _mask_ranges(mask: npt.NDArray[np.bool_], offset: int) -> npt.NDArray[np.int64]:
+    # (start, stop) of runs of True values
+    edges = np.diff(np.concatenate([[False], mask, [False]]).astype(np.int8))
+    return np.stack([np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)], axis=1).astype(np.int64) + offset
+
+
+def match_ranges(data: h5py.Dataset | npt.NDArray[Any], operator: str | None, value: Any) -> npt.NDArray[np.int64]:
+    """
+    Evaluate a predicate on the values of a 1D dataset block by block, as `<data> <operator> <value>` or on the
+    truthiness of values when there is no operator. Return the matching indices as sorted, disjoint (start, stop)
+    ranges, an array of shape (n, 2).
+    """
+    if data.ndim != 1:
+        raise EvalError(f"Cannot select with a predicate on data of {data.ndim} dimension(s), expected 1")
+
+    if data.dtype.kind not in "biuf" or (operator == "&" and data.dtype.kind not in "biu"):
+        raise EvalError(f"Cannot evaluate '{operator or 'truthiness'}' on data of type {data.dtype}")
+
+    ranges = [np.empty((0, 2), dtype=np.int64)]
+
+    for offset, block in _iter_blocks(data):
+        mask = block.astype(bool) if operator is None else OPERATORS[operator](block, value)
+        block_ranges = _mask_ranges(mask, offset)
+
+        # runs crossing the boundary between two blocks are merged
+        if len(block_ranges) and len(ranges[-1]) and ranges[-1][-1, 1] == block_ranges[0, 0]:
+            ranges[-1][-1, 1] = block_ranges[0, 1]
+            block_ranges = block_ranges[1:]
+
+        if len(block_ranges):
+            ranges.append(block_ranges)
+
+    return np.concatenate(ranges)
+
+
+def ranges_to_indices(ranges: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    lengths = ranges[:, 1] - ranges[:, 0]
+    offsets = np.cumsum(lengths) - lengths
+    return np.arange(lengths.sum(), dtype=np.int64) + np.repeat(ranges[:, 0] - offsets, lengths)
+
+
+def gather(dset: h5py.Dataset | npt.NDArray[Any], ranges: npt.NDArray[np.int64]) -> npt.NDArray[Any]:
+    """
+    Read the rows of a dataset in sorted (start, stop) ranges. Ranges are grouped so that each read covers a
+    contiguous block of rows : nearby ranges (in the same chunk, or a few KB apart) are read at once.
+    """
+    if isinstance(dset, np.ndarray):
+        return dset[ranges_to_indices(ranges)]
+
+    row_size = max(1, int(np.prod(dset.shape[1:])) * dset.dtype.itemsize)
+    gap = max(GATHER_GAP // row_size, 1 if dset.chunks is None else dset.chunks[0])
+    block_rows = max(gap, BLOCK_SIZE // row_size)
+
+    # new reads start after large gaps, and reads cover at most about BLOCK_SIZE bytes (unless a range is larger)
+    starts, stops = ranges[:, 0], ranges[:, 1]
+    breaks = (starts[1:] - stops[:-1] >= gap) | (starts[1:] // block_rows != starts[:-1] // block_rows)
+
+    is_string = h5py.check_string_dtype(dset.dtype) is not None
+    source = dset.asstr() if is_string else dset
+    result = np.empty((int((stops - starts).sum()), *dset.shape[1:]), dtype=object if is_string else dset.dtype)
+    position = 0
+
+    for group in np.split(ranges, np.flatnonzero(breaks) + 1) if len(ranges) else []:
+        start, stop = group[0, 0], group[-1, 1]
+        rows = source[start:stop][ranges_to_indices(group - start)]
+
+        result[position : position + len(rows)] = rows
+        position += len(rows)
+
+    return result
+
+
+@dataclass
+class RowSelection:
+    """
+    Rows of the datasets of a group (e.g. columns of a table) selected by a predicate. Only the datasets that are
+    actually accessed are read, at the selected rows only.
+    """
+
+    group: h5py.Group
+    ranges: npt.NDArray[np.int64]
+    n_rows: int
+
+    def _aligned(self, obj: Any) -> bool:
+        return isinstance(obj, h5py.Dataset) and obj.ndim > 0 and obj.shape[0] == self.n_rows
+
+    def keys(self) -> list[str]:
+        return [key for key, obj in self.group.items() if self._aligned(obj)]
+
+    def __getitem__(self, key: str) -> npt.NDArray[Any]:
+        obj = self.group.get(key)
+
+        if obj is None:
+            raise EvalError(f"No object '{key}' in group '{self.group.name}'")
+
+        if not self._aligned(obj):
+            raise EvalError(f"Cannot select rows of '{key}', it is not a dataset with {self.n_rows} rows")
+
+        return gather(obj, self.ranges)
+
+    def as_dict(self) -> dict[str, npt.NDArray[Any]]:
+        return {key: self[key] for key in self.keys()}
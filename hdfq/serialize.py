@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import json
+import math
+import sys
+from typing import TYPE_CHECKING, Any, Iterator
+
+import ch5mpy as ch
+import numpy as np
+import numpy.typing as npt
+
+from hdfq.display import DisplayOptions
+
+if TYPE_CHECKING:
+    from hdfq.evaluation import EVAL_OBJECT
+
+
+BLOCK_SIZE = 1 << 20  # approximate number of bytes read at once when streaming arrays
+
+
+def _finite(obj: Any) -> Any:
+    # JSON has no NaN or infinity, non-finite floats are written as null
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+
+    return obj
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, bytes):
+        return obj.decode(errors="replace")
+
+    if isinstance(obj, np.generic):
+        return _finite(obj.item())
+
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == "f" and not np.isfinite(obj).all():
+            return np.where(np.isfinite(obj), obj, None).tolist()
+
+        return obj.tolist()
+
+    return str(obj)
+
+
+def dumps(obj: Any) -> str:
+    return json.dumps(_finite(obj), default=_default, separators=(",", ":"), allow_nan=False)
+
+
+def _read_rows(obj: ch.H5Array[Any] | npt.NDArray[Any], start: int, stop: int) -> npt.NDArray[Any]:
+    if type(obj) is ch.H5Array:
+        return np.asarray(obj.dset[start:stop])
+
+    return np.asarray(obj[start:stop])
+
+
+def iter_blocks(obj: ch.H5Array[Any] | npt.NDArray[Any]) -> Iterator[npt.NDArray[Any]]:
+    """Iterate over blocks of rows of an array (along its first axis), reading about BLOCK_SIZE bytes at a time."""
+    row_size = max(1, obj.size // max(1, len(obj)) * obj.dtype.itemsize)
+    n_rows = max(1, BLOCK_SIZE // row_size)
+
+    for start in range(0, len(obj), n_rows):
+        yield _read_rows(obj, start, start + n_rows)
+
+
+def iter_entries(obj: ch.H5Dict[Any] | dict[str, Any] | ch.AttributeManager) -> Iterator[tuple[str, Any]]:
+    if isinstance(obj, ch.H5Dict):
+        yield from ((f"#{key}", value) for key, value in obj.attributes.items())
+
+    yield from obj.items()
+
+
+def _is_array(obj: Any) -> bool:
+    return isinstance(obj, (ch.H5Array, np.ndarray)) and obj.ndim > 0
+
+
+def iter_json(obj: EVAL_OBJECT | Any) -> Iterator[str]:
+    """Serialize an object to JSON, yielding fragments as the object is traversed."""
+    if isinstance(obj, (ch.H5Dict, dict, ch.AttributeManager)):
+        yield "{"
+        for index, (key, value) in enumerate(iter_entries(obj)):
+            yield ("," if index else "") + dumps(key) + ":"
+            yield from iter_json(value)
+        yield "}"
+
+    elif _is_array(obj):
+        yield "["
+        for index, block in enumerate(iter_blocks(obj)):
+            yield ("," if index else "") + dumps(block)[1:-1]
+        yield "]"
+
+    elif isinstance(obj, (list, ch.H5List)):
+        yield "["
+        for index, element in enumerate(obj):
+            yield "," if index else ""
+            yield from iter_json(element)
+        yield "]"
+
+    else:
+        yield dumps(obj)
+
+
+def _line(obj: Any, raw: bool) -> str:
+    if raw and isinstance(obj, (str, bytes)):
+        return obj.decode(errors="replace") if isinstance(obj, bytes) else obj
+
+    return "".join(iter_json(obj))
+
+
+def iter_lines(obj: EVAL_OBJECT | Any, raw: bool) -> Iterator[str]:
+    """
+    Serialize an object to newline-delimited JSON : one line per entry of mappings, per element of lists and per row
+    of arrays. In raw mode, strings are written without quotes.
+    """
+    if isinstance(obj, (ch.H5Dict, dict, ch.AttributeManager)):
+        for key, value in iter_entries(obj):
+            yield f'{{"key":{dumps(key)},"value":{"".join(iter_json(value))}}}'
+
+    elif _is_array(obj):
+        yield from (_line(row, raw) for block in iter_blocks(obj) for row in block)
+
+    elif isinstance(obj, (list, ch.H5List)):
+        yield from (_line(element, raw) for element in obj)
+
+    else:
+        yield _line(obj, raw)
+
+
+def serialize(obj: EVAL_OBJECT, options: DisplayOptions) -> None:
+    write = sys.stdout.write
+
+    if options.output == "json":
+        for fragment in iter_json(obj):
+            write(fragment)
+        write("\n")
+
+    else:
+        for line in iter_lines(obj, raw=options.output == "raw"):
+            write(line + "\n")
@@ -0,0 +1,139 @@
+import io
+import json
+import os
+import socketserver
+from collections import OrderedDict
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Any
+
+import ch5mpy as ch
+
+from hdfq.display import DisplayOptions
+from hdfq.evaluation import eval as hdfq_eval
+from hdfq.parser import parse
+
+DEFAULT_MAX_OPEN_FILES = 16
+
+
+def file_state(path: Path) -> tuple[int, int]:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+class FilePool:
+    """
+    Least-recently-used pool of HDF5 files open in read mode. Files modified since they were opened are reopened to
+    always reflect their current contents.
+    """
+
+    def __init__(self, max_open_files: int = DEFAULT_MAX_OPEN_FILES):
+        self.max_open_files = max_open_files
+        self._files: OrderedDict[Path, tuple[ch.H5Dict[Any], tuple[int, int]]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def __contains__(self, path: Path) -> bool:
+        return path in self._files
+
+    def get(self, path: Path) -> ch.H5Dict[Any]:
+        state = file_state(path)
+
+        if path in self._files:
+            h5_object, opened_state = self._files[path]
+
+            if opened_state == state and not h5_object.is_closed:
+                self._files.move_to_end(path)
+                return h5_object
+
+            self.evict(path)
+
+        h5_object = ch.H5Dict.read(path, mode=ch.H5Mode.READ)
+        self._files[path] = (h5_object, state)
+
+        while len(self._files) > self.max_open_files:
+            self.evict(next(iter(self._files)))
+
+        return h5_object
+
+    def evict(self, path: Path) -> None:
+        if path in self._files:
+            h5_object, _ = self._files.pop(path)
+            h5_object.close()
+
+    def close(self) -> None:
+        for path in list(self._files):
+            self.evict(path)
+
+
+def run_query(pool: FilePool, filter: str, path: Path, options: DisplayOptions) -> None:
+    tree, requires_write_access = parse(filter)
+
+    with ch.options(error_mode="ignore"):
+        if not requires_write_access:
+            hdfq_eval(tree, pool.get(path), options)
+            return
+
+        # HDF5 does not allow opening a file in read-write mode while it is open in read mode : drop the cached handle
+        pool.evict(path)
+        with ch.H5Dict.read(path, mode=ch.H5Mode.READ_WRITE) as h5_object:
+            hdfq_eval(tree, h5_object, options)
+
+
+class QueryHandler(socketserver.StreamRequestHandler):
+    """
+    Answer newline-delimited JSON requests {"filter": ..., "path": ..., "options": {...}} with one JSON line
+    {"output": ..., "error": ...} each.
+    """
+
+    server: "QueryServer"
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            self.wfile.write(json.dumps(self.answer(line)).encode() + b"\n")
+            self.wfile.flush()
+
+    def answer(self, line: bytes) -> dict[str, str | None]:
+        output = io.StringIO()
+
+        try:
+            request = json.loads(line)
+            with redirect_stdout(output):
+                run_query(
+                    self.server.pool,
+                    request["filter"],
+                    Path(request["path"]),
+                    DisplayOptions(**request.get("options", {})),
+                )
+
+        except Exception as e:
+            return {"output": output.getvalue(), "error": f"{type(e).__name__}: {e}"}
+
+        return {"output": output.getvalue(), "error": None}
+
+
+class QueryServer(socketserver.UnixStreamServer):
+    # queries are answered one at a time : h5py serializes all calls to the HDF5 library anyway
+    def __init__(self, socket_path: Path, max_open_files: int = DEFAULT_MAX_OPEN_FILES):
+        self.pool = FilePool(max_open_files)
+        super().__init__(str(socket_path), QueryHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.pool.close()
+
+
+def serve(socket_path: Path, max_open_files: int = DEFAULT_MAX_OPEN_FILES) -> None:
+    if socket_path.is_socket():
+        socket_path.unlink()
+
+    with QueryServer(socket_path, max_open_files) as server:
+        try:
+            server.serve_forever()
+
+        except KeyboardInterrupt:
+            pass
+
+        finally:
+            os.unlink(socket_path)
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+SKETCH_SIZE = 2048  # capacity of the top level, the rank error is about 1 / SKETCH_SIZE
+CAPACITY_DECAY = 2 / 3
+
+
+@dataclass
+class QuantileSketch:
+    """
+    KLL sketch of the distribution of values : values are kept in levels where each value stands for 2^level values.
+    Full levels are sorted and every other value (at a random offset) is promoted to the next level. Sketches of
+    separate blocks of data merge into the sketch of their union, in any order.
+    """
+
+    count: int = 0
+    minimum: Any = None
+    maximum: Any = None
+    levels: list[npt.NDArray[Any]] = field(default_factory=list)
+    rng: np.random.Generator = field(default_factory=lambda: np.random.default_rng(0), repr=False)
+
+    def _capacity(self, level: int) -> int:
+        return max(2, int(SKETCH_SIZE * CAPACITY_DECAY ** (len(self.levels) - 1 - level)))
+
+    def _add(self, level: int, values: npt.NDArray[Any]) -> None:
+        while len(self.levels) <= level:
+            self.levels.append(values[:0])
+
+        self.levels[level] = np.concatenate([self.levels[level], values])
+
+    def _compact(self) -> None:
+        level = 0
+
+        while level < len(self.levels):
+            values = self.levels[level]
+
+            if len(values) > self._capacity(level):
+                values = np.sort(values)
+                # an odd value out stays at its level, half of the others go up with twice the weight
+                odd = len(values) % 2
+                self.levels[level] = values[:odd]
+                self._add(level + 1, values[odd + int(self.rng.integers(2)) :: 2])
+
+            level += 1
+
+    def update(self, values: npt.NDArray[Any]) -> QuantileSketch:
+        """Add a block of values, sorted at once and sampled straight to the first level with room for them."""
+        if not values.size:
+            return self
+
+        values = np.sort(values.ravel())
+        self.count += values.size
+        self.minimum = values[0] if self.minimum is None else min(self.minimum, values[0])
+        self.maximum = values[-1] if self.maximum is None else max(self.maximum, values[-1])
+
+        level = 0
+        while values.size >> level > SKETCH_SIZE:
+            level += 1
+
+        step = 1 << level
+        self._add(level, values[int(self.rng.integers(step)) :: step])
+        self._compact()
+        return self
+
+    def merge(self, other: QuantileSketch) -> QuantileSketch:
+        if not other.count:
+            return self
+
+        self.count += other.count
+        self.minimum = other.minimum if self.minimum is None else min(self.minimum, other.minimum)
+        self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+
+        for level, values in enumerate(other.levels):
+            self._add(level, values)
+
+        self._compact()
+        return self
+
+    def _weighted(self) -> tuple[npt.NDArray[Any], npt.NDArray[np.float64]]:
+        # values in increasing order with the cumulated weights of values up to each of them, scaled to the count
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(v), 2.0**level) for level, v in enumerate(self.levels)])
+
+        order = np.argsort(values, kind="stable")
+        cumulated = np.cumsum(weights[order])
+        return values[order], cumulated * self.count / cumulated[-1]
+
+    def quantiles(self, q: npt.ArrayLike) -> npt.NDArray[Any]:
+        q = np.asarray(q, dtype=np.float64)
+        if not self.count:
+            return np.full(q.shape, np.nan)
+
+        values, cumulated = self._weighted()
+        result = values[np.minimum(np.searchsorted(cumulated, q * self.count), len(values) - 1)]
+
+        # the extremes are known exactly
+        return np.where(q <= 0, self.minimum, np.where(q >= 1, self.maximum, result))
+
+    def histogram(self, bins: int) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+        """Approximate counts of values in `bins` bins of equal width between the minimum and the maximum."""
+        if not self.count:
+            return np.zeros(bins, dtype=np.int64), np.linspace(0.0, 1.0, bins + 1)
+
+        edges = np.linspace(float(self.minimum), float(self.maximum), bins + 1)
+        values, cumulated = self._weighted()
+
+        # number of values below each edge, the last bin includes the maximum like numpy.histogram
+        ranks = np.concatenate([[0.0], cumulated])
+        below = ranks[np.searchsorted(values, edges, side="left")]
+
+        # the values the first and last retained values stand for are spread up to the exact minimum and maximum
+        low, high = (edges > self.minimum) & (edges <= values[0]), edges > values[-1]
+        below[low] = np.interp(edges[low], [float(self.minimum), float(values[0])], ranks[:2])
+        below[high] = np.interp(edges[high], [float(values[-1]), float(self.maximum)], ranks[-2:])
+        below[-1] = self.count
+
+        return np.diff(np.rint(below).astype(np.int64)), edges
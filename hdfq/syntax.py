@@ -13,6 +13,7 @@ class Syntax(str, Enum):
     # Punctuation ---------------------
     dot = "."
     comma = ","
+    colon = ":"
     equal = "="
     octothorpe = "#"
     left_parenthesis = "("
@@ -22,8 +23,13 @@ class Syntax(str, Enum):
     left_angle_bracket = "<"
     right_angle_bracket = ">"
     pipe = "|"
+    plus = "+"
+    exclamation_mark = "!"
+    ampersand = "&"
 
     # Literal -------------------------
     boolean = "boolean"
     integer = "int"
+    float = "float"
     identifier = "identifier"
+    file_reference = "file_reference"
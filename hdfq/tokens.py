@@ -14,6 +14,8 @@ class Token(NamedTuple):
         return f"Token<{self.kind}={self.value}>"
 
     def short_repr(self) -> str:
+        if self.kind == Syntax.file_reference:
+            return f"@{self.value}:"
         return str(self.kind.value) if self.value is None else str(self.value)
 
 
@@ -26,6 +28,7 @@ NONE = Token(Syntax.none)
 
 DOT = Token(Syntax.dot)
 COMMA = Token(Syntax.comma)
+COLON = Token(Syntax.colon)
 EQUAL = Token(Syntax.equal)
 OCTOTHORPE = Token(Syntax.octothorpe)
 LEFT_PARENTHESIS = Token(Syntax.left_parenthesis)
@@ -35,10 +38,15 @@ RIGHT_BRACKET = Token(Syntax.right_bracket)
 LEFT_ANGLE_BRACKET = Token(Syntax.left_angle_bracket)
 RIGHT_ANGLE_BRACKET = Token(Syntax.right_angle_bracket)
 PIPE = Token(Syntax.pipe)
+PLUS = Token(Syntax.plus)
+EXCLAMATION_MARK = Token(Syntax.exclamation_mark)
+AMPERSAND = Token(Syntax.ampersand)
 
 BOOLEAN = functools.partial(Token, Syntax.boolean)
 INT = functools.partial(Token, Syntax.integer)
+FLOAT = functools.partial(Token, Syntax.float)
 IDENTIFIER = functools.partial(Token, Syntax.identifier)
+FILE_REFERENCE = functools.partial(Token, Syntax.file_reference)
 
 
 def repr_tokens(tokens: list[Token]) -> str:
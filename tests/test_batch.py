@@ -0,0 +1,45 @@
+from tempfile import NamedTemporaryFile
+
+import ch5mpy as ch
+import pytest
+
+from hdfq.display import DisplayOptions
+from hdfq.exceptions import ParseError
+from hdfq.hdfq import run_batch
+from hdfq.index import build_index
+
+
+def test_run_batch(capsys):
+    tmp_file = NamedTemporaryFile(suffix=".h5")
+    with ch.File(tmp_file.name, mode=ch.H5Mode.WRITE_TRUNCATE) as file:
+        file.attrs["version"] = 2
+
+    run_batch(["#version", ".a = 1", ".a"], tmp_file.name, DisplayOptions(output="json"), delimiter="--")
+
+    assert capsys.readouterr().out == '2\n--\n{"#version":2,"a":1}\n--\n1\n'
+
+
+def test_run_batch_parses_all_filters_first():
+    tmp_file = NamedTemporaryFile(suffix=".h5")
+    with ch.File(tmp_file.name, mode=ch.H5Mode.WRITE_TRUNCATE):
+        pass
+
+    with pytest.raises(ParseError):
+        run_batch([".a = 1", ".a ="], tmp_file.name)
+
+    with ch.File(tmp_file.name, mode=ch.H5Mode.READ) as file:
+        assert "a" not in file
+
+
+def test_run_batch_uses_index(tmp_path, capsys, monkeypatch):
+    path = tmp_path / "file.h5"
+    with ch.File(path, mode=ch.H5Mode.WRITE_TRUNCATE) as file:
+        file.attrs["version"] = 2
+
+    build_index(path)
+    # the file is not opened for filters answered from the index
+    monkeypatch.setattr(ch.H5Dict, "read", None)
+
+    run_batch(["#version", "kattrs"], path, delimiter="--")
+
+    assert capsys.readouterr().out == "2\n--\n[\n  'version'\n]\n"
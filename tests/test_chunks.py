@@ -0,0 +1,59 @@
+import h5py
+import numpy as np
+
+from hdfq.chunks import (
+    allocated_chunks,
+    append_rows,
+    copy_chunk,
+    iter_append_blocks,
+    iter_chunk_blocks,
+    same_layout,
+)
+
+
+def test_copy_chunk(tmp_path):
+    with h5py.File(tmp_path / "file.h5", mode="w") as file:
+        source = file.create_dataset("a", data=np.arange(100.0), chunks=(10,), compression="gzip", shuffle=True)
+        destination = file.create_dataset(
+            "b", shape=(100,), dtype=float, chunks=(10,), compression="gzip", shuffle=True
+        )
+        other = file.create_dataset("c", shape=(100,), dtype=float, chunks=(10,), compression="gzip")
+
+        assert same_layout(source, destination)
+        assert not same_layout(source, other)
+
+        copy_chunk(source, destination, (20,))
+
+        assert allocated_chunks(destination) == [(20,)]
+        assert np.array_equal(destination[20:30], np.arange(20.0, 30.0))
+
+
+def test_iter_chunk_blocks(tmp_path):
+    with h5py.File(tmp_path / "file.h5", mode="w") as file:
+        dset = file.create_dataset("a", shape=(25, 12), dtype=float, chunks=(5, 8))
+
+        assert list(iter_chunk_blocks(dset, 2 * 5 * 8 * 8)) == [
+            (slice(0, 10), slice(0, 8)),
+            (slice(0, 10), slice(8, 12)),
+            (slice(10, 20), slice(0, 8)),
+            (slice(10, 20), slice(8, 12)),
+            (slice(20, 25), slice(0, 8)),
+            (slice(20, 25), slice(8, 12)),
+        ]
+
+
+def test_iter_append_blocks():
+    assert list(iter_append_blocks(25, 37, 10, 20)) == [(0, 5), (5, 25), (25, 37)]
+    assert list(iter_append_blocks(20, 5, 10, 20)) == [(0, 5)]
+
+
+def test_append_rows(tmp_path):
+    with h5py.File(tmp_path / "file.h5", mode="w") as file:
+        log = file.create_dataset("log", data=np.arange(20.0), chunks=(10,), maxshape=(None,), compression="gzip")
+        staging = file.create_dataset("staging", data=np.arange(100.0, 125.0), chunks=(10,), compression="gzip")
+
+        append_rows(log, staging)
+        append_rows(log, np.array([-1.0, -2.0]))
+        append_rows(log, staging)
+
+        assert np.array_equal(log, np.concatenate([np.arange(20.0), staging, [-1.0, -2.0], staging]))
@@ -0,0 +1,30 @@
+from tempfile import NamedTemporaryFile
+
+import ch5mpy as ch
+import numpy as np
+
+from hdfq.display import DisplayOptions, read_corners, repr_object
+
+
+def test_read_corners():
+    data = np.arange(8 * 4 * 10).reshape(8, 4, 10)
+
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        file.create_dataset("a", data=data, chunks=(2, 2, 2))
+        corners, truncated = read_corners(ch.H5Dict(file)["a"])
+
+    assert truncated == (True, False, True)
+    assert np.array_equal(corners, data[np.ix_([0, 1, 2, 5, 6, 7], range(4), [0, 1, 2, 7, 8, 9])])
+    assert np.array_equal(read_corners(data)[0], corners)
+
+
+def test_repr_object_depth_and_max_children():
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        for name in "abcd":
+            file.create_group(f"{name}/nested").attrs["x"] = 1
+
+        representation = repr_object(ch.H5Dict(file), offset=0, options=DisplayOptions(depth=1, max_children=2))
+
+    assert representation == "{\n  .a: {...},\n  .b: {...},\n  ... (2 more)\n}"
@@ -1,10 +1,15 @@
 from tempfile import NamedTemporaryFile
 
 import ch5mpy as ch
+import h5py
 import numpy as np
+import pytest
 
 from hdfq import eval
+from hdfq.evaluation import eval_statement
+from hdfq.exceptions import EvalError
 from hdfq.parser import parse
+from hdfq.serialize import dumps
 
 
 def test_evaluate_dataset_creation_empty():
@@ -36,6 +41,37 @@ def test_evaluate_dataset_creation():
         assert h5_object["a"].dtype == np.float32
 
 
+def test_evaluate_dataset_creation_constant_is_not_written():
+    tree, _ = parse(".a = [5, compression=gzip](1000000, 100)<f8>")
+
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        eval(tree, ch.H5Dict(file))
+
+        assert file["a"].id.get_storage_size() == 0
+        assert file["a"].compression == "gzip"
+        assert np.all(file["a"][:10] == 5)
+
+
+@pytest.mark.parametrize("filter", [".a = [2](10)<U5>", ".a = [1.5](10)<i4>", ".a = [300](10)<i1>", ".a = [1](10)<zz>"])
+def test_evaluate_dataset_creation_constant_must_fit_type(filter):
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        with pytest.raises(EvalError):
+            eval(parse(filter)[0], ch.H5Dict(file))
+
+        assert "a" not in file
+
+
+def test_evaluate_dataset_creation_replaces_object():
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        file.create_dataset("a", data=np.arange(3))
+        eval(parse(".a = [2](4)<i4>")[0], ch.H5Dict(file))
+
+        assert np.array_equal(file["a"][()], [2, 2, 2, 2])
+
+
 def test_evaluate_dataset_creation_array():
     tree, _ = parse(".a = [0, 1, 2]")
 
@@ -49,3 +85,223 @@ def test_evaluate_dataset_creation_array():
         assert h5_object["a"].shape == (20, 20)
         assert np.array_equal(h5_object["a"], [0, 1, 2])
         assert h5_object["a"].dtype == np.int32
+
+
+def test_evaluate_index():
+    tree, _ = parse(".a[2:8:2, -1]")
+
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        file.create_dataset("a", data=np.arange(100).reshape(10, 10), chunks=(2, 2))
+        h5_object = ch.H5Dict(file)
+
+        assert np.array_equal(eval_statement(tree.body[0], h5_object), [29, 49, 69])
+
+
+def test_evaluate_sizes():
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        file.create_dataset("a", data=np.zeros((100, 10)), chunks=(10, 10), compression="gzip")
+        group = file.create_group("g")
+        group.create_dataset("b", data=np.arange(5))
+        group.create_dataset("TOTAL", data=np.arange(2))
+        group["link"] = group["b"]
+        group["soft"] = h5py.SoftLink("/a")
+        group["root"] = file
+
+        sizes = eval_statement(parse("sizes")[0].body[0], ch.H5Dict(file))
+
+    # sizes are numbers of bytes, only displayed in human readable units
+    a = sizes["children"]["a"]
+    assert a["logical"] == 8000 and repr(a["logical"]) == "'8.00kB'"
+    assert a["ratio"] > 1
+    assert a["chunks"] == 10
+    assert a["chunk_shape"] == (10, 10)
+    # links are not followed and objects reached through several hard links are counted once
+    assert sizes["children"]["g"] == {
+        "storage": 56,
+        "logical": 56,
+        "ratio": 1.0,
+        "children": {
+            "b": {"storage": 40, "logical": 40, "ratio": 1.0},
+            "TOTAL": {"storage": 16, "logical": 16, "ratio": 1.0},
+        },
+    }
+    assert sizes["logical"] == 8056
+    assert dumps(sizes["children"]["g"]["children"]["b"]) == '{"storage":40,"logical":40,"ratio":1.0}'
+
+
+def test_evaluate_copy_object():
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        file.create_dataset("a", data=np.arange(100), chunks=(10,), compression="gzip")
+        file.create_group("g").create_dataset("b", data=np.arange(5))
+        h5_object = ch.H5Dict(file)
+
+        eval(parse(".c = .a")[0], h5_object)
+        eval(parse(".h = .g")[0], h5_object)
+
+        assert file["c"].compression == "gzip"
+        assert file["c"].chunks == (10,)
+        assert np.array_equal(file["h"]["b"], np.arange(5))
+
+
+def test_evaluate_link():
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        file.create_dataset("a", data=np.arange(100))
+        h5_object = ch.H5Dict(file)
+
+        eval(parse(".b = link(.a)")[0], h5_object)
+        eval(parse(".c = link(.a, soft=true)")[0], h5_object)
+
+    with h5py.File(tmp_file.name) as file:
+        assert file["b"] == file["a"]
+        assert file.get("c", getlink=True).path == "/a"
+
+
+def test_evaluate_copy_from_file_reference():
+    reference_file, tmp_file = NamedTemporaryFile(suffix=".h5"), NamedTemporaryFile()
+    with h5py.File(reference_file.name, mode="w") as reference:
+        reference.create_group("calib").attrs["version"] = 2
+        reference["calib"].create_dataset("table", data=np.arange(100), chunks=(10,), compression="gzip")
+
+    with ch.File(tmp_file.name, mode="r+") as file:
+        eval(parse(f".calib = @{reference_file.name}:.calib")[0], ch.H5Dict(file))
+
+        assert file["calib"].attrs["version"] == 2
+        assert file["calib"]["table"].compression == "gzip"
+        assert np.array_equal(file["calib"]["table"], np.arange(100))
+
+
+def test_evaluate_append():
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        file.create_dataset("log", data=np.ones((5, 2)), chunks=(4, 2), maxshape=(None, 2))
+        file.create_dataset("fixed", data=np.ones((5, 2)))
+        h5_object = ch.H5Dict(file)
+
+        eval(parse(".log += .fixed")[0], h5_object)
+        eval(parse(".log += 2")[0], h5_object)
+        eval(parse(".log += [[3, 4], [5, 6]]")[0], h5_object)
+
+        assert np.array_equal(file["log"], np.vstack([np.ones((10, 2)), [[2, 2], [3, 4], [5, 6]]]))
+
+        with pytest.raises(EvalError):
+            eval(parse(".fixed += 2")[0], h5_object)
+
+        with pytest.raises(EvalError, match="different lengths"):
+            eval(parse(".log += [[1, 2], [3]]")[0], h5_object)
+
+
+def test_evaluate_select():
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        file.create_dataset("table/flags", data=[0, 4, 0, 6, 4])
+        file.create_dataset("table/id", data=[10, 11, 12, 13, 14])
+        h5_object = ch.H5Dict(file)
+
+        def evaluate(filter):
+            context = h5_object
+            for statement in parse(filter)[0].body[:-1]:
+                context = eval_statement(statement, context)
+            return context
+
+        assert evaluate(".table | where(.flags & 2)").tolist() == [3]
+        assert evaluate(".table.id | select(. > 12)").tolist() == [13, 14]
+        assert evaluate(".table | select(.flags == 4) | .id").tolist() == [11, 14]
+
+
+def test_evaluate_value_counts_of_strings():
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        h5_object = ch.H5Dict(file)
+        h5_object["kind"] = np.array(["mu", "e", "e"])
+
+        assert eval_statement(parse("value_counts")[0].body[0], h5_object["kind"]) == {"e": 2, "mu": 1}
+
+
+def test_evaluate_writes_are_validated_before_being_applied():
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        file.create_dataset("a", data=np.arange(3))
+        file.create_group("b")
+        h5_object = ch.H5Dict(file)
+
+        with pytest.raises(EvalError):
+            eval(parse(".a#x = 1 | .b#y = 2 | del(.c)")[0], h5_object)
+
+        assert "x" not in file["a"].attrs and "y" not in file["b"].attrs
+
+        eval(parse(".a#x = 1 | .b#y = 2 | .c = [0](4) | .c#z = 3")[0], h5_object)
+
+        assert file["a"].attrs["x"] == 1 and file["b"].attrs["y"] == 2 and file["c"].attrs["z"] == 3
+
+
+def test_evaluate_dry_run(capsys):
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        file.create_dataset("a", data=np.arange(3))
+
+        eval(parse(".a#x = 1 | .a[0:2] = 5 | del(.a)")[0], ch.H5Dict(file), dry_run=True)
+
+        assert capsys.readouterr().out == "set /a#x = 1\nset /a [0:2] = 5\ndelete /a\n"
+        assert "a" in file and "x" not in file["a"].attrs
+
+
+def test_evaluate_dry_run_dependent_statements(capsys):
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        file.create_group("g").attrs["x"] = 1
+
+        eval(parse(".n = [0](3) | .n += 1 | .g | .h = [1](2) | .h#y = 2")[0], ch.H5Dict(file), dry_run=True)
+
+        assert capsys.readouterr().out == (
+            "set /n = dataset(3,)<f>\nappend /n += 1 (1 rows)\nset /g/h = dataset(2,)<f>\nset /g/h#y = 2\n"
+        )
+        assert list(file.keys()) == ["g"] and list(file["g"].keys()) == []
+
+
+def test_evaluate_failure_after_dependent_writes_leaves_file_untouched():
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        h5_object = ch.H5Dict(file)
+
+        with pytest.raises(EvalError):
+            eval(parse(".a = [1](3) | .a#x = 2 | del(.missing)")[0], h5_object)
+
+        assert "a" not in file
+
+
+@pytest.mark.parametrize(
+    "filter, message",
+    [
+        (".a = [1](3) | .b = .missing", "'/missing', no such object"),
+        (".a = [1](3) | .g.missing += 1", "'/g/missing', no such object"),
+        (".a = [1](3) | .g#y = .g#missing", "'/g#missing', no such attribute"),
+    ],
+)
+def test_evaluate_missing_object_is_eval_error(filter, message):
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        file.create_group("g")
+
+        with pytest.raises(EvalError, match=message):
+            eval(parse(filter)[0], ch.H5Dict(file))
+
+        assert "a" not in file
+
+
+def test_evaluate_errors_while_writing_keep_previous_writes(monkeypatch):
+    def failing_append(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr("hdfq.evaluation.append_rows", failing_append)
+
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        with pytest.raises(OSError):
+            eval(parse(".a = [1](3) | .a += 2")[0], ch.H5Dict(file))
+
+        # writes applied before an error while writing are not rolled back
+        assert file["a"].shape == (3,)
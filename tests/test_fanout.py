@@ -0,0 +1,75 @@
+import os
+
+import ch5mpy as ch
+
+from hdfq import fanout
+from hdfq.display import DisplayOptions
+from hdfq.fanout import evaluate_file, run_many
+
+
+def make_files(tmp_path, n):
+    paths = []
+    for i in range(n):
+        paths.append(tmp_path / f"{i}.h5")
+        with ch.File(paths[-1], mode=ch.H5Mode.WRITE_TRUNCATE) as file:
+            file.attrs["version"] = i
+
+    return paths
+
+
+def test_run_many(tmp_path, capsys):
+    paths = make_files(tmp_path, 4)
+
+    assert run_many(["#version"], paths, DisplayOptions(output="json"), jobs=2)
+    assert capsys.readouterr().out.splitlines() == [f'{{"path":"{path}","value":{i}}}' for i, path in enumerate(paths)]
+
+
+def test_run_many_rich_and_errors(tmp_path, capsys):
+    paths = make_files(tmp_path, 2)
+    with ch.File(paths[1], mode=ch.H5Mode.READ_WRITE) as file:
+        del file.attrs["version"]
+
+    assert not run_many(["#version"], paths, jobs=1)
+
+    captured = capsys.readouterr()
+    assert captured.out == f"==> {paths[0]} <==\n0\n==> {paths[1]} <==\n"
+    assert captured.err.startswith(f"hdfq: {paths[1]}: ")
+
+
+def test_run_many_evaluates_files_once(tmp_path, capsys):
+    paths = make_files(tmp_path, 2)
+    (tmp_path / "link.h5").hardlink_to(paths[0])
+
+    assert run_many(["#version"], [paths[0], tmp_path / "link.h5", paths[1], paths[0]], jobs=2)
+    assert capsys.readouterr().out == f"==> {paths[0]} <==\n0\n==> {paths[1]} <==\n1\n"
+
+
+def test_run_many_bounds_pending_files(tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(fanout, "WINDOW", 1)
+    paths = make_files(tmp_path, 9)
+
+    assert run_many(["#version"], paths, DisplayOptions(output="json"), jobs=2, ordered=False)
+    assert sorted(capsys.readouterr().out.splitlines()) == sorted(
+        f'{{"path":"{path}","value":{i}}}' for i, path in enumerate(paths)
+    )
+
+
+def _crash_on_first_file(path):
+    if path.name == "0.h5":
+        os._exit(1)
+
+    return evaluate_file(path)
+
+
+def test_run_many_survives_crashed_workers(tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(fanout, "evaluate_file", _crash_on_first_file)
+    monkeypatch.setattr(fanout, "WINDOW", 1)
+    paths = make_files(tmp_path, 6)
+
+    assert not run_many(["#version"], paths, DisplayOptions(output="json"), jobs=2)
+
+    # files in flight when the worker died are reported, the others are evaluated by a new pool
+    captured = capsys.readouterr()
+    assert captured.err.startswith(f"hdfq: {paths[0]}: BrokenProcessPool: ")
+    assert "Traceback" not in captured.err
+    assert captured.out.splitlines()[-2:] == [f'{{"path":"{path}","value":{i}}}' for i, path in enumerate(paths)][-2:]
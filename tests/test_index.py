@@ -0,0 +1,108 @@
+import ch5mpy as ch
+import h5py
+import numpy as np
+
+from hdfq.evaluation import eval_index
+from hdfq.hdfq import run
+from hdfq.index import build_index, load_index
+from hdfq.parser import parse
+
+
+def make_file(path):
+    with ch.File(path, mode=ch.H5Mode.WRITE_TRUNCATE) as file:
+        file.attrs["version"] = 2
+        file.create_group("g").create_dataset("a", data=np.arange(10), chunks=(5,))
+
+    return path
+
+
+def test_build_and_load_index(tmp_path):
+    path = make_file(tmp_path / "file.h5")
+    build_index(path)
+
+    root = load_index(path)
+    assert root is not None
+    assert root.attrs == {"version": 2}
+    assert root.children["g"].children["a"].shape == (10,)
+    assert root.children["g"].children["a"].chunk_shape == (5,)
+    assert root.children["g"].children["a"].chunks == 2
+
+
+def test_index_invalidated_by_modification(tmp_path):
+    path = make_file(tmp_path / "file.h5")
+    build_index(path)
+
+    with ch.File(path, mode=ch.H5Mode.READ_WRITE) as file:
+        file.attrs["version"] = 3
+
+    assert load_index(path) is None
+
+
+def test_eval_index(tmp_path, capsys):
+    path = make_file(tmp_path / "file.h5")
+    build_index(path)
+    root = load_index(path)
+    assert root is not None
+
+    assert eval_index(parse(".g | keys")[0], root)
+    assert eval_index(parse("#version")[0], root)
+    assert capsys.readouterr().out == "[\n  'a'\n]\n2\n"
+
+    assert not eval_index(parse(".g.a")[0], root)
+    assert not eval_index(parse(".missing | keys")[0], root)
+    assert capsys.readouterr().out == ""
+
+
+def _run_output(filter, path, capsys):
+    try:
+        run(filter, path)
+
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+    return capsys.readouterr().out
+
+
+def test_eval_index_matches_file(tmp_path, capsys):
+    path = make_file(tmp_path / "file.h5")
+    with ch.File(path, mode=ch.H5Mode.READ_WRITE) as file:
+        file["g"].attrs["x"] = 1
+        file["g/a"].attrs["unit"] = "m"
+        file.create_dataset("s", data=3).attrs["y"] = 2
+        file["g"].attrs["bs"] = np.bytes_(b"xx")
+
+        lst = file.create_group("lst")
+        lst.attrs["__h5_type__"] = "list"
+        lst.create_dataset("0", data=np.arange(3))
+
+        file["g"].create_dataset("TOTAL", data=np.arange(2))
+        file["g/soft"] = h5py.SoftLink("/s")
+        links = file.create_group("links")
+        links["alias"] = file["g/a"]
+        links["root"] = file
+
+    filters = [
+        "kattrs",
+        "#version",
+        ".g | kattrs",
+        ".g#x",
+        ".g | keys",
+        ".g.a | kattrs",
+        ".g.a#unit",
+        ".s | kattrs",
+        ".s#y",
+        ".g#bs",
+        ".lst | kattrs",
+        ".lst#__h5_type__",
+        ".lst | keys",
+        ".g | sizes",
+        "sizes",
+        ".links | sizes",
+        ".links.alias | kattrs",
+        ".g.soft#y",
+    ]
+    without_index = [_run_output(filter, path, capsys) for filter in filters]
+
+    build_index(path)
+    assert load_index(path) is not None
+    assert [_run_output(filter, path, capsys) for filter in filters] == without_index
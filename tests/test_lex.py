@@ -67,3 +67,52 @@ def test_lex_dataset_creation():
         Token(Syntax.identifier, "f"),
         Token(Syntax.right_angle_bracket),
     ]
+
+
+def test_lex_index():
+    assert list(tokenize(".a[1:-1, ::2]")) == [
+        Token(Syntax.dot),
+        Token(Syntax.identifier, "a"),
+        Token(Syntax.left_bracket),
+        Token(Syntax.integer, 1),
+        Token(Syntax.colon),
+        Token(Syntax.integer, -1),
+        Token(Syntax.comma),
+        Token(Syntax.colon),
+        Token(Syntax.colon),
+        Token(Syntax.integer, 2),
+        Token(Syntax.right_bracket),
+    ]
+
+
+def test_lex_file_reference():
+    assert list(tokenize(".a = @'ref file.h5':.b")) == [
+        Token(Syntax.dot),
+        Token(Syntax.identifier, "a"),
+        Token(Syntax.equal),
+        Token(Syntax.file_reference, "ref file.h5"),
+        Token(Syntax.dot),
+        Token(Syntax.identifier, "b"),
+    ]
+
+
+def test_lex_float():
+    assert list(tokenize("quantiles(0.01, -1.5)")) == [
+        Token(Syntax.identifier, "quantiles"),
+        Token(Syntax.left_parenthesis),
+        Token(Syntax.float, 0.01),
+        Token(Syntax.comma),
+        Token(Syntax.float, -1.5),
+        Token(Syntax.right_parenthesis),
+    ]
+
+
+def test_lex_float_like_path():
+    assert list(tokenize(".a.0.1")) == [
+        Token(Syntax.dot),
+        Token(Syntax.identifier, "a"),
+        Token(Syntax.dot),
+        Token(Syntax.integer, 0),
+        Token(Syntax.dot),
+        Token(Syntax.integer, 1),
+    ]
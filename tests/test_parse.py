@@ -192,6 +192,24 @@ def test_parse_multiple_statements():
                 Nodes.Display(),
             ],
         ),
+        (
+            "[fillvalue=-1, chunks=(10, 10), compression=gzip](10, 20)",
+            [
+                Nodes.Assign(
+                    target=Nodes.Get(target=Special.context, value="a"),
+                    value=Nodes.Dataset(
+                        data=None,
+                        shape=(10, 20),
+                        dtype=None,
+                        chunks=(10, 10),
+                        maxshape=None,
+                        compression="gzip",
+                        fillvalue=-1,
+                    ),
+                ),
+                Nodes.Display(),
+            ],
+        ),
     ],
 )
 def test_parse_dataset_creation(pattern, expected):
@@ -202,3 +220,123 @@ def test_parse_dataset_creation(pattern, expected):
 def test_parse_identifier_as_integer():
     tree, _ = parse(".a.3")
     assert tree.body == [Nodes.Get(target=Nodes.Get(target=Special.context, value="a"), value=3), Nodes.Display()]
+
+
+def test_parse_index():
+    tree, _ = parse(".a.b[1000000:1000100, ::4]")
+    assert tree.body == [
+        Nodes.Index(
+            target=Nodes.Get(target=Nodes.Get(target=Special.context, value="a"), value="b"),
+            value=(slice(1000000, 1000100, None), slice(None, None, 4)),
+        ),
+        Nodes.Display(),
+    ]
+
+
+def test_parse_index_integer():
+    tree, _ = parse(".a[-1]")
+    assert tree.body == [Nodes.Index(target=Nodes.Get(target=Special.context, value="a"), value=(-1,)), Nodes.Display()]
+
+
+def test_parse_invalid_index():
+    with pytest.raises(ParseError):
+        parse(".a[1:2:3:4]")
+
+
+def test_parse_link():
+    tree, _ = parse(".b = link(.a.c, soft=true)")
+    assert tree.body == [
+        Nodes.Assign(
+            target=Nodes.Get(target=Special.context, value="b"),
+            value=Nodes.Link(
+                source=Nodes.Get(target=Nodes.Get(target=Special.context, value="a"), value="c"), soft=True
+            ),
+        ),
+        Nodes.Display(),
+    ]
+
+
+def test_parse_append():
+    tree, _ = parse(".log += .staging")
+    assert tree.body == [
+        Nodes.Append(
+            target=Nodes.Get(target=Special.context, value="log"),
+            value=Nodes.Get(target=Special.context, value="staging"),
+        ),
+        Nodes.Display(),
+    ]
+
+
+def test_parse_append_rows():
+    tree, _ = parse(".log += [[1, -2.5], [3, 4]]")
+    assert tree.body == [
+        Nodes.Append(
+            target=Nodes.Get(target=Special.context, value="log"), value=Nodes.Constant(value=[[1, -2.5], [3, 4]])
+        ),
+        Nodes.Display(),
+    ]
+
+    with pytest.raises(ParseError, match="Expected a list of numbers"):
+        parse(".log += [1, a]")
+
+
+def test_parse_reduction():
+    tree, _ = parse(".a | mean")
+    assert tree.body == [Nodes.Get(target=Special.context, value="a"), Nodes.Reduction(value="mean"), Nodes.Display()]
+
+
+def test_parse_quantiles_and_histogram():
+    tree, _ = parse(".a | quantiles(0.01, 0.5, 1)")
+    assert tree.body[1] == Nodes.Reduction(value="quantiles", arguments=(0.01, 0.5, 1.0))
+
+    tree, requires_write_access = parse(".a | histogram(bins=100)")
+    assert tree.body[1] == Nodes.Reduction(value="histogram", arguments=(100,))
+    assert not requires_write_access
+
+    with pytest.raises(ParseError):
+        parse(".a | quantiles(1.5)")
+
+    with pytest.raises(ParseError):
+        parse(".a | histogram(bins=0)")
+
+
+def test_parse_topk_and_value_counts():
+    tree, _ = parse(".a | topk(20)")
+    assert tree.body[1] == Nodes.Reduction(value="topk", arguments=(20,))
+
+    tree, _ = parse(".a | value_counts")
+    assert tree.body[1] == Nodes.Reduction(value="value_counts")
+
+    tree, _ = parse(".a | value_counts(5)")
+    assert tree.body[1] == Nodes.Reduction(value="value_counts", arguments=(5,))
+
+    with pytest.raises(ParseError):
+        parse(".a | topk()")
+
+
+def test_parse_select():
+    tree, requires_write_access = parse(".t | select(.x >= 0.5)")
+    assert tree.body[1] == Nodes.Select(target=Nodes.Get(target=Special.context, value="x"), operator=">=", value=0.5)
+    assert not requires_write_access
+
+    tree, _ = parse("where(. & 4)")
+    assert tree.body[0] == Nodes.Where(target=Special.context, operator="&", value=4)
+
+    with pytest.raises(ParseError):
+        parse("select(.x = 1)")
+
+
+def test_parse_file_reference():
+    tree, _ = parse(".a = @ref.h5:.b")
+    assert tree.body == [
+        Nodes.Assign(
+            target=Nodes.Get(target=Special.context, value="a"),
+            value=Nodes.Get(target=Nodes.FileReference(value="ref.h5"), value="b"),
+        ),
+        Nodes.Display(),
+    ]
+
+
+def test_parse_assign_to_file_reference_should_error():
+    with pytest.raises(ParseError):
+        parse("@ref.h5:.a = 1")
@@ -0,0 +1,39 @@
+from tempfile import NamedTemporaryFile
+
+import h5py
+import numpy as np
+
+from hdfq.plan import Operation, WritePlan, ancestors, hollow_copy
+
+
+def test_ancestors():
+    assert list(ancestors("/a/b#x")) == ["/a/b#x", "/a/b", "/a", "/"]
+    assert list(ancestors("/")) == ["/"]
+
+
+def test_depends_on():
+    plan = WritePlan()
+    plan.add(Operation("set", "/a#x"))
+    plan.add(Operation("delete", "/g/c"))
+
+    assert not plan.depends_on(["/a#y", "/b", "/g"])
+    assert plan.depends_on(["/g/c/d"])
+    assert plan.depends_on(["/b"], copied=["/a"])
+    assert not plan.depends_on(["/b"], copied=["/h"])
+    assert plan.depends_on([None])
+
+
+def test_hollow_copy():
+    tmp_file = NamedTemporaryFile()
+    with h5py.File(tmp_file.name, mode="r+") as file:
+        file.create_dataset("g/a", data=np.arange(10), chunks=(4,), maxshape=(None,)).attrs["x"] = 1
+        file.create_dataset("e", data=h5py.Empty("f"))
+        file["s"] = h5py.SoftLink("/g/a")
+
+        with h5py.File("hollow", "w", driver="core", backing_store=False) as copy:
+            hollow_copy(file, copy)
+
+            assert copy["g/a"].shape == (10,) and copy["g/a"].chunks == (4,) and copy["g/a"].maxshape == (None,)
+            assert copy["g/a"].attrs["x"] == 1 and copy["g/a"].id.get_storage_size() == 0
+            assert copy["e"].shape is None
+            assert copy.get("s", getlink=True).path == "/g/a"
@@ -0,0 +1,169 @@
+import h5py
+import numpy as np
+import pytest
+
+from hdfq import reductions
+from hdfq.exceptions import EvalError
+from hdfq.reductions import dataset_stats, reduce_data, stats_path
+
+
+@pytest.fixture
+def file(tmp_path, monkeypatch):
+    monkeypatch.setattr(reductions, "BLOCK_SIZE", 1024)
+
+    with h5py.File(tmp_path / "file.h5", mode="w") as file:
+        file.create_dataset("a", data=np.arange(-500.0, 1500.0).reshape(100, 20), chunks=(10, 8))
+        file.create_dataset("nan", data=[1.0, np.nan, 0.0, 3.0, np.nan])
+        file.create_dataset("int", data=np.full(1000, 2**30, dtype=np.int32), chunks=(100,))
+        file.create_dataset("empty", shape=(0,), dtype=float, chunks=(10,), maxshape=(None,))
+        file.create_dataset("ids", data=np.arange(1000) % 7 * (np.arange(1000) % 3), chunks=(64,))
+        file.create_dataset("kind", data=[b"b", b"a", b"b", b"c", b"b", b"a"], chunks=(2,))
+
+    with h5py.File(tmp_path / "file.h5", mode="r") as file:
+        yield file
+
+
+@pytest.mark.parametrize("reduction", ["sum", "mean", "min", "max"])
+def test_reduce_data(file, reduction):
+    expected = getattr(np, reduction)(file["a"][()])
+
+    assert reduce_data(file["a"], reduction) == expected
+    assert reduce_data(file["a"][()], reduction) == expected
+
+
+def test_reduce_data_count_nan(file):
+    assert reduce_data(file["nan"], "count_nan") == 2
+    assert reduce_data(file["int"], "count_nan") == 0
+    assert np.isnan(reduce_data(file["nan"], "max"))
+
+
+def test_reduce_data_does_not_overflow(file):
+    assert reduce_data(file["int"], "sum") == 2**30 * 1000
+
+
+def test_reduce_data_sum_is_exact(file, tmp_path):
+    # values above 2**53 lose precision as float64, sums of 64 bits integers overflow (the fixture makes small blocks)
+    data = np.concatenate([[2**63 + 1], np.full(999, 2**50, dtype=np.uint64)]).astype(np.uint64)
+    with h5py.File(tmp_path / "unsigned.h5", mode="w") as unsigned:
+        unsigned.create_dataset("u", data=data, chunks=(100,))
+
+        assert reduce_data(unsigned["u"], "sum") == 2**63 + 1 + 999 * 2**50
+
+    assert reduce_data(np.array([2**63 + 5, 2**63 + 7, 3], dtype=np.uint64), "sum") == 2**64 + 15
+    assert reduce_data(np.array([-(2**63), -(2**63), 1], dtype=np.int64), "sum") == -(2**64) + 1
+
+
+def test_reduce_data_mean_complex():
+    assert reduce_data(np.array([1 + 2j, 3 + 4j]), "mean") == 2 + 3j
+
+
+def test_reduce_data_parallel(file, monkeypatch):
+    monkeypatch.setattr(reductions, "PARALLEL_THRESHOLD", 0)
+
+    assert reduce_data(file["a"], "sum", jobs=2) == file["a"][()].sum()
+    assert reduce_data(file["a"], "min", jobs=2) == -500.0
+    assert reduce_data(file["int"], "mean", jobs=2) == 2**30
+
+
+def test_reduce_empty_data(file):
+    assert reduce_data(file["empty"], "sum") == 0
+
+    with pytest.raises(EvalError):
+        reduce_data(file["empty"], "min")
+
+
+def test_reduce_data_stats(file, monkeypatch):
+    values = file["a"][()]
+    stats = reduce_data(file["a"], "stats")
+
+    assert stats["count"] == values.size
+    assert (stats["min"], stats["max"], stats["zero_count"]) == (-500.0, 1499.0, 1)
+    assert stats["mean"] == pytest.approx(values.mean())
+    assert stats["std"] == pytest.approx(values.std())
+
+    monkeypatch.setattr(reductions, "PARALLEL_THRESHOLD", 0)
+    assert reduce_data(file["a"], "stats", jobs=2) == pytest.approx(stats)
+
+
+def test_reduce_data_stats_nan(file):
+    assert reduce_data(file["nan"], "stats") == {
+        "count": 3,
+        "min": 0.0,
+        "max": 3.0,
+        "mean": pytest.approx(4 / 3),
+        "std": pytest.approx(np.std([1.0, 0.0, 3.0])),
+        "nan_count": 2,
+        "zero_count": 1,
+    }
+    assert reduce_data(file["empty"], "stats")["mean"] is None
+
+
+def test_dataset_stats_are_cached(tmp_path, monkeypatch):
+    path = tmp_path / "file.h5"
+    with h5py.File(path, mode="w") as file:
+        file.create_dataset("a", data=np.arange(10.0))
+
+    with h5py.File(path, mode="r") as file:
+        stats = dataset_stats(file["a"])
+
+    assert stats_path(path).exists()
+
+    def fail(*args):
+        raise AssertionError("stats were computed again")
+
+    with h5py.File(path, mode="r") as file, monkeypatch.context() as m:
+        m.setattr(reductions, "reduce_data", fail)
+        assert dataset_stats(file["a"]) == stats
+
+    with h5py.File(path, mode="r+") as file:
+        file["a"][0] = 100.0
+
+    with h5py.File(path, mode="r") as file:
+        assert dataset_stats(file["a"])["max"] == 100.0
+
+
+def test_reduce_data_quantiles_and_histogram(file, monkeypatch):
+    monkeypatch.setattr(reductions, "PARALLEL_THRESHOLD", 0)
+
+    assert reduce_data(file["a"], "quantiles", arguments=(0.0, 0.5, 1.0), jobs=2) == {
+        "0.0": -500.0,
+        "0.5": 499.0,
+        "1.0": 1499.0,
+    }
+    assert reduce_data(file["nan"], "quantiles", arguments=(1.0,)) == {"1.0": 3.0}
+
+    histogram = reduce_data(file["a"], "histogram", arguments=(4,), jobs=2)
+    assert histogram["counts"].tolist() == [500, 500, 500, 500]
+    assert histogram["edges"].tolist() == np.histogram(file["a"], bins=4)[1].tolist()
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_reduce_data_topk_unique_value_counts(file, monkeypatch, jobs):
+    monkeypatch.setattr(reductions, "PARALLEL_THRESHOLD", 0)
+    ids = file["ids"][()]
+
+    assert reduce_data(file["a"], "topk", jobs, arguments=(3,)).tolist() == [1499.0, 1498.0, 1497.0]
+    assert reduce_data(file["nan"], "topk", jobs, arguments=(10,)).tolist() == [3.0, 1.0, 0.0]
+    assert reduce_data(file["ids"], "unique", jobs).tolist() == np.unique(ids).tolist()
+    assert reduce_data(file["kind"], "unique", jobs).tolist() == ["a", "b", "c"]
+
+    values, counts = np.unique(ids, return_counts=True)
+    assert reduce_data(file["ids"], "value_counts", jobs) == {
+        str(v): c for v, c in sorted(zip(values, counts), key=lambda item: -item[1])
+    }
+    assert reduce_data(file["kind"], "value_counts", jobs, arguments=(2,)) == {"b": 3, "a": 2}
+
+
+def test_reduce_empty_data_quantiles(file):
+    assert reduce_data(file["empty"], "quantiles", arguments=(0.0, 0.5)) == {"0.0": None, "0.5": None}
+
+
+def test_reduce_empty_data_unique(file):
+    assert reduce_data(file["empty"], "unique").tolist() == []
+    assert reduce_data(file["empty"], "value_counts") == {}
+
+
+def test_block_sketches_are_seeded_independently():
+    first, second = reductions._sketch(np.arange(100.0)), reductions._sketch(np.arange(100.0, 200.0))
+
+    assert first.rng.integers(2**32) != second.rng.integers(2**32)
@@ -0,0 +1,81 @@
+import h5py
+import numpy as np
+import pytest
+
+from hdfq import repack
+from hdfq.repack import RepackOptions, repack_file
+
+
+def make_file(path):
+    with h5py.File(path, mode="w") as file:
+        file.attrs["version"] = 2
+        file.create_dataset("deleted", data=np.random.rand(100_000))
+        file.create_dataset("x", data=np.arange(10_000.0).reshape(1000, 10), chunks=(100, 10))
+        file["x"].attrs["unit"] = "m"
+        file["link"] = h5py.SoftLink("/x")
+        del file["deleted"]
+
+
+def test_repack_reclaims_space(tmp_path):
+    path = tmp_path / "file.h5"
+    make_file(path)
+
+    report = repack_file(path)
+
+    assert report.reclaimed > 100_000 * 8 * 0.9
+    with h5py.File(path) as file:
+        assert file.attrs["version"] == 2
+        assert file["x"].chunks == (100, 10)
+        assert file["x"].attrs["unit"] == "m"
+        assert file.get("link", getlink=True).path == "/x"
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_repack_changes_layout(tmp_path, jobs, monkeypatch):
+    # chunks are written while others are being encoded
+    monkeypatch.setattr(repack, "WINDOW", 2)
+    path = tmp_path / "file.h5"
+    make_file(path)
+
+    repack_file(path, RepackOptions(compression="gzip", compression_level=4, shuffle=True, chunks=(300, 5)), jobs)
+
+    with h5py.File(path) as file, h5py.File(tmp_path / "expected.h5", mode="w") as expected_file:
+        assert file["x"].chunks == (300, 5)
+        assert file["x"].compression == "gzip"
+        assert file["x"].shuffle
+        assert np.array_equal(file["x"][()], np.arange(10_000.0).reshape(1000, 10))
+
+        # chunks encoded in worker processes must be identical to chunks encoded by HDF5
+        expected = expected_file.create_dataset(
+            "x", data=file["x"][()], chunks=(300, 5), compression="gzip", compression_opts=4, shuffle=True
+        )
+        assert file["x"].id.read_direct_chunk((900, 5)) == expected.id.read_direct_chunk((900, 5))
+
+
+def test_repack_keeps_hard_links(tmp_path):
+    path = tmp_path / "file.h5"
+    with h5py.File(path, mode="w") as file:
+        file.create_dataset("big", data=np.random.rand(100_000))
+        file["alias"] = file["big"]
+        group = file.create_group("g")
+        group["self"] = group
+        group["root"] = file
+
+    report = repack_file(path)
+
+    assert report.reclaimed > -10_000
+    with h5py.File(path) as file:
+        assert file["alias"] == file["big"]
+        assert file["g/self"] == file["g"]
+        assert file["g/root"] == file["/"]
+
+
+def test_repack_leaves_interrupted_repair(tmp_path):
+    path = tmp_path / "file.h5"
+    make_file(path)
+    (tmp_path / "~file.h5").write_bytes(b"partial repair")
+
+    repack_file(path)
+
+    assert (tmp_path / "~file.h5").read_bytes() == b"partial repair"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["file.h5", "~file.h5"]
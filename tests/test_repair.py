@@ -0,0 +1,121 @@
+import ch5mpy as ch
+import h5py
+import numpy as np
+import pytest
+
+from hdfq.repair import Journal, RepairReport, repair_file, repair_group
+
+
+@pytest.mark.parametrize("in_RAM", [False, True])
+def test_repair_preserves_layout(tmp_path, in_RAM):
+    source, destination = tmp_path / "source.h5", tmp_path / "destination.h5"
+
+    with h5py.File(source, mode="w") as file:
+        file.attrs["version"] = 2
+        dset = file.create_dataset("x", shape=(100, 4), chunks=(10, 4), fillvalue=-1.0, compression="gzip")
+        dset[:10] = 1
+        dset.attrs["unit"] = "m"
+        file.create_group("g").create_dataset("y", data=np.arange(5))
+
+    with ch.File(source, mode=ch.H5Mode.READ) as corrupted, ch.File(destination, mode=ch.H5Mode.WRITE_TRUNCATE) as new:
+        repair_group(corrupted, new, verbose=False, in_RAM=in_RAM)
+
+    with h5py.File(source) as original, h5py.File(destination) as repaired:
+        assert repaired.attrs["version"] == 2
+        assert repaired["x"].chunks == (10, 4)
+        assert repaired["x"].compression == "gzip"
+        assert repaired["x"].fillvalue == -1.0
+        assert repaired["x"].attrs["unit"] == "m"
+        assert np.array_equal(repaired["x"][()], original["x"][()])
+        assert np.array_equal(repaired["g/y"][()], np.arange(5))
+
+        if not in_RAM:
+            assert repaired["x"].id.get_num_chunks() == 1
+
+
+@pytest.mark.parametrize("in_RAM", [False, True])
+def test_repair_salvages_readable_chunks(tmp_path, in_RAM):
+    source, destination = tmp_path / "source.h5", tmp_path / "destination.h5"
+
+    with h5py.File(source, mode="w") as file:
+        dset = file.create_dataset("x", data=np.arange(100.0), chunks=(10,), fillvalue=-1.0, compression="gzip")
+        chunk = dset.id.get_chunk_info(3)
+
+    # corrupt the compressed data of the 4th chunk
+    with open(source, "r+b") as raw_file:
+        raw_file.seek(chunk.byte_offset)
+        raw_file.write(b"\xff" * chunk.size)
+
+    with ch.File(source, mode=ch.H5Mode.READ) as corrupted, ch.File(destination, mode=ch.H5Mode.WRITE_TRUNCATE) as new:
+        report = repair_group(corrupted, new, verbose=False, in_RAM=in_RAM)
+
+    expected = np.arange(100.0)
+    expected[30:40] = -1
+
+    with h5py.File(destination) as repaired:
+        assert np.array_equal(repaired["x"][()], expected)
+
+    assert report.as_dict() == {
+        "lost_objects": [],
+        "datasets": {"/x": {"lost_regions": [[[30, 40]]], "lost_elements": 10, "lost_fraction": 0.1}},
+    }
+
+
+def make_groups(path):
+    with h5py.File(path, mode="w") as file:
+        file.attrs["version"] = 2
+        for name in "abc":
+            group = file.create_group(name)
+            group.attrs["name"] = name
+            group.create_dataset("x", data=np.arange(50), chunks=(10,), compression="gzip")
+        file.create_dataset("y", data=np.arange(3))
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_repair_file(tmp_path, jobs):
+    path = tmp_path / "file.h5"
+    make_groups(path)
+
+    assert not repair_file(path, jobs=jobs)
+
+    with h5py.File(path) as repaired:
+        assert repaired.attrs["version"] == 2
+        assert sorted(repaired.keys()) == ["a", "b", "c", "y"]
+        assert repaired["b"].attrs["name"] == "b"
+        assert repaired["b/x"].compression == "gzip"
+        assert np.array_equal(repaired["c/x"][()], np.arange(50))
+
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_repair_file_resumes(tmp_path):
+    path = tmp_path / "file.h5"
+    make_groups(path)
+
+    # simulate a repair interrupted after group 'a' was completed, while copying 'b/x'
+    restore_path = tmp_path / "~file.h5"
+    with h5py.File(restore_path, mode="w") as restored:
+        restored.create_group("a").attrs["resumed"] = True
+        restored.create_group("b").create_dataset("x", data=np.zeros(5))
+
+    (tmp_path / "~file.h5.journal").write_text('{"name": "/a/x"}\n{"name": "/a"}\n{"name": "/b/')
+
+    assert not repair_file(path)
+
+    with h5py.File(path) as repaired:
+        assert repaired["a"].attrs["resumed"]
+        assert "x" not in repaired["a"]
+        assert np.array_equal(repaired["b/x"][()], np.arange(50))
+        assert np.array_equal(repaired["c/x"][()], np.arange(50))
+
+
+def test_journal_resumes_after_last_complete_entry(tmp_path):
+    path = tmp_path / "file.h5.journal"
+    path.write_text('{"name": "/a"}\n{"name": "/b"}')
+
+    journal = Journal(path, RepairReport(), resume=True)
+    journal.record("/c", RepairReport())
+    journal.close()
+
+    assert journal.done == {"/a", "/c"}
+    assert path.read_text() == '{"name": "/a"}\n{"name": "/c"}\n'
@@ -0,0 +1,57 @@
+import h5py
+import numpy as np
+import pytest
+
+from hdfq import selection
+from hdfq.exceptions import EvalError
+from hdfq.selection import RowSelection, gather, match_ranges, ranges_to_indices
+
+
+@pytest.fixture
+def table(tmp_path, monkeypatch):
+    monkeypatch.setattr(selection, "BLOCK_SIZE", 64)
+
+    with h5py.File(tmp_path / "file.h5", mode="w") as file:
+        group = file.create_group("table")
+        group.create_dataset("x", data=np.arange(100) % 30 >= 20, chunks=(8,))
+        group.create_dataset("flags", data=np.arange(100, dtype=np.uint8), chunks=(16,))
+        group.create_dataset("name", data=[f"n{i}".encode() for i in range(100)], chunks=(16,))
+        group.create_dataset("other", data=np.arange(3))
+
+    with h5py.File(tmp_path / "file.h5", mode="r") as file:
+        yield file["table"]
+
+
+def test_match_ranges(table):
+    assert match_ranges(table["x"], None, None).tolist() == [[20, 30], [50, 60], [80, 90]]
+    assert match_ranges(table["flags"], ">=", 95).tolist() == [[95, 100]]
+    assert match_ranges(table["flags"], "&", 64).tolist() == [[64, 100]]
+    assert match_ranges(table["flags"][()], "==", 3).tolist() == [[3, 4]]
+    assert match_ranges(table["flags"], "<", 0).shape == (0, 2)
+
+    with pytest.raises(EvalError):
+        match_ranges(table["name"], "==", 3)
+
+
+def test_ranges_to_indices():
+    assert ranges_to_indices(np.array([[2, 4], [7, 8], [10, 13]])).tolist() == [2, 3, 7, 10, 11, 12]
+    assert ranges_to_indices(np.empty((0, 2), dtype=np.int64)).tolist() == []
+
+
+def test_gather(table, monkeypatch):
+    monkeypatch.setattr(selection, "GATHER_GAP", 1)
+    ranges = np.array([[1, 3], [5, 6], [40, 42], [99, 100]])
+
+    assert gather(table["flags"], ranges).tolist() == [1, 2, 5, 40, 41, 99]
+    assert gather(table["name"], ranges[:2]).tolist() == ["n1", "n2", "n5"]
+    assert gather(table["flags"], ranges[:0]).tolist() == []
+
+
+def test_row_selection(table):
+    rows = RowSelection(table, match_ranges(table["flags"], ">", 97), 100)
+
+    assert rows.keys() == ["flags", "name", "x"]
+    assert rows["flags"].tolist() == [98, 99]
+
+    with pytest.raises(EvalError):
+        rows["other"]
@@ -0,0 +1,36 @@
+from tempfile import NamedTemporaryFile
+
+import ch5mpy as ch
+import numpy as np
+
+from hdfq.display import DisplayOptions
+from hdfq.serialize import serialize
+
+
+def test_serialize_json(capsys):
+    tmp_file = NamedTemporaryFile()
+    with ch.File(tmp_file.name, mode="r+") as file:
+        file.attrs["version"] = 2
+        file.create_dataset("a", data=np.arange(6).reshape(3, 2))
+
+        serialize(ch.H5Dict(file), DisplayOptions(output="json"))
+
+    assert capsys.readouterr().out == '{"#version":2,"a":[[0,1],[2,3],[4,5]]}\n'
+
+
+def test_serialize_ndjson(capsys):
+    serialize(np.arange(6).reshape(3, 2), DisplayOptions(output="ndjson"))
+    assert capsys.readouterr().out == "[0,1]\n[2,3]\n[4,5]\n"
+
+
+def test_serialize_raw(capsys):
+    serialize(["a", "b"], DisplayOptions(output="raw"))
+    assert capsys.readouterr().out == "a\nb\n"
+
+
+def test_serialize_non_finite(capsys):
+    serialize({"a": np.array([1.0, np.nan, -np.inf]), "m": float("nan")}, DisplayOptions(output="json"))
+    serialize(np.array([[np.inf, 2.0]]), DisplayOptions(output="ndjson"))
+    serialize([np.float64(np.nan), (1.5, float("inf"))], DisplayOptions(output="ndjson"))
+
+    assert capsys.readouterr().out == '{"a":[1.0,null,null],"m":null}\n[null,2.0]\nnull\n[1.5,null]\n'
@@ -0,0 +1,89 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import ch5mpy as ch
+
+from hdfq.client import query
+from hdfq.server import FilePool, QueryServer
+
+
+def make_file(path: Path, value: int) -> Path:
+    with ch.File(path, mode=ch.H5Mode.WRITE_TRUNCATE) as file:
+        file.attrs["value"] = value
+
+    return path
+
+
+def test_file_pool_lru(tmp_path):
+    paths = [make_file(tmp_path / f"{i}.h5", i) for i in range(3)]
+    pool = FilePool(max_open_files=2)
+
+    for path in paths:
+        pool.get(path)
+
+    assert len(pool) == 2
+    assert paths[0] not in pool
+
+    pool.close()
+
+
+def test_file_pool_reopens_modified_file(tmp_path):
+    path = make_file(tmp_path / "a.h5", 1)
+    pool = FilePool()
+
+    first = pool.get(path)
+    assert pool.get(path) is first
+
+    # written by another process while the pool keeps the file open (which HDF5 file locking would forbid)
+    subprocess.run(
+        [sys.executable, "-c", f"import h5py; h5py.File({str(path)!r}, 'r+').attrs['value'] = 2"],
+        env={**os.environ, "HDF5_USE_FILE_LOCKING": "FALSE"},
+        check=True,
+    )
+
+    second = pool.get(path)
+    assert second is not first and first.is_closed
+    assert second.attributes["value"] == 2
+
+    pool.close()
+
+
+def test_server_query(tmp_path, capsys):
+    path = make_file(tmp_path / "a.h5", 1)
+    socket_path = tmp_path / "hdfq.sock"
+
+    with QueryServer(socket_path) as server:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        try:
+            assert query(socket_path, "#value", path, {"output": "json"}) == 0
+            assert query(socket_path, ".c = 5", path, {"output": "json"}) == 0
+            assert query(socket_path, "-o json .c", path, {}) == 1
+            assert query(socket_path, ".c", path, {"output": "json"}) == 0
+
+        finally:
+            server.shutdown()
+            thread.join()
+
+    out, err = capsys.readouterr()
+    assert out.splitlines() == ["1", '{"#value":1,"c":5}', "5"]
+    assert err.startswith("hdfq: ")
+
+
+def test_query_without_server(tmp_path, capsys):
+    path = make_file(tmp_path / "a.h5", 1)
+
+    assert query(tmp_path / "missing.sock", "#value", path, {}) == 1
+    assert capsys.readouterr().err.startswith("hdfq: no server listening on ")
+
+    # socket file left behind by a server which is not running anymore
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(str(tmp_path / "stale.sock"))
+
+    assert query(tmp_path / "stale.sock", "#value", path, {}) == 1
+    assert capsys.readouterr().err.startswith("hdfq: no server listening on ")
@@ -0,0 +1,73 @@
+import numpy as np
+
+from hdfq.sketch import QuantileSketch
+
+QUANTILES = [0.0, 0.01, 0.25, 0.5, 0.75, 0.99, 1.0]
+
+
+def _rank_errors(values, estimates):
+    # distance between the requested ranks and the actual ranks of the estimated quantiles
+    return np.abs(np.searchsorted(np.sort(values), estimates) / len(values) - QUANTILES)
+
+
+def test_quantile_sketch():
+    values = np.random.default_rng(1).normal(size=1_000_000)
+    sketch = QuantileSketch()
+
+    for block in np.array_split(values, 50):
+        sketch.update(block)
+
+    estimates = sketch.quantiles(QUANTILES)
+
+    assert sketch.count == len(values)
+    assert (estimates[0], estimates[-1]) == (values.min(), values.max())
+    assert np.all(_rank_errors(values, estimates) < 0.005)
+    assert sum(len(level) for level in sketch.levels) < 10_000
+
+
+def test_quantile_sketch_merge():
+    values = np.random.default_rng(2).exponential(size=500_000)
+    sketches = [QuantileSketch().update(block) for block in np.array_split(values, 40)]
+
+    merged = QuantileSketch()
+    for sketch in sketches[::-1]:
+        merged.merge(sketch)
+
+    assert merged.count == len(values)
+    assert np.all(_rank_errors(values, merged.quantiles(QUANTILES)) < 0.005)
+
+
+def test_histogram():
+    values = np.random.default_rng(3).uniform(size=200_000)
+    counts, edges = QuantileSketch().update(values).histogram(10)
+    expected_counts, expected_edges = np.histogram(values, bins=10)
+
+    assert counts.sum() == len(values)
+    assert np.allclose(edges, expected_edges)
+    assert np.all(np.abs(counts - expected_counts) < 0.005 * len(values))
+
+
+def test_histogram_edge_bins():
+    values = np.random.default_rng(4).normal(size=200_000)
+    sketch = QuantileSketch()
+
+    for block in np.array_split(values, 50):
+        sketch.update(block)
+
+    counts, _ = sketch.histogram(10)
+    expected_counts, _ = np.histogram(values, bins=10)
+
+    # the tails hold fewer values than retained values stand for, they are not emptied
+    assert counts[0] > 0 and counts[-1] > 0
+    assert np.all(np.abs(counts - expected_counts)[[0, -1]] < 0.001 * len(values))
+
+    assert np.array_equal(QuantileSketch().update(np.arange(10.0)).histogram(5)[0], np.histogram(np.arange(10.0), 5)[0])
+
+
+def test_empty_sketch():
+    sketch = QuantileSketch()
+    assert np.all(np.isnan(sketch.quantiles([0.5])))
+    assert sketch.histogram(2)[0].tolist() == [0, 0]
+
+    sketch.update(np.array([2.0, 3.0])).merge(QuantileSketch())
+    assert sketch.quantiles([0.0, 1.0]).tolist() == [2.0, 3.0]
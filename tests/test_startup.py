@@ -0,0 +1,11 @@
+import subprocess
+import sys
+
+HEAVY_MODULES = ("ch5mpy", "h5py", "numpy", "tomllib", "hdfq.repair")
+
+
+def test_cli_import_is_light() -> None:
+    code = f"import sys, hdfq.cli.app; print(*(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == ""